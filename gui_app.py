@@ -10,8 +10,13 @@ from PySide6.QtCore import QByteArray
 from PySide6.QtWidgets import QLabel
 from nexus_os.core.ai_engine import AICore
 from nexus_os.core.logger import setup_logger
+from nexus_os.modules.nlp.artifact_store import ARTIFACT_SCHEME, get_artifact_store
 import yaml
 import asyncio
+import threading
+
+# Image messages: Base64 previews, and references to generated images in the artifact store
+IMAGE_PREFIXES = ("data:image/png;base64,", ARTIFACT_SCHEME)
 
 
 # Append the root directory of the project to the Python path
@@ -19,19 +24,53 @@ project_root = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(project_root)
 
 
+class AsyncLoopThread(threading.Thread):
+    """
+    Runs a single asyncio event loop for the lifetime of the GUI,
+    so background tasks started by one message survive until the next.
+    """
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
 class WorkerThread(QThread):
     result_ready = Signal(str)
+    partial_ready = Signal(str)
+    preview_ready = Signal(str)
 
-    def __init__(self, ai_core, user_input):
+    def __init__(self, ai_core, user_input, loop_thread):
         super().__init__()
         self.ai_core = ai_core
         self.user_input = user_input
+        self.loop_thread = loop_thread
+
+    async def stream(self):
+        """
+        Collects the streamed response, emitting the partial text as it grows.
+        """
+        text = ""
+        async for chunk in self.ai_core.stream_response(self.user_input):
+            if chunk.startswith(IMAGE_PREFIXES):
+                # Images arrive whole; live previews are replaced by the next one and the final image
+                text = chunk
+                self.preview_ready.emit(chunk)
+                continue
+            text += chunk
+            self.partial_ready.emit(text)
+        return text
 
     def run(self):
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            result = loop.run_until_complete(self.ai_core.chat_module.process_input(self.user_input))
+            result = self.loop_thread.submit(self.stream()).result()
             self.result_ready.emit(result)
         except Exception as e:
             self.result_ready.emit(f"Error: {str(e)}")
@@ -44,6 +83,15 @@ class NexusOSGUI(QMainWindow):
         # AI Core Integration
         self.ai_core = ai_core
 
+        # Label of the AI bubble currently being streamed into
+        self.streaming_label = None
+        # Label of the image bubble showing the live preview of a generated image
+        self.preview_label = None
+
+        # Event loop shared by all worker threads
+        self.loop_thread = AsyncLoopThread()
+        self.loop_thread.start()
+
         # Main Window
         self.setWindowTitle("Nexus OS")
         self.setGeometry(100, 100, 800, 600)
@@ -130,15 +178,26 @@ class NexusOSGUI(QMainWindow):
             # Add temporary "thinking" animation
             self.add_message_bubble("Thinking...", "loading")
 
-            self.worker_thread = WorkerThread(self.ai_core, user_input)
-            self.worker_thread.result_ready.connect(self.display_response)
-            self.worker_thread.start()
+            self.start_worker(user_input)
+
+    def start_worker(self, user_input):
+        """
+        Runs the user input through the AI core on a worker thread.
+        """
+        self.streaming_label = None
+        self.preview_label = None
+        self.worker_thread = WorkerThread(self.ai_core, user_input, self.loop_thread)
+        self.worker_thread.partial_ready.connect(self.display_partial_response)
+        self.worker_thread.preview_ready.connect(self.display_preview)
+        self.worker_thread.result_ready.connect(self.display_response)
+        self.worker_thread.start()
 
     def add_message_bubble(self, message, sender):
         """
         Adds a styled message bubble to the chat area and ensures the chat scrolls down.
         Detects Base64 image strings and renders them as images within styled bubbles.
         """
+        content_label = None
         container = QWidget()
         container_layout = QHBoxLayout(container)
         container_layout.setContentsMargins(5, 5, 5, 5)
@@ -151,21 +210,15 @@ class NexusOSGUI(QMainWindow):
         bubble_layout.setSpacing(5)
 
         # Check if the message contains an image in Base64 format
-        if isinstance(message, str) and message.startswith("data:image/png;base64,"):
+        if isinstance(message, str) and message.startswith(IMAGE_PREFIXES):
             try:
-                # Extract the Base64 data and convert it to an image
-                base64_data = message.split(",", 1)[1]
-                byte_data = QByteArray.fromBase64(base64_data.encode("utf-8"))
-                pixmap = QPixmap()
-                if not pixmap.loadFromData(byte_data):  # Validate pixmap loading
-                    raise ValueError("Failed to load image from Base64 data.")
-
                 image_label = QLabel()
-                image_label.setPixmap(pixmap)
+                image_label.setPixmap(self.load_pixmap(message))
                 image_label.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
                 image_label.setMaximumSize(400, 400)  # Limit displayed image size
 
                 bubble_layout.addWidget(image_label)  # Add the image to the bubble layout
+                content_label = image_label
             except Exception as e:
                 # Handle invalid Base64 data or image errors
                 error_label = QLabel(f"Error loading image: {str(e)}")
@@ -186,6 +239,7 @@ class NexusOSGUI(QMainWindow):
             text_label.setWordWrap(True)
             text_label.setFont(QFont("Arial", 10))
             bubble_layout.addWidget(text_label)
+            content_label = text_label
 
         # Apply styling based on the sender
         if sender == "user":
@@ -227,7 +281,26 @@ class NexusOSGUI(QMainWindow):
         self.chat_layout.addWidget(container)
         self.scroll_to_bottom()
 
+        return content_label
 
+    def load_pixmap(self, message):
+        """
+        Decodes a Base64 image string, or loads a stored image reference, into a pixmap.
+        """
+        pixmap = QPixmap()
+        if message.startswith(ARTIFACT_SCHEME):
+            # Stored images are read straight from disk
+            path = get_artifact_store().resolve(message)
+            if path is None or not pixmap.load(path):
+                raise ValueError(f"Failed to load image {message}.")
+            return pixmap
+
+        # Extract the Base64 data and convert it to an image
+        base64_data = message.split(",", 1)[1]
+        byte_data = QByteArray.fromBase64(base64_data.encode("utf-8"))
+        if not pixmap.loadFromData(byte_data):  # Validate pixmap loading
+            raise ValueError("Failed to load image from Base64 data.")
+        return pixmap
 
     def scroll_to_bottom(self):
         """
@@ -237,18 +310,64 @@ class NexusOSGUI(QMainWindow):
             self.chat_scroll.verticalScrollBar().maximum()
         ))
 
-    def display_response(self, response):
+    def remove_thinking_bubble(self):
         """
-        Displays the AI's response and removes the "thinking" bubble.
+        Removes the "thinking" bubble, which is always the last one in the chat.
         """
-        # Remove the "thinking" bubble
         if self.chat_layout.count() > 0:
             last_widget = self.chat_layout.itemAt(self.chat_layout.count() - 1).widget()
             if last_widget and isinstance(last_widget, QWidget):
                 last_widget.deleteLater()
 
+    def display_partial_response(self, text):
+        """
+        Grows the AI bubble in place while the response is streaming.
+        Replaces the "thinking" bubble with the AI bubble on the first chunk.
+        """
+        if self.streaming_label is None:
+            self.remove_thinking_bubble()
+            self.streaming_label = self.add_message_bubble(text, "ai")
+        else:
+            self.streaming_label.setText(text)
+            self.scroll_to_bottom()
+
+    def display_preview(self, image):
+        """
+        Shows the live preview of an image being generated, updating its bubble in place.
+        """
+        if self.preview_label is None:
+            self.remove_thinking_bubble()
+            self.preview_label = self.add_message_bubble(image, "ai")
+            return
+        try:
+            self.preview_label.setPixmap(self.load_pixmap(image))
+        except Exception as e:
+            print(f"[ERROR] Error loading image preview: {e}")
+
+    def display_response(self, response):
+        """
+        Displays the AI's response and removes the "thinking" bubble.
+        """
+        # The preview bubble already shows the final image, the last one streamed
+        if self.preview_label is not None:
+            self.preview_label = None
+            if isinstance(response, str) and response.startswith(IMAGE_PREFIXES):
+                return
+            self.add_message_bubble(response, "ai")
+            return
+
+        # Finish the streamed bubble with the complete response
+        if self.streaming_label is not None:
+            self.streaming_label.setText(response)
+            self.streaming_label = None
+            self.scroll_to_bottom()
+            return
+
+        # Remove the "thinking" bubble
+        self.remove_thinking_bubble()
+
         # Handle the response as either an image or text
-        if isinstance(response, str) and response.startswith("data:image/png;base64,"):
+        if isinstance(response, str) and response.startswith(IMAGE_PREFIXES):
             self.add_message_bubble(response, "ai")  # Image response
         else:
             self.add_message_bubble(response, "ai")  # Text response
@@ -270,9 +389,7 @@ class NexusOSGUI(QMainWindow):
         Processes predefined commands.
         """
         self.add_message_bubble(f"Executing: {command}", "user")
-        self.worker_thread = WorkerThread(self.ai_core, command)
-        self.worker_thread.result_ready.connect(self.display_response)
-        self.worker_thread.start()
+        self.start_worker(command)
 
     def set_stylesheet(self):
         self.setStyleSheet("""
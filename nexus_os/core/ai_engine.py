@@ -11,19 +11,35 @@ class AICore:
         self.chat_module = ChatModule(config, logger)
         self.vision_module = VisionModule(config, logger)
 
+    async def stream_response(self, user_input):
+        """
+        Yields the response to the user input chunk by chunk as the ChatModule produces it.
+        """
+        async for chunk in self.chat_module.stream_input(user_input):
+            yield chunk
+
     async def run(self):
         while True:
             try:
-                user_input = input("You: ")
+                # Read input off the event loop so background tasks keep running
+                user_input = await asyncio.get_event_loop().run_in_executor(None, input, "You: ")
                 if user_input.lower() in ["exit", "quit"]:
                     print("Shutting down Nexus OS.")
                     self.logger.info("Nexus OS shutdown by user.")
                     break
 
-                # Await the asynchronous ChatModule response
+                # Print the ChatModule response as it streams in
                 self.logger.debug("Sending user input to ChatModule...")
-                response = await self.chat_module.process_input(user_input)
-                print(f"AI: {response}")
+                print("AI: ", end="", flush=True)
+                chunks = []
+                async for chunk in self.stream_response(user_input):
+                    if chunk.startswith("data:image/"):
+                        # Live image previews are for the GUI only; the final image arrives as a reference
+                        continue
+                    chunks.append(chunk)
+                    print(chunk, end="", flush=True)
+                print()
+                response = "".join(chunks)
                 self.logger.info(f"User input: {user_input} | AI response: {response}")
             except Exception as e:
                 self.logger.error(f"An error occurred during processing: {e}")
@@ -0,0 +1,229 @@
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+
+import aiohttp
+import requests
+import yaml
+from requests.adapters import HTTPAdapter
+from langchain_ollama import OllamaLLM
+
+CONFIG_PATH = "nexus_os/core/config.yaml"
+
+DEFAULT_BACKENDS = {
+    "ollama": {"max_concurrency": 2, "connect_timeout": 5, "read_timeout": 120},
+    "vision": {"max_concurrency": 1, "connect_timeout": 5, "read_timeout": 300},
+    "stable_diffusion": {"max_concurrency": 1, "connect_timeout": 5, "read_timeout": 600},
+}
+
+
+class ModelClients:
+    """
+    Process-wide, pooled clients for the Ollama and Stable Diffusion backends.
+    Provides a keep-alive HTTP session (sync and async), shared LLM instances,
+    a bounded executor for blocking calls and a concurrency limit per backend.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        clients_config = config.get("clients", {})
+
+        self.backends = {}
+        for name, defaults in DEFAULT_BACKENDS.items():
+            backend = dict(defaults)
+            backend.update((clients_config.get("backends") or {}).get(name) or {})
+            self.backends[name] = backend
+        self.backends["ollama"].setdefault("url", config["ai_model"]["host"])
+        self.backends["vision"].setdefault("url", config["vision_model"]["host"])
+        self.backends["stable_diffusion"].setdefault(
+            "url", config.get("stable_diffusion", {}).get("host", "http://127.0.0.1:7860")
+        )
+
+        pool_size = clients_config.get("pool_size", 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=len(self.backends), pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.pool_size = pool_size
+
+        self.executor = ThreadPoolExecutor(
+            max_workers=clients_config.get("executor_workers", 4), thread_name_prefix="nexus-clients"
+        )
+
+        self._sync_limits = {
+            name: threading.BoundedSemaphore(backend["max_concurrency"]) for name, backend in self.backends.items()
+        }
+        # Async primitives are bound to an event loop, so keep one set per loop
+        self._async_sessions = weakref.WeakKeyDictionary()
+        self._async_limits = weakref.WeakKeyDictionary()
+        self._llms = {}
+        self._lock = threading.Lock()
+
+    def url(self, backend, path=""):
+        return f"{self.backends[backend]['url'].rstrip('/')}{path}"
+
+    def timeout(self, backend):
+        """
+        Returns the (connect, read) timeout tuple for a backend.
+        """
+        return self.backends[backend]["connect_timeout"], self.backends[backend]["read_timeout"]
+
+    def get_llm(self, model, base_url=None, **params):
+        """
+        Returns a shared OllamaLLM for the model and generation parameters.
+        """
+        key = (model, base_url, tuple(sorted((k, tuple(v) if isinstance(v, list) else v) for k, v in params.items())))
+        with self._lock:
+            if key not in self._llms:
+                self._llms[key] = OllamaLLM(
+                    model=model,
+                    base_url=base_url or self.url("ollama"),
+                    client_kwargs={"timeout": self.backends["ollama"]["read_timeout"]},
+                    **params,
+                )
+            return self._llms[key]
+
+    @contextmanager
+    def limit(self, backend):
+        """
+        Holds one of the backend's concurrency slots (blocking).
+        """
+        with self._sync_limits[backend]:
+            yield
+
+    @asynccontextmanager
+    async def slot(self, backend):
+        """
+        Holds one of the backend's concurrency slots without blocking the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        limits = self._async_limits.setdefault(loop, {})
+        if backend not in limits:
+            limits[backend] = asyncio.Semaphore(self.backends[backend]["max_concurrency"])
+        async with limits[backend]:
+            yield
+
+    def post(self, backend, path, **kwargs):
+        """
+        Sends a POST request through the pooled session under the backend's limit and timeout.
+        """
+        kwargs.setdefault("timeout", self.timeout(backend))
+        with self.limit(backend):
+            return self.session.post(self.url(backend, path), **kwargs)
+
+    @contextmanager
+    def stream(self, backend, path, **kwargs):
+        """
+        Opens a streamed POST request, holding the backend's slot until the block exits.
+        Leaving the block closes the response, which also stops a streamed generation.
+        """
+        kwargs.setdefault("timeout", self.timeout(backend))
+        with self.limit(backend):
+            with self.session.post(self.url(backend, path), stream=True, **kwargs) as response:
+                response.raise_for_status()
+                yield response
+
+    async def async_session(self):
+        """
+        Returns the keep-alive aiohttp session of the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        session = self._async_sessions.get(loop)
+        if session is None or session.closed:
+            session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+            self._async_sessions[loop] = session
+        return session
+
+    def _async_timeout(self, backend):
+        connect, read = self.timeout(backend)
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+
+    async def apost_json(self, backend, path, payload, limited=True, **kwargs):
+        """
+        Sends a POST request with a JSON payload and returns the decoded JSON response.
+        Control requests (e.g. an interrupt) pass limited=False so they do not wait for a slot.
+        """
+        if not limited:
+            return await self._apost_json(backend, path, payload, **kwargs)
+        async with self.slot(backend):
+            return await self._apost_json(backend, path, payload, **kwargs)
+
+    async def _apost_json(self, backend, path, payload, **kwargs):
+        session = await self.async_session()
+        async with session.post(
+            self.url(backend, path), json=payload, timeout=self._async_timeout(backend), **kwargs
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def aget_json(self, backend, path, **kwargs):
+        """
+        Sends a GET request and returns the decoded JSON response.
+        Meant for status endpoints, so it does not take one of the backend's slots.
+        """
+        session = await self.async_session()
+        async with session.get(self.url(backend, path), timeout=self._async_timeout(backend), **kwargs) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    @asynccontextmanager
+    async def astream(self, backend, path, payload, **kwargs):
+        """
+        Opens a streamed POST request; the response is released when the block exits,
+        which also stops a streamed generation on the server.
+        """
+        session = await self.async_session()
+        async with self.slot(backend):
+            async with session.post(
+                self.url(backend, path), json=payload, timeout=self._async_timeout(backend), **kwargs
+            ) as response:
+                response.raise_for_status()
+                yield response
+
+    async def ainvoke(self, backend, llm, prompt):
+        """
+        Runs an LLM call on its native async client under the backend's limit.
+        Cancelling it, e.g. on a stage timeout, closes the request instead of leaving it running.
+        """
+        async with self.slot(backend):
+            return await llm.ainvoke(prompt)
+
+    async def run_blocking(self, backend, func, *args):
+        """
+        Runs a blocking call on the shared executor under the backend's limit.
+        """
+        async with self.slot(backend):
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def aclose(self):
+        """
+        Closes the async session of the running event loop.
+        """
+        session = self._async_sessions.pop(asyncio.get_running_loop(), None)
+        if session is not None:
+            await session.close()
+
+    def close(self):
+        self.session.close()
+        self.executor.shutdown(wait=False)
+
+
+_clients = None
+_clients_lock = threading.Lock()
+
+
+def get_clients(config=None):
+    """
+    Returns the process-wide ModelClients, creating it on first use.
+    Loads config.yaml when no configuration has been provided yet.
+    """
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            if config is None:
+                with open(CONFIG_PATH, "r") as file:
+                    config = yaml.safe_load(file)
+            _clients = ModelClients(config)
+        return _clients
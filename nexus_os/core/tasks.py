@@ -0,0 +1,75 @@
+import asyncio
+import itertools
+import time
+
+
+class TaskInfo:
+    """
+    A long-running action: its asyncio task and the latest progress message.
+    """
+
+    def __init__(self, task_id, name):
+        self.id = task_id
+        self.name = name
+        self.task = None
+        self.progress = "starting"
+        self.started = time.monotonic()
+
+    def describe(self):
+        elapsed = time.monotonic() - self.started
+        return f"#{self.id} {self.name}: {self.progress} ({elapsed:.0f}s)"
+
+
+class TaskManager:
+    """
+    Runs long actions as cancellable asyncio tasks with progress reporting,
+    so independent actions proceed concurrently instead of queuing behind each other.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.tasks = {}
+        self.ids = itertools.count(1)
+
+    def start(self, name, action):
+        """
+        Starts `action(progress)` as a task; `progress(message)` records and logs its progress.
+        """
+        info = TaskInfo(next(self.ids), name)
+
+        def progress(message):
+            info.progress = message
+            self.logger.info(f"Task #{info.id} ({name}): {message}")
+
+        info.task = asyncio.ensure_future(action(progress))
+        info.task.add_done_callback(lambda _: self.tasks.pop(info.id, None))
+        self.tasks[info.id] = info
+        self.logger.info(f"Task #{info.id} started: {name}")
+        return info
+
+    async def run(self, name, action):
+        """
+        Starts an action and waits for its result; returns a notice if it gets cancelled.
+        """
+        info = self.start(name, action)
+        try:
+            return await asyncio.shield(info.task)
+        except asyncio.CancelledError:
+            if info.task.cancelled():
+                return f"Task #{info.id} ({name}) was cancelled."
+            # The caller itself was cancelled, so stop the action too
+            info.task.cancel()
+            raise
+
+    def cancel(self, task_id):
+        info = self.tasks.get(task_id)
+        if info is None:
+            return False
+        info.task.cancel()
+        self.logger.info(f"Task #{task_id} ({info.name}) cancellation requested.")
+        return True
+
+    def describe(self):
+        if not self.tasks:
+            return "No running tasks."
+        return "\n".join(info.describe() for info in self.tasks.values())
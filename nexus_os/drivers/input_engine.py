@@ -0,0 +1,390 @@
+import contextlib
+import io
+import json
+import logging
+import threading
+import time
+
+try:
+    from Xlib import X, XK, display as xdisplay
+    from Xlib.ext import record, xtest
+    from Xlib.protocol import rq
+except ImportError:
+    X = None
+
+MACRO_VERSION = 1
+
+# Keysyms for characters that are not named after themselves
+CHAR_KEYSYMS = {"\n": "Return", "\r": "Return", "\t": "Tab", " ": "space", "\b": "BackSpace"}
+
+
+class FailSafeException(Exception):
+    """
+    Raised when the pointer is in a screen corner, as with pyautogui's fail-safe.
+    """
+
+
+def char_keysym(char):
+    """
+    Returns the keysym of a character: Latin-1 keysyms equal the code point, others use the Unicode range.
+    """
+    if char in CHAR_KEYSYMS:
+        return XK.string_to_keysym(CHAR_KEYSYMS[char])
+    code = ord(char)
+    if 0x20 <= code <= 0x7E or 0xA0 <= code <= 0xFF:
+        return code
+    return 0x01000000 | code
+
+
+class Macro:
+    """
+    A timed sequence of input events. Each event is a dict with "t", the seconds since the
+    start, and a "type": "key" (keysym, down), "button" (button, down) or "motion" (x, y).
+    Saved as JSON so recordings can be edited and replayed.
+    """
+
+    def __init__(self, events=None):
+        self.events = list(events or [])
+
+    def __len__(self):
+        return len(self.events)
+
+    @property
+    def duration(self):
+        return self.events[-1]["t"] if self.events else 0.0
+
+    def add(self, t, event_type, **fields):
+        self.events.append(dict(t=round(t, 4), type=event_type, **fields))
+        return self
+
+    def key(self, t, keysym, down):
+        return self.add(t, "key", keysym=keysym, down=down)
+
+    def button(self, t, button, down):
+        return self.add(t, "button", button=button, down=down)
+
+    def motion(self, t, x, y):
+        return self.add(t, "motion", x=int(x), y=int(y))
+
+    @classmethod
+    def from_text(cls, text, interval=0.0):
+        """
+        Builds the key presses that type `text`, one every `interval` seconds.
+        """
+        macro = cls()
+        for index, char in enumerate(text):
+            keysym = char_keysym(char)
+            macro.key(index * interval, keysym, True)
+            macro.key(index * interval, keysym, False)
+        return macro
+
+    @classmethod
+    def from_clicks(cls, points, interval=0.0, button=1):
+        """
+        Builds a move and click at each (x, y) point, one every `interval` seconds.
+        """
+        macro = cls()
+        for index, (x, y) in enumerate(points):
+            macro.motion(index * interval, x, y)
+            macro.button(index * interval, button, True)
+            macro.button(index * interval, button, False)
+        return macro
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump({"version": MACRO_VERSION, "events": self.events}, file, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("version") != MACRO_VERSION:
+            raise ValueError(f"Unsupported macro version: {data.get('version')}")
+        return cls(data["events"])
+
+
+class InputEngine:
+    """
+    Injects keyboard and mouse input through the XTest extension.
+    Events are written to the X connection in batches and flushed once per batch, instead of
+    a round trip, a pause and a print per call as with pyautogui. Macros replay with their
+    recorded timing, scaled by `speed`, or as fast as possible when `speed` is None; either
+    way the pointer is checked between batches and a corner position raises FailSafeException.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        input_config = config.get("input", {})
+        self.batch_size = input_config.get("batch_size", 64)
+        self.failsafe = input_config.get("failsafe", True)
+        self.lock = threading.Lock()
+        self.display = None
+        self.keycodes = {}
+        self.started = False
+
+    @property
+    def available(self):
+        return self.start()
+
+    def start(self):
+        """
+        Connects to the X server. Returns False if python3-xlib or XTest is unavailable.
+        """
+        if self.started:
+            return self.display is not None
+        self.started = True
+        if X is None:
+            self.logger.warning("python3-xlib is not installed, XTest input disabled.")
+            return False
+        try:
+            self.display = xdisplay.Display()
+            if not self.display.has_extension("XTEST"):
+                raise RuntimeError("the XTEST extension is missing")
+            self.root = self.display.screen().root
+            geometry = self.root.get_geometry()
+            self.corners = {(0, 0), (geometry.width - 1, 0), (0, geometry.height - 1),
+                            (geometry.width - 1, geometry.height - 1)}
+            self.shift = self.display.keysym_to_keycode(XK.string_to_keysym("Shift_L"))
+        except Exception as e:
+            self.logger.warning(f"XTest input disabled: {e}")
+            self.close()
+            return False
+        return True
+
+    def close(self):
+        with self.lock:
+            if self.display is not None:
+                try:
+                    self.display.close()
+                except Exception:
+                    pass
+                self.display = None
+
+    def check_failsafe(self):
+        if not self.failsafe:
+            return
+        pointer = self.root.query_pointer()
+        if (pointer.root_x, pointer.root_y) in self.corners:
+            raise FailSafeException(f"Pointer in a screen corner at ({pointer.root_x}, {pointer.root_y}).")
+
+    def resolve_key(self, keysym):
+        """
+        Returns (keycode, needs_shift) for a keysym, or None if no key produces it.
+        """
+        if keysym not in self.keycodes:
+            keycode = self.display.keysym_to_keycode(keysym)
+            if not keycode:
+                self.keycodes[keysym] = None
+            else:
+                # Keysyms in the second column of the keyboard mapping are typed with Shift
+                self.keycodes[keysym] = (keycode, self.display.keycode_to_keysym(keycode, 0) != keysym)
+        return self.keycodes[keysym]
+
+    def compile(self, events):
+        """
+        Turns macro events into (t, event_type, detail, x, y) requests.
+        """
+        requests = []
+        for event in events:
+            t = event["t"]
+            if event["type"] == "motion":
+                requests.append((t, X.MotionNotify, 0, event["x"], event["y"]))
+            elif event["type"] == "button":
+                requests.append((t, X.ButtonPress if event["down"] else X.ButtonRelease, event["button"], 0, 0))
+            elif event["type"] == "key":
+                resolved = self.resolve_key(event["keysym"])
+                if resolved is None:
+                    self.logger.warning(f"No key produces keysym 0x{event['keysym']:x}, skipping it.")
+                    continue
+                keycode, shifted = resolved
+                if shifted and event["down"]:
+                    requests.append((t, X.KeyPress, self.shift, 0, 0))
+                requests.append((t, X.KeyPress if event["down"] else X.KeyRelease, keycode, 0, 0))
+                if shifted and not event["down"]:
+                    requests.append((t, X.KeyRelease, self.shift, 0, 0))
+        return requests
+
+    def send(self, requests):
+        """
+        Writes a batch of requests to the connection and flushes it once.
+        """
+        self.check_failsafe()
+        for _, event_type, detail, x, y in requests:
+            xtest.fake_input(self.display, event_type, detail, x=x, y=y)
+        self.display.flush()
+
+    def play(self, macro, speed=1.0):
+        """
+        Replays a macro. Events due at the same time go out as one batch; with `speed` None
+        all events are sent in batches of `batch_size` without waiting.
+        Returns the number of X events sent.
+        """
+        if not self.start():
+            raise RuntimeError("XTest input is not available")
+        with self.lock:
+            requests = self.compile(macro.events)
+            if speed is None:
+                for index in range(0, len(requests), self.batch_size):
+                    self.send(requests[index:index + self.batch_size])
+                self.display.sync()
+                return len(requests)
+
+            started = time.perf_counter()
+            index = 0
+            while index < len(requests):
+                due = requests[index][0]
+                end = index
+                while end < len(requests) and requests[end][0] == due and end - index < self.batch_size:
+                    end += 1
+                # Sleep most of the wait, then spin for the last millisecond
+                target = started + due / speed
+                remaining = target - time.perf_counter()
+                if remaining > 0.002:
+                    time.sleep(remaining - 0.001)
+                while time.perf_counter() < target:
+                    pass
+                self.send(requests[index:end])
+                index = end
+            self.display.sync()
+            return len(requests)
+
+    def type_text(self, text, interval=0.0):
+        return self.play(Macro.from_text(text, interval), speed=None if not interval else 1.0)
+
+    def move(self, x, y):
+        return self.play(Macro().motion(0, x, y), speed=None)
+
+    def click(self, x=None, y=None, button=1):
+        macro = Macro()
+        if x is not None and y is not None:
+            macro.motion(0, x, y)
+        macro.button(0, button, True).button(0, button, False)
+        return self.play(macro, speed=None)
+
+
+class MacroRecorder:
+    """
+    Records keyboard and mouse input with the RECORD extension into a Macro.
+    Recording runs on its own connections in a background thread until `stop()`.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.macro = Macro()
+        self.started = None
+        self.thread = None
+        self.context = None
+
+    def start(self):
+        if X is None:
+            raise RuntimeError("python3-xlib is not installed")
+        self.control = xdisplay.Display()
+        self.data = xdisplay.Display()
+        if not self.control.has_extension("RECORD"):
+            raise RuntimeError("the RECORD extension is missing")
+        self.context = self.control.record_create_context(0, [record.AllClients], [{
+            "core_requests": (0, 0),
+            "core_replies": (0, 0),
+            "ext_requests": (0, 0, 0, 0),
+            "ext_replies": (0, 0, 0, 0),
+            "delivered_events": (0, 0),
+            "device_events": (X.KeyPress, X.MotionNotify),
+            "errors": (0, 0),
+            "client_started": False,
+            "client_died": False,
+        }])
+        self.thread = threading.Thread(target=self.run, name="macro-recorder", daemon=True)
+        self.thread.start()
+        self.logger.info("Macro recording started.")
+
+    def run(self):
+        self.data.record_enable_context(self.context, self.handle)
+        self.data.record_free_context(self.context)
+        self.data.close()
+
+    def handle(self, reply):
+        if reply.category != record.FromServer or reply.client_swapped or not reply.data:
+            return
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+        t = now - self.started
+        data = reply.data
+        while data:
+            event, data = rq.EventField(None).parse_binary_value(data, self.data.display, None, None)
+            if event.type in (X.KeyPress, X.KeyRelease):
+                keysym = self.data.keycode_to_keysym(event.detail, 0)
+                self.macro.key(t, keysym, event.type == X.KeyPress)
+            elif event.type in (X.ButtonPress, X.ButtonRelease):
+                self.macro.button(t, event.detail, event.type == X.ButtonPress)
+            elif event.type == X.MotionNotify:
+                self.macro.motion(t, event.root_x, event.root_y)
+
+    def stop(self):
+        """
+        Stops recording and returns the macro.
+        """
+        if self.context is not None:
+            self.control.record_disable_context(self.context)
+            self.control.flush()
+            self.thread.join(timeout=2.0)
+            self.control.close()
+            self.context = None
+            self.logger.info(f"Macro recording stopped with {len(self.macro)} events.")
+        return self.macro
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_input_engine(config=None, logger=None):
+    """
+    Returns the process-wide InputEngine, creating it on first use.
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = InputEngine(config or {}, logger or logging.getLogger("InputEngine"))
+        return _engine
+
+
+def benchmark_input(presses=50, clicks=20):
+    """
+    Measures events per second for typing and clicking with pyautogui, as the drivers did
+    before the engine, and with the XTest engine. This sends real input to the focused window.
+    Returns {name: events per second}.
+    """
+    import pyautogui
+
+    engine = get_input_engine()
+    if not engine.available:
+        raise RuntimeError("XTest input is not available")
+    pointer = engine.root.query_pointer()
+    points = [(pointer.root_x + index % 5, pointer.root_y) for index in range(clicks)]
+    text = "x" * presses
+
+    def rate(events, func):
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func()
+        return events / (time.perf_counter() - started)
+
+    def driver_clicks():
+        for x, y in points:
+            pyautogui.moveTo(x, y)
+            pyautogui.click()
+
+    # A key press is a press and a release; a click is a motion, a press and a release
+    return {
+        "driver typing": rate(2 * presses, lambda: pyautogui.write(text)),
+        "xtest typing": rate(2 * presses, lambda: engine.type_text(text)),
+        "driver clicks": rate(3 * clicks, driver_clicks),
+        "xtest clicks": rate(3 * clicks, lambda: engine.play(Macro.from_clicks(points), speed=None)),
+    }
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    for name, events in benchmark_input().items():
+        print(f"{name:>14}: {events:,.0f} events/s")
@@ -1,5 +1,12 @@
 import pyautogui
 
+from nexus_os.drivers.input_engine import get_input_engine
+
 def type_text(text):
-    pyautogui.write(text)
+    # XTest input when an X server is available, pyautogui otherwise
+    engine = get_input_engine()
+    if engine.available:
+        engine.type_text(text)
+    else:
+        pyautogui.write(text)
     print(f"Typed text: {text}")
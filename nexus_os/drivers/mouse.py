@@ -1,5 +1,12 @@
 import pyautogui
 
+from nexus_os.drivers.input_engine import get_input_engine
+
 def move_mouse(x, y):
-    pyautogui.moveTo(x, y)
+    # XTest input when an X server is available, pyautogui otherwise
+    engine = get_input_engine()
+    if engine.available:
+        engine.move(x, y)
+    else:
+        pyautogui.moveTo(x, y)
     print(f"Mouse moved to ({x}, {y})")
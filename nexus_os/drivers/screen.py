@@ -0,0 +1,478 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageGrab
+
+try:
+    from Xlib import X, display as xdisplay
+except ImportError:
+    X = None
+
+ZPIXMAP = 2
+ALL_PLANES = 0xFFFFFFFF
+IPC_PRIVATE = 0
+IPC_CREAT = 0o1000
+IPC_RMID = 0
+
+
+class XShmSegmentInfo(ctypes.Structure):
+    _fields_ = [
+        ("shmseg", ctypes.c_ulong),
+        ("shmid", ctypes.c_int),
+        ("shmaddr", ctypes.c_void_p),
+        ("readOnly", ctypes.c_int),
+    ]
+
+
+class XImage(ctypes.Structure):
+    # Leading fields of Xlib's XImage; the rest of the struct is never accessed
+    _fields_ = [
+        ("width", ctypes.c_int),
+        ("height", ctypes.c_int),
+        ("xoffset", ctypes.c_int),
+        ("format", ctypes.c_int),
+        ("data", ctypes.c_void_p),
+        ("byte_order", ctypes.c_int),
+        ("bitmap_unit", ctypes.c_int),
+        ("bitmap_bit_order", ctypes.c_int),
+        ("bitmap_pad", ctypes.c_int),
+        ("depth", ctypes.c_int),
+        ("bytes_per_line", ctypes.c_int),
+        ("bits_per_pixel", ctypes.c_int),
+    ]
+
+
+XErrorHandler = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.c_void_p, ctypes.c_void_p)
+
+
+def load_shm_libraries():
+    """
+    Loads libX11, libXext and libc with the prototypes used for MIT-SHM capture.
+    Returns None when a library is missing.
+    """
+    names = [ctypes.util.find_library(name) for name in ("X11", "Xext", "c")]
+    if not all(names):
+        return None
+    x11, xext, libc = (ctypes.CDLL(name) for name in names)
+
+    x11.XOpenDisplay.restype = ctypes.c_void_p
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+    x11.XDefaultScreen.argtypes = [ctypes.c_void_p]
+    x11.XRootWindow.restype = ctypes.c_ulong
+    x11.XRootWindow.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultVisual.restype = ctypes.c_void_p
+    x11.XDefaultVisual.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDefaultDepth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayWidth.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XDisplayHeight.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XSync.argtypes = [ctypes.c_void_p, ctypes.c_int]
+    x11.XFree.argtypes = [ctypes.c_void_p]
+    x11.XSetErrorHandler.restype = ctypes.c_void_p
+    x11.XSetErrorHandler.argtypes = [ctypes.c_void_p]
+
+    xext.XShmQueryExtension.argtypes = [ctypes.c_void_p]
+    xext.XShmCreateImage.restype = ctypes.POINTER(XImage)
+    xext.XShmCreateImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_void_p, ctypes.c_uint, ctypes.c_int, ctypes.c_void_p,
+        ctypes.POINTER(XShmSegmentInfo), ctypes.c_uint, ctypes.c_uint,
+    ]
+    xext.XShmAttach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmDetach.argtypes = [ctypes.c_void_p, ctypes.POINTER(XShmSegmentInfo)]
+    xext.XShmGetImage.argtypes = [
+        ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(XImage), ctypes.c_int, ctypes.c_int, ctypes.c_ulong,
+    ]
+
+    libc.shmget.restype = ctypes.c_int
+    libc.shmget.argtypes = [ctypes.c_int, ctypes.c_size_t, ctypes.c_int]
+    libc.shmat.restype = ctypes.c_void_p
+    libc.shmat.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int]
+    libc.shmdt.argtypes = [ctypes.c_void_p]
+    libc.shmctl.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_void_p]
+    return x11, xext, libc
+
+
+class ShmImage:
+    """
+    An XImage backed by a System V shared memory segment that the X server writes into.
+    `array` is a (height, width, 4) BGRX view of the segment, reused by every grab.
+    """
+
+    def __init__(self, backend, width, height):
+        self.backend = backend
+        self.width = width
+        self.height = height
+        self.info = XShmSegmentInfo()
+        x11, xext, libc = backend.libs
+        self.image = xext.XShmCreateImage(
+            backend.display, backend.visual, backend.depth, ZPIXMAP, None, ctypes.byref(self.info), width, height
+        )
+        if not self.image:
+            raise RuntimeError("XShmCreateImage failed")
+
+        image = self.image.contents
+        if image.bits_per_pixel != 32:
+            x11.XFree(self.image)
+            raise RuntimeError(f"Unsupported pixel format: {image.bits_per_pixel} bits per pixel")
+        size = image.bytes_per_line * height
+        self.info.shmid = libc.shmget(IPC_PRIVATE, size, IPC_CREAT | 0o600)
+        if self.info.shmid < 0:
+            x11.XFree(self.image)
+            raise RuntimeError("shmget failed")
+        self.info.shmaddr = libc.shmat(self.info.shmid, None, 0)
+        if self.info.shmaddr in (None, ctypes.c_void_p(-1).value):
+            libc.shmctl(self.info.shmid, IPC_RMID, None)
+            x11.XFree(self.image)
+            raise RuntimeError("shmat failed")
+        image.data = self.info.shmaddr
+        self.info.readOnly = 0
+
+        attached = backend.checked(lambda: xext.XShmAttach(backend.display, ctypes.byref(self.info)))
+        # The segment is freed once both this process and the server have detached
+        libc.shmctl(self.info.shmid, IPC_RMID, None)
+        if not attached:
+            libc.shmdt(self.info.shmaddr)
+            x11.XFree(self.image)
+            raise RuntimeError("XShmAttach failed")
+
+        buffer = (ctypes.c_uint8 * size).from_address(self.info.shmaddr)
+        rows = np.frombuffer(buffer, dtype=np.uint8).reshape(height, image.bytes_per_line // 4, 4)
+        self.array = rows[:, :width]
+
+    def grab(self, x, y):
+        x11, xext, _ = self.backend.libs
+        if not xext.XShmGetImage(self.backend.display, self.backend.root, self.image, x, y, ALL_PLANES):
+            raise RuntimeError("XShmGetImage failed")
+        return self.array
+
+    def close(self):
+        x11, xext, libc = self.backend.libs
+        xext.XShmDetach(self.backend.display, ctypes.byref(self.info))
+        x11.XSync(self.backend.display, 0)
+        self.image.contents.data = None
+        x11.XFree(self.image)
+        libc.shmdt(self.info.shmaddr)
+
+
+class ShmBackend:
+    """
+    Captures the root window through the X11 MIT-SHM extension: the server copies
+    pixels straight into shared memory, so a grab costs one round trip and no allocation.
+    Shared images are kept per region size.
+    """
+
+    name = "shm"
+
+    def __init__(self, max_images=4):
+        self.libs = load_shm_libraries()
+        if self.libs is None:
+            raise RuntimeError("libX11/libXext not found")
+        x11, xext, _ = self.libs
+        display_name = os.environ.get("DISPLAY", "")
+        # Shared memory only works with a server on this machine
+        if not display_name.startswith((":", "unix:")):
+            raise RuntimeError(f"MIT-SHM needs a local display, got {display_name!r}")
+        self.display = x11.XOpenDisplay(None)
+        if not self.display:
+            raise RuntimeError("Cannot open the X display")
+        if not xext.XShmQueryExtension(self.display):
+            x11.XCloseDisplay(self.display)
+            raise RuntimeError("The X server has no MIT-SHM extension")
+
+        screen = x11.XDefaultScreen(self.display)
+        self.root = x11.XRootWindow(self.display, screen)
+        self.visual = x11.XDefaultVisual(self.display, screen)
+        self.depth = x11.XDefaultDepth(self.display, screen)
+        self.size = (x11.XDisplayWidth(self.display, screen), x11.XDisplayHeight(self.display, screen))
+        self.max_images = max_images
+        self.images = {}
+        self.error = False
+
+    def checked(self, call):
+        """
+        Runs an Xlib call with a temporary error handler, since Xlib's default one exits
+        the process. Returns the call's result, or False if the server reported an error.
+        """
+        x11 = self.libs[0]
+        self.error = False
+
+        def on_error(display, event):
+            self.error = True
+            return 0
+
+        handler = XErrorHandler(on_error)
+        previous = x11.XSetErrorHandler(ctypes.cast(handler, ctypes.c_void_p))
+        try:
+            result = call()
+            x11.XSync(self.display, 0)
+        finally:
+            x11.XSetErrorHandler(previous)
+        return False if self.error else result
+
+    def grab(self, x, y, width, height):
+        image = self.images.get((width, height))
+        if image is None:
+            if len(self.images) >= self.max_images:
+                self.images.pop(next(iter(self.images))).close()
+            image = self.images[(width, height)] = ShmImage(self, width, height)
+        return image.grab(x, y)
+
+    def close(self):
+        for image in self.images.values():
+            image.close()
+        self.images = {}
+        if self.display:
+            self.libs[0].XCloseDisplay(self.display)
+            self.display = None
+
+
+class XlibBackend:
+    """
+    Captures through python3-xlib's GetImage; slower since pixels travel over the socket.
+    """
+
+    name = "xlib"
+
+    def __init__(self):
+        if X is None:
+            raise RuntimeError("python3-xlib is not installed")
+        self.display = xdisplay.Display()
+        self.root = self.display.screen().root
+        geometry = self.root.get_geometry()
+        self.size = (geometry.width, geometry.height)
+
+    def grab(self, x, y, width, height):
+        reply = self.root.get_image(x, y, width, height, X.ZPixmap, ALL_PLANES)
+        return np.frombuffer(reply.data, dtype=np.uint8).reshape(height, width, 4)
+
+    def close(self):
+        self.display.close()
+
+
+class PILBackend:
+    """
+    Fallback through PIL.ImageGrab, converted to the same BGRX layout.
+    """
+
+    name = "pil"
+
+    def __init__(self):
+        self.size = ImageGrab.grab().size
+
+    def grab(self, x, y, width, height):
+        rgb = np.asarray(ImageGrab.grab(bbox=(x, y, x + width, y + height)).convert("RGB"))
+        frame = np.empty((height, width, 4), dtype=np.uint8)
+        frame[..., :3] = rgb[..., ::-1]
+        frame[..., 3] = 255
+        return frame
+
+    def close(self):
+        pass
+
+
+BACKENDS = {"shm": ShmBackend, "xlib": XlibBackend, "pil": PILBackend}
+
+
+def get_monitors():
+    """
+    Returns the monitors as (x, y, width, height) boxes in screen coordinates, from RandR.
+    Returns an empty list when they cannot be queried.
+    """
+    if X is None:
+        return []
+    try:
+        connection = xdisplay.Display()
+        try:
+            if not connection.has_extension("RANDR"):
+                return []
+            reply = connection.screen().root.xrandr_get_monitors(is_active=True)
+            return [(m.x, m.y, m.width_in_pixels, m.height_in_pixels) for m in reply.monitors]
+        finally:
+            connection.close()
+    except Exception:
+        return []
+
+
+def to_image(frame):
+    """
+    Converts a BGRX frame to an RGB PIL image.
+    """
+    frame = np.ascontiguousarray(frame)
+    height, width = frame.shape[:2]
+    return Image.frombuffer("RGB", (width, height), frame, "raw", "BGRX", 0, 1)
+
+
+class ScreenCapture:
+    """
+    Screen capture with region support and an optional continuous mode.
+    Frames are (height, width, 4) uint8 arrays in BGRX order. The backend is MIT-SHM
+    when available, then python3-xlib, then PIL. In continuous mode a thread keeps
+    the last `ring_frames` frames in a preallocated ring buffer.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        capture_config = config.get("capture", {})
+        self.preferred = capture_config.get("backend", "auto")
+        self.stream_fps = capture_config.get("stream_fps", 10)
+        self.ring_frames = capture_config.get("ring_frames", 8)
+        self.backend = None
+        self.monitor_boxes = None
+        self.lock = threading.Lock()
+        self.ring = None
+        self.timestamps = None
+        self.count = 0
+        self.stream_region = None
+        self.stream_thread = None
+        self.streaming = False
+
+    def get_backend(self):
+        if self.backend is None:
+            names = list(BACKENDS) if self.preferred == "auto" else [self.preferred]
+            for name in names:
+                try:
+                    self.backend = BACKENDS[name]()
+                    self.logger.info(f"Screen capture backend: {name}")
+                    break
+                except Exception as e:
+                    self.logger.warning(f"Screen capture backend {name} unavailable: {e}")
+            if self.backend is None:
+                raise RuntimeError("No screen capture backend available")
+        return self.backend
+
+    @property
+    def size(self):
+        return self.get_backend().size
+
+    def monitors(self):
+        """
+        Returns the monitor boxes, or the whole screen as one monitor.
+        """
+        if self.monitor_boxes is None:
+            self.monitor_boxes = get_monitors() or [(0, 0) + tuple(self.size)]
+        return self.monitor_boxes
+
+    def clip(self, region):
+        """
+        Clips an (x, y, width, height) region to the screen; None means the full screen.
+        """
+        screen_width, screen_height = self.size
+        if region is None:
+            return 0, 0, screen_width, screen_height
+        x, y, width, height = (int(value) for value in region)
+        x, y = max(0, min(x, screen_width - 1)), max(0, min(y, screen_height - 1))
+        return x, y, max(1, min(width, screen_width - x)), max(1, min(height, screen_height - y))
+
+    def grab(self, region=None, out=None):
+        """
+        Grabs the screen or a region into `out`, a preallocated (height, width, 4) array,
+        or into a new array when `out` is None.
+        """
+        x, y, width, height = self.clip(region)
+        with self.lock:
+            frame = self.get_backend().grab(x, y, width, height)
+            if out is None:
+                return frame.copy()
+            np.copyto(out, frame)
+            return out
+
+    def grab_image(self, region=None):
+        """
+        Returns the current screen (or region) as an RGB PIL image, taken from the
+        continuous ring buffer when it covers the requested region.
+        """
+        if self.streaming and self.clip(region) == self.stream_region:
+            frame, _ = self.latest()
+            if frame is not None:
+                return to_image(frame)
+        return to_image(self.grab(region))
+
+    def start_stream(self, region=None, fps=None, frames=None):
+        """
+        Starts continuous capture into a ring buffer of the last `frames` frames.
+        """
+        self.stop_stream()
+        self.stream_region = self.clip(region)
+        frames = frames or self.ring_frames
+        interval = 1.0 / (fps or self.stream_fps)
+        _, _, width, height = self.stream_region
+        self.ring = np.empty((frames, height, width, 4), dtype=np.uint8)
+        self.timestamps = np.zeros(frames)
+        self.count = 0
+        self.streaming = True
+
+        def run():
+            while self.streaming:
+                started = time.monotonic()
+                try:
+                    slot = self.count % len(self.ring)
+                    self.grab(self.stream_region, out=self.ring[slot])
+                    self.timestamps[slot] = started
+                    self.count += 1
+                except Exception as e:
+                    self.logger.error(f"Continuous capture stopped: {e}")
+                    self.streaming = False
+                    break
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+        self.stream_thread = threading.Thread(target=run, name="screen-capture", daemon=True)
+        self.stream_thread.start()
+        self.logger.info(f"Continuous capture started: region {self.stream_region}, {frames} frames.")
+
+    def stop_stream(self):
+        self.streaming = False
+        if self.stream_thread is not None:
+            self.stream_thread.join()
+            self.stream_thread = None
+
+    def latest(self, out=None):
+        """
+        Returns the newest ring buffer frame, copied into `out` (or a new array),
+        and its monotonic timestamp.
+        """
+        if self.ring is None or self.count == 0:
+            return None, None
+        with self.lock:
+            slot = (self.count - 1) % len(self.ring)
+            if out is None:
+                return self.ring[slot].copy(), self.timestamps[slot]
+            np.copyto(out, self.ring[slot])
+            return out, self.timestamps[slot]
+
+    def recent(self):
+        """
+        Returns copies of the buffered frames, oldest first, with their timestamps.
+        """
+        if self.ring is None:
+            return []
+        with self.lock:
+            available = min(self.count, len(self.ring))
+            slots = [(self.count - available + index) % len(self.ring) for index in range(available)]
+            return [(self.ring[slot].copy(), self.timestamps[slot]) for slot in slots]
+
+    def close(self):
+        self.stop_stream()
+        with self.lock:
+            if self.backend is not None:
+                self.backend.close()
+                self.backend = None
+
+
+_capture = None
+_capture_lock = threading.Lock()
+
+
+def get_screen_capture(config=None, logger=None):
+    """
+    Returns the process-wide ScreenCapture, creating it on first use.
+    """
+    global _capture
+    with _capture_lock:
+        if _capture is None:
+            _capture = ScreenCapture(config or {}, logger or logging.getLogger("ScreenCapture"))
+        return _capture
@@ -0,0 +1,279 @@
+import asyncio
+import threading
+
+try:
+    from Xlib import X, display, error
+    from Xlib.protocol import event as xevent
+except ImportError:
+    X = None
+
+# _NET_MOVERESIZE_WINDOW flags: x, y, width and height present, request from a pager/tool
+MOVERESIZE_FLAGS = (1 << 8) | (1 << 9) | (1 << 10) | (1 << 11) | (2 << 12)
+ATOM_NAMES = ("_NET_CLIENT_LIST", "_NET_WM_NAME", "_NET_WM_PID", "_NET_SUPPORTED", "_NET_MOVERESIZE_WINDOW",
+              "_NET_ACTIVE_WINDOW", "UTF8_STRING", "WM_NAME")
+
+
+class WindowInfo:
+    """
+    A top-level window: its X id, title, WM_CLASS (instance, class) and owning PID.
+    """
+
+    def __init__(self, window_id, title="", wm_class=(), pid=None):
+        self.id = window_id
+        self.title = title
+        self.wm_class = tuple(wm_class)
+        self.pid = pid
+
+    def matches(self, title=None, wm_class=None, pid=None):
+        """
+        Title is a case-insensitive substring; wm_class matches the instance or class name.
+        """
+        if title is not None and title.lower() not in self.title.lower():
+            return False
+        if wm_class is not None and wm_class.lower() not in (name.lower() for name in self.wm_class):
+            return False
+        if pid is not None and pid != self.pid:
+            return False
+        return True
+
+    def __repr__(self):
+        return f"WindowInfo(0x{self.id:x}, {self.title!r}, {self.wm_class}, pid={self.pid})"
+
+
+class WindowTracker:
+    """
+    Keeps a live index of top-level X11 windows by title, class and PID.
+    A background thread listens for X events (client list, map and title changes),
+    so `wait_for_window` resolves as soon as a matching window appears.
+    Uses the window manager's _NET_CLIENT_LIST when available and mapped root children otherwise.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.windows = {}
+        self.waiters = []
+        self.lock = threading.Lock()
+        self.request_lock = threading.Lock()
+        self.display = None
+        self.request_display = None
+        self.thread = None
+        self.running = False
+        self.ewmh = False
+        self.moveresize = False
+        self.active = None
+
+    @property
+    def available(self):
+        return self.running
+
+    def start(self):
+        """
+        Connects to the X server and starts the event thread. Returns False if X11 is unavailable.
+        """
+        if self.running:
+            return True
+        if X is None:
+            self.logger.warning("python3-xlib is not installed, window tracking disabled.")
+            return False
+        try:
+            self.display = display.Display()
+            self.request_display = display.Display()
+            self.atoms = {name: self.display.intern_atom(name) for name in ATOM_NAMES}
+            self.root = self.display.screen().root
+            self.root.change_attributes(event_mask=X.SubstructureNotifyMask | X.PropertyChangeMask)
+
+            supported = self.root.get_full_property(self.atoms["_NET_SUPPORTED"], X.AnyPropertyType)
+            supported = set(supported.value) if supported else set()
+            self.ewmh = self.atoms["_NET_CLIENT_LIST"] in supported
+            self.moveresize = self.atoms["_NET_MOVERESIZE_WINDOW"] in supported
+            self.scan()
+            self.read_active()
+        except Exception as e:
+            self.logger.warning(f"Window tracking disabled, cannot connect to the X server: {e}")
+            self.close()
+            return False
+
+        self.running = True
+        self.thread = threading.Thread(target=self.event_loop, name="window-tracker", daemon=True)
+        self.thread.start()
+        self.logger.info(f"Window tracker started with {len(self.windows)} windows.")
+        return True
+
+    def close(self):
+        self.running = False
+        for connection in (self.display, self.request_display):
+            if connection is not None:
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+        self.display = None
+        self.request_display = None
+
+    def window_ids(self):
+        with self.lock:
+            return set(self.windows)
+
+    def get(self, window_id):
+        with self.lock:
+            return self.windows.get(window_id)
+
+    def active_window(self):
+        """
+        Returns the window that has the focus, if it is tracked.
+        """
+        with self.lock:
+            return self.windows.get(self.active)
+
+    def find(self, title=None, wm_class=None, pid=None, exclude=()):
+        with self.lock:
+            return self._find(title, wm_class, pid, exclude)
+
+    def _find(self, title, wm_class, pid, exclude):
+        for info in self.windows.values():
+            if info.id not in exclude and info.matches(title, wm_class, pid):
+                return info
+        return None
+
+    async def wait_for_window(self, title=None, wm_class=None, pid=None, exclude=(), timeout=10.0):
+        """
+        Returns the first window matching the criteria, waiting until one maps.
+        Windows whose ids are in `exclude` (e.g. those open before a launch) are ignored.
+        Returns None on timeout.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        exclude = set(exclude)
+
+        def match(info):
+            return info.id not in exclude and info.matches(title, wm_class, pid)
+
+        with self.lock:
+            info = self._find(title, wm_class, pid, exclude)
+            if info is not None:
+                return info
+            waiter = (match, loop, future)
+            self.waiters.append(waiter)
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"No window matching title={title!r} class={wm_class!r} pid={pid} after {timeout}s.")
+            return None
+        finally:
+            with self.lock:
+                if waiter in self.waiters:
+                    self.waiters.remove(waiter)
+
+    def move_resize(self, window_id, x, y, width, height):
+        """
+        Moves and resizes a window through the window manager, or directly without one.
+        """
+        with self.request_lock:
+            connection = self.request_display
+            window = connection.create_resource_object("window", window_id)
+            if self.moveresize:
+                message = xevent.ClientMessage(
+                    window=window,
+                    client_type=self.atoms["_NET_MOVERESIZE_WINDOW"],
+                    data=(32, [MOVERESIZE_FLAGS, x, y, width, height]),
+                )
+                mask = X.SubstructureRedirectMask | X.SubstructureNotifyMask
+                connection.screen().root.send_event(message, event_mask=mask)
+            else:
+                window.configure(x=x, y=y, width=width, height=height)
+            connection.flush()
+
+    def read_window(self, window_id):
+        """
+        Reads a window's title, class and PID; returns None if it no longer exists.
+        """
+        window = self.display.create_resource_object("window", window_id)
+        try:
+            name = window.get_full_property(self.atoms["_NET_WM_NAME"], self.atoms["UTF8_STRING"])
+            title = name.value if name else window.get_wm_name()
+            if isinstance(title, bytes):
+                title = title.decode("utf-8", "replace")
+            pid = window.get_full_property(self.atoms["_NET_WM_PID"], X.AnyPropertyType)
+            info = WindowInfo(window_id, title or "", window.get_wm_class() or (), int(pid.value[0]) if pid else None)
+            # Follow title and map changes of the window itself
+            window.change_attributes(event_mask=X.PropertyChangeMask | X.StructureNotifyMask)
+            return info
+        except error.XError:
+            return None
+
+    def read_active(self):
+        active = self.root.get_full_property(self.atoms["_NET_ACTIVE_WINDOW"], X.AnyPropertyType)
+        self.active = int(active.value[0]) if active and len(active.value) else None
+
+    def top_level_ids(self):
+        if self.ewmh:
+            clients = self.root.get_full_property(self.atoms["_NET_CLIENT_LIST"], X.AnyPropertyType)
+            return list(clients.value) if clients else []
+        ids = []
+        for child in self.root.query_tree().children:
+            try:
+                if child.get_attributes().map_state == X.IsViewable:
+                    ids.append(child.id)
+            except error.XError:
+                continue
+        return ids
+
+    def scan(self):
+        """
+        Synchronizes the index with the current set of top-level windows.
+        """
+        current = self.top_level_ids()
+        with self.lock:
+            known = set(self.windows)
+        for window_id in known.difference(current):
+            self.remove(window_id)
+        for window_id in current:
+            if window_id not in known:
+                self.update(window_id)
+
+    def update(self, window_id):
+        info = self.read_window(window_id)
+        if info is None:
+            self.remove(window_id)
+            return
+        with self.lock:
+            self.windows[window_id] = info
+            ready = [(loop, future) for match, loop, future in self.waiters if match(info)]
+        for loop, future in ready:
+            loop.call_soon_threadsafe(self._resolve, future, info)
+
+    def remove(self, window_id):
+        with self.lock:
+            self.windows.pop(window_id, None)
+
+    @staticmethod
+    def _resolve(future, info):
+        if not future.done():
+            future.set_result(info)
+
+    def event_loop(self):
+        title_atoms = (self.atoms["_NET_WM_NAME"], self.atoms["WM_NAME"])
+        while self.running:
+            try:
+                event = self.display.next_event()
+                if event.type == X.PropertyNotify:
+                    if event.window.id == self.root.id:
+                        if event.atom == self.atoms["_NET_CLIENT_LIST"]:
+                            self.scan()
+                        elif event.atom == self.atoms["_NET_ACTIVE_WINDOW"]:
+                            self.read_active()
+                    elif event.atom in title_atoms and event.window.id in self.windows:
+                        self.update(event.window.id)
+                elif event.type == X.MapNotify and not self.ewmh:
+                    # Without a window manager, mapped root children are the top-level windows
+                    if event.event.id == self.root.id and not event.override:
+                        self.update(event.window.id)
+                elif event.type in (X.UnmapNotify, X.DestroyNotify) and not self.ewmh:
+                    self.remove(event.window.id)
+            except error.XError as e:
+                self.logger.debug(f"Ignoring X error in window tracker: {e}")
+            except Exception as e:
+                if self.running:
+                    self.logger.error(f"Window tracker stopped: {e}")
+                self.running = False
@@ -1,7 +1,13 @@
 import pyautogui
 
+from nexus_os.drivers.input_engine import get_input_engine
+
 def click(x=None, y=None):
-    if x is not None and y is not None:
+    # XTest input when an X server is available, pyautogui otherwise
+    engine = get_input_engine()
+    if engine.available:
+        engine.click(x, y)
+    elif x is not None and y is not None:
         pyautogui.click(x, y)
     else:
         pyautogui.click()
@@ -0,0 +1,229 @@
+import asyncio
+import threading
+
+import numpy as np
+import pyautogui
+
+from nexus_os.drivers.input_engine import FailSafeException, get_input_engine
+
+
+class PlanStep:
+    """
+    One click of an action plan: the target button and the screen region it occupies.
+    """
+
+    def __init__(self, label, x, y, width=0, height=0):
+        self.label = label
+        self.x = int(x)
+        self.y = int(y)
+        self.width = int(width or 0)
+        self.height = int(height or 0)
+
+    @classmethod
+    def from_button(cls, button):
+        try:
+            return cls(str(button.get("label") or ""), button["x"], button["y"], button.get("width"), button.get("height"))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+    def region(self, margin):
+        """
+        The target's box as (left, top, right, bottom), at least 2 * margin pixels wide and high.
+        """
+        half_width = max(self.width // 2, margin)
+        half_height = max(self.height // 2, margin)
+        return self.x - half_width, self.y - half_height, self.x + half_width, self.y + half_height
+
+    def __repr__(self):
+        return f"PlanStep({self.label!r} at {self.x},{self.y})"
+
+
+class PlanResult:
+    """
+    Outcome of a plan run: the steps completed, the step and reason it stopped at, if any,
+    and the buttons the vision model last reported, for escalating to the user.
+    """
+
+    def __init__(self, completed, failed=None, reason="", buttons=None):
+        self.completed = completed
+        self.failed = failed
+        self.reason = reason
+        self.buttons = buttons
+
+    @property
+    def ok(self):
+        return self.failed is None
+
+    def describe(self):
+        done = ", ".join(step.label or f"({step.x}, {step.y})" for step in self.completed) or "none"
+        if self.ok:
+            return f"Completed {len(self.completed)} clicks: {done}."
+        return f"Stopped at {self.failed.label or 'a button'} ({self.reason}) after {len(self.completed)} clicks: {done}."
+
+
+def fast_click(x, y):
+    """
+    Clicks through XTest, or with pyautogui without its move animation and per-call pause;
+    the fail-safe applies either way.
+    """
+    engine = get_input_engine()
+    if engine.available:
+        engine.click(x, y)
+    else:
+        pyautogui.click(x, y, _pause=False)
+
+
+class PlanExecutor:
+    """
+    Runs an ordered plan of clicks with fast input and cheap checks instead of a vision call
+    and a confirmation per click. Before a click the target region must still look as it
+    did when the plan was made; after it the screen must change. A failed check escalates
+    to the vision model to re-plan the remaining steps, and then to the user.
+    """
+
+    def __init__(self, config, logger, screen, run_blocking):
+        self.logger = logger
+        self.screen = screen
+        self.run_blocking = run_blocking
+        automation_config = config.get("automation", {})
+        self.max_steps = automation_config.get("max_steps", 5)
+        self.settle_timeout = automation_config.get("settle_timeout", 2.0)
+        self.poll_interval = automation_config.get("poll_interval", 0.05)
+        self.change_threshold = automation_config.get("change_threshold", 24)
+        self.min_changed_fraction = automation_config.get("min_changed_fraction", 0.002)
+        self.region_margin = automation_config.get("region_margin", 8)
+        self.subsample = automation_config.get("subsample", 4)
+        # Polled frames are grabbed into one reused buffer instead of a new array each time;
+        # plans run as separate tasks poll from executor threads, so the buffer is locked
+        self.frame = None
+        self.frame_lock = threading.Lock()
+
+    def signature(self):
+        """
+        Grabs the screen as a subsampled green-channel array, cheap enough to poll.
+        """
+        width, height = self.screen.size
+        with self.frame_lock:
+            if self.frame is None or self.frame.shape[:2] != (height, width):
+                self.frame = np.empty((height, width, 4), dtype=np.uint8)
+            frame = self.screen.grab(out=self.frame)
+            # astype copies, so the signature does not share the buffer
+            return frame[::self.subsample, ::self.subsample, 1].astype(np.int16)
+
+    def changed(self, before, after, box=None):
+        if before.shape != after.shape:
+            return True
+        if box is not None:
+            left, top, right, bottom = (max(0, value // self.subsample) for value in box)
+            before, after = before[top:bottom + 1, left:right + 1], after[top:bottom + 1, left:right + 1]
+            if before.size == 0:
+                return False
+        changed = np.abs(after - before) > self.change_threshold
+        return changed.mean() > self.min_changed_fraction
+
+    async def wait_for_change(self, before):
+        """
+        Waits until the screen differs from `before` and then stops changing.
+        Returns the settled signature, or None if nothing changed before the timeout.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.settle_timeout
+        previous, seen_change = before, False
+        while loop.time() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            current = await self.run_blocking(self.signature)
+            if seen_change and not self.changed(previous, current):
+                return current
+            seen_change = seen_change or self.changed(before, current)
+            previous = current
+        return previous if seen_change else None
+
+    async def replan(self, steps, locate):
+        """
+        Asks the vision model for the current buttons and maps the steps onto them by label.
+        Steps whose button is no longer visible are dropped. Returns the steps and the buttons.
+        """
+        buttons = await locate()
+        by_label = {str(button.get("label") or "").strip().lower(): button for button in buttons}
+        replanned = []
+        for step in steps:
+            button = by_label.get(step.label.strip().lower()) if step.label else None
+            new_step = PlanStep.from_button(button) if button else None
+            if new_step is None:
+                self.logger.info(f"{step} is no longer on screen, dropping it.")
+                continue
+            replanned.append(new_step)
+        return replanned, buttons
+
+    async def run(self, buttons, locate, should_stop=lambda: False):
+        """
+        Executes the buttons (an async iterator, consumed as it produces them) as a plan.
+        `locate()` returns the buttons currently on screen and is only called on failed checks.
+        """
+        screen_width, screen_height = self.screen.size
+        planned = await self.run_blocking(self.signature)
+        queue, completed, clicked = [], [], set()
+        source, step = buttons, None
+
+        async def next_step():
+            nonlocal source
+            if queue:
+                return queue.pop(0)
+            while source is not None:
+                try:
+                    step = PlanStep.from_button(await source.__anext__())
+                except StopAsyncIteration:
+                    source = None
+                    break
+                if step and 0 <= step.x < screen_width and 0 <= step.y < screen_height and (step.x, step.y) not in clicked:
+                    return step
+            return None
+
+        async def stop_source():
+            nonlocal source
+            if source is not None and hasattr(source, "aclose"):
+                await source.aclose()
+            source = None
+
+        try:
+            while len(completed) < self.max_steps and not should_stop():
+                step = await next_step()
+                if step is None:
+                    break
+
+                # Pre-condition: the target still looks as it did when it was planned
+                current = await self.run_blocking(self.signature)
+                if self.changed(planned, current, step.region(self.region_margin)):
+                    self.logger.info(f"Screen changed under {step}, re-planning with the vision model.")
+                    rest = [step] + queue
+                    await stop_source()
+                    queue[:], buttons = await self.replan(rest, locate)
+                    planned = current = await self.run_blocking(self.signature)
+                    if not queue:
+                        return PlanResult(completed, step, "target no longer on screen", buttons)
+                    step = queue.pop(0)
+
+                self.logger.info(f"Clicking {step}.")
+                await self.run_blocking(fast_click, step.x, step.y)
+                clicked.add((step.x, step.y))
+
+                # Post-condition: the click had a visible effect
+                settled = await self.wait_for_change(current)
+                if settled is None:
+                    self.logger.info(f"No visible effect after {step}, checking with the vision model.")
+                    await stop_source()
+                    retry, buttons = await self.replan([step], locate)
+                    if retry and (retry[0].x, retry[0].y) != (step.x, step.y):
+                        step = retry[0]
+                        await self.run_blocking(fast_click, step.x, step.y)
+                        clicked.add((step.x, step.y))
+                        settled = await self.wait_for_change(current)
+                    if settled is None:
+                        return PlanResult(completed, step, "no visible effect", buttons)
+                completed.append(step)
+            return PlanResult(completed)
+        except (pyautogui.FailSafeException, FailSafeException):
+            self.logger.error("Fail-safe triggered, stopping the plan.")
+            return PlanResult(completed, step, "fail-safe triggered")
+        finally:
+            await stop_source()
@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    key TEXT PRIMARY KEY,
+    prompt TEXT NOT NULL,
+    params TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS artifacts_access ON artifacts (last_access);
+"""
+
+# Image responses refer to stored variants as artifact://<key>/<variant>
+ARTIFACT_SCHEME = "artifact://"
+
+
+def artifact_key(params):
+    """
+    Returns the content address of an artifact: the SHA-256 of its canonical JSON parameters.
+    """
+    return hashlib.sha256(json.dumps(params, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class ArtifactRef:
+    """
+    A stored artifact: its key and the files of its variants.
+    """
+
+    def __init__(self, key, directory, cached=False):
+        self.key = key
+        self.directory = directory
+        self.cached = cached
+
+    def path(self, variant="original"):
+        return os.path.join(self.directory, f"{variant}.png")
+
+    def uri(self, variant="original"):
+        return f"{ARTIFACT_SCHEME}{self.key}/{variant}"
+
+
+class ArtifactStore:
+    """
+    Content-addressed store for generated images. Each artifact is a directory of variant
+    files named after its key, and a SQLite index keeps its metadata, size and last access.
+    An artifact is only served once it is committed; committing evicts the least recently
+    used artifacts until the store fits in its quota. Directories that were never committed
+    (a crash between writing and committing) are swept when the store is opened, once they
+    are older than `sweep_after` seconds.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        artifact_config = config.get("artifacts", {})
+        self.root = artifact_config.get("root", "nexus_os/data/artifacts")
+        self.path = artifact_config.get("db", "nexus_os/data/artifacts.db")
+        self.quota = int(artifact_config.get("quota_mb", 1024) * 1024 * 1024)
+        self.sweep_after = artifact_config.get("sweep_after", 3600)
+        self.lock = threading.Lock()
+        self.connection = None
+
+    def connect(self):
+        if self.connection is None:
+            os.makedirs(self.root, exist_ok=True)
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.executescript(SCHEMA)
+            self.sweep()
+        return self.connection
+
+    def ref(self, key, cached=False):
+        return ArtifactRef(key, os.path.join(self.root, key[:2], key), cached)
+
+    def lookup(self, key):
+        """
+        Returns the committed artifact for a key, marking it as used, or None.
+        """
+        with self.lock:
+            connection = self.connect()
+            if connection.execute("SELECT 1 FROM artifacts WHERE key = ?", (key,)).fetchone() is None:
+                return None
+            ref = self.ref(key, cached=True)
+            if not os.path.isdir(ref.directory):
+                # Removed behind the index's back
+                connection.execute("DELETE FROM artifacts WHERE key = ?", (key,))
+                connection.commit()
+                return None
+            connection.execute(
+                "UPDATE artifacts SET last_access = ?, hits = hits + 1 WHERE key = ?", (time.time(), key)
+            )
+            connection.commit()
+        self.logger.info(f"Artifact {key[:12]} served from the store.")
+        return ref
+
+    def write(self, ref, variant, data):
+        """
+        Writes one variant of an artifact; readers never see a partly written file.
+        """
+        os.makedirs(ref.directory, exist_ok=True)
+        path = ref.path(variant)
+        temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temporary, "wb") as f:
+            f.write(data)
+        os.replace(temporary, path)
+        return path
+
+    def commit(self, ref, prompt, params):
+        """
+        Indexes a fully written artifact and evicts others to stay within the quota.
+        """
+        size = sum(entry.stat().st_size for entry in os.scandir(ref.directory) if entry.is_file())
+        now = time.time()
+        with self.lock:
+            connection = self.connect()
+            connection.execute(
+                """
+                INSERT INTO artifacts (key, prompt, params, size, created, last_access)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (key) DO UPDATE SET size = excluded.size, last_access = excluded.last_access
+                """,
+                (ref.key, prompt, json.dumps(params, sort_keys=True), size, now, now),
+            )
+            connection.commit()
+            self.evict(keep=ref.key)
+        return ref
+
+    def evict(self, keep=None):
+        """
+        Deletes the least recently used artifacts until the total size fits in the quota.
+        Must be called with the lock held.
+        """
+        connection = self.connect()
+        total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+        if total <= self.quota:
+            return
+        evicted = []
+        for row in connection.execute("SELECT key, size FROM artifacts ORDER BY last_access").fetchall():
+            if total <= self.quota:
+                break
+            if row["key"] == keep:
+                continue
+            shutil.rmtree(self.ref(row["key"]).directory, ignore_errors=True)
+            evicted.append((row["key"],))
+            total -= row["size"]
+        connection.executemany("DELETE FROM artifacts WHERE key = ?", evicted)
+        connection.commit()
+        self.logger.info(f"Evicted {len(evicted)} artifacts, {total / 1024 / 1024:.1f} MB in the store.")
+
+    def sweep(self):
+        """
+        Deletes artifact directories missing from the index, unless they may still be in progress.
+        Must be called with the lock held.
+        """
+        indexed = {row[0] for row in self.connection.execute("SELECT key FROM artifacts")}
+        cutoff = time.time() - self.sweep_after
+        swept = 0
+        for prefix in os.scandir(self.root):
+            if not prefix.is_dir():
+                continue
+            for entry in os.scandir(prefix.path):
+                if entry.is_dir() and entry.name not in indexed and entry.stat().st_mtime < cutoff:
+                    shutil.rmtree(entry.path, ignore_errors=True)
+                    swept += 1
+        if swept:
+            self.logger.info(f"Swept {swept} uncommitted artifact directories.")
+
+    def resolve(self, uri):
+        """
+        Returns the file path of an artifact:// reference, or None if it is not a valid one.
+        """
+        if not uri.startswith(ARTIFACT_SCHEME):
+            return None
+        key, _, variant = uri[len(ARTIFACT_SCHEME):].partition("/")
+        variant = variant or "original"
+        # Keys are hex digests and variants plain names, so a reference cannot leave the store
+        if len(key) != 64 or not all(c in "0123456789abcdef" for c in key) \
+                or not variant.replace("_", "").isalnum():
+            return None
+        return self.ref(key).path(variant)
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store(config=None, logger=None):
+    """
+    Returns the process-wide ArtifactStore, creating it on first use.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(config or {}, logger or logging.getLogger("ArtifactStore"))
+        return _store
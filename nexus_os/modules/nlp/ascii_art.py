@@ -0,0 +1,211 @@
+import math
+import threading
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+DEFAULT_CHAR_SET = "@%#*+=-:. "
+CHAR_SIZE = (6, 12)
+
+_atlases = {}
+_atlases_lock = threading.Lock()
+
+
+def load_font(font):
+    """
+    Returns the font for a (path, size) tuple, or None for PIL's default font.
+    """
+    return None if font is None else ImageFont.truetype(font[0], font[1])
+
+
+def cell_edges(length, cells, cell_size, rounding="round"):
+    """
+    Returns the cells + 1 pixel edges of cells of a float size along an axis, as PIL computes
+    them for crop boxes: rounded ("round"), or truncated and clipped to the length ("floor").
+    """
+    if rounding == "round":
+        edges = [round(index * cell_size) for index in range(cells + 1)]
+    else:
+        edges = [int(min(index * cell_size, length)) for index in range(cells + 1)]
+    return np.clip(np.array(edges, dtype=np.int64), 0, length)
+
+
+class GlyphAtlas:
+    """
+    Pre-rendered glyph coverage masks for a font, cell size and character set.
+    A glyph can spill into neighbouring cells, so each mask is split into cell-sized tiles
+    keyed by the (row, column) offset of the cell it covers relative to its own.
+    """
+
+    def __init__(self, font, char_size, char_set):
+        char_width, char_height = char_size
+        pad = 2 * max(char_width, char_height)
+        masks = []
+        for char in char_set:
+            # White ink on black yields the coverage mask itself
+            canvas = Image.new("RGB", (char_width + 2 * pad, char_height + 2 * pad), (0, 0, 0))
+            ImageDraw.Draw(canvas).text((pad, pad), char, fill=(255, 255, 255), font=load_font(font))
+            masks.append(np.asarray(canvas)[..., 0])
+
+        ys, xs = np.nonzero(np.any(np.stack(masks), axis=0))
+        self.tiles = {}
+        if len(xs) == 0:
+            return
+        for row in range(math.floor((ys.min() - pad) / char_height), math.floor((ys.max() - pad) / char_height) + 1):
+            for column in range(math.floor((xs.min() - pad) / char_width), math.floor((xs.max() - pad) / char_width) + 1):
+                top, left = pad + row * char_height, pad + column * char_width
+                # The last tile is empty, for cells outside the grid
+                tiles = np.zeros((len(char_set) + 1, char_height, char_width), dtype=np.uint16)
+                for index, mask in enumerate(masks):
+                    tiles[index] = mask[top:top + char_height, left:left + char_width]
+                covered = np.nonzero(tiles.any(axis=(0, 2)))[0]
+                if len(covered):
+                    # Only the covered pixel rows of the tiles are blended
+                    top, bottom = covered.min(), covered.max() + 1
+                    self.tiles[(row, column)] = (top, bottom, tiles[:, top:bottom])
+
+
+def get_glyph_atlas(font, char_size, char_set):
+    key = (font, tuple(char_size), char_set)
+    with _atlases_lock:
+        if key not in _atlases:
+            _atlases[key] = GlyphAtlas(font, char_size, char_set)
+        return _atlases[key]
+
+
+def cell_colors(pixels, row_edges, col_edges):
+    """
+    Returns the mean RGB of every cell, truncated to integers, as np.mean of each crop would.
+    Rows of cells are summed as contiguous bands, then split into cells with one reduceat.
+    """
+    counts = np.maximum(np.diff(row_edges)[:, None] * np.diff(col_edges)[None, :], 1)
+    dtype = np.int32 if counts.max() * 255 < 2 ** 31 else np.int64
+    bands = np.stack([
+        pixels[top:bottom, :col_edges[-1]].sum(axis=0, dtype=dtype)
+        for top, bottom in zip(row_edges[:-1], row_edges[1:])
+    ])
+    sums = np.add.reduceat(bands, col_edges[:-1], axis=1)
+    return (sums / counts[..., None]).astype(np.int64)
+
+
+def shifted(array, row, column, fill):
+    """
+    Returns array[i - row, j - column] for every cell (i, j), `fill` where that is outside.
+    """
+    result = np.full_like(array, fill)
+    rows, columns = array.shape[:2]
+    if abs(row) < rows and abs(column) < columns:
+        result[max(row, 0):rows + min(row, 0), max(column, 0):columns + min(column, 0)] = \
+            array[max(-row, 0):rows - max(row, 0), max(-column, 0):columns - max(column, 0)]
+    return result
+
+
+def render_ascii(image, num_cols=100, scale=2, bg_code=(0, 0, 0), char_set=DEFAULT_CHAR_SET,
+                 color_mode="original", font=None, char_size=CHAR_SIZE, rounding="round"):
+    """
+    Renders an image as ASCII art and returns the new image.
+    Cells are `scale` times as tall as they are wide; `font` is a (path, size) tuple or None
+    for PIL's default font. The result is identical to drawing each character with
+    ImageDraw.text, including where glyphs overlap their neighbours.
+    """
+    pixels = render_ascii_array(np.asarray(image.convert("RGB")), num_cols, scale, bg_code, char_set,
+                                color_mode, font, char_size, rounding)
+    return Image.fromarray(pixels, "RGB")
+
+
+def render_ascii_array(pixels, num_cols=100, scale=2, bg_code=(0, 0, 0), char_set=DEFAULT_CHAR_SET,
+                       color_mode="original", font=None, char_size=CHAR_SIZE, rounding="round"):
+    """
+    Renders a (height, width, 3) RGB array as ASCII art and returns the new array; see render_ascii.
+    """
+    num_chars = len(char_set)
+    char_width, char_height = char_size
+    height, width = pixels.shape[:2]
+    cell_width = width / num_cols
+    cell_height = scale * cell_width
+    num_rows = int(height / cell_height)
+
+    colors = cell_colors(
+        pixels,
+        cell_edges(height, num_rows, cell_height, rounding),
+        cell_edges(width, num_cols, cell_width, rounding),
+    )
+    intensity = colors.sum(axis=-1, dtype=np.float64) / 3
+    indices = np.clip(((intensity / 255) * num_chars).astype(np.int64), 0, num_chars - 1)
+    if color_mode != "original":
+        colors = np.broadcast_to(np.array((255, 0, 0), dtype=np.int64), colors.shape)
+
+    # Channels first, so the arithmetic runs along whole pixel rows of the output.
+    # uint16 holds the largest intermediate of the blend, 255 * 255 + 128 + 254.
+    out_width = num_cols * char_width
+    out = np.empty((3, num_rows, char_height, out_width), dtype=np.uint16)
+    out[...] = np.array(bg_code, dtype=np.uint16)[:, None, None, None]
+    colors = colors.astype(np.uint16)
+    atlas = get_glyph_atlas(font, char_size, char_set)
+    # Blend in drawing order: a cell's pixels are covered first by glyphs of earlier cells
+    for row, column in sorted(atlas.tiles, reverse=True):
+        top, bottom, tiles = atlas.tiles[(row, column)]
+        masks = tiles[shifted(indices, row, column, num_chars)]
+        masks = masks.transpose(0, 2, 1, 3).reshape(1, num_rows, bottom - top, out_width)
+        ink = np.repeat(shifted(colors, row, column, 0), char_width, axis=1).transpose(2, 0, 1)[:, :, None, :]
+        region = out[:, :, top:bottom]
+        # PIL's BLEND: (out * (255 - mask) + ink * mask) / 255, rounded
+        blended = region * (255 - masks)
+        blended += ink * masks
+        blended += 128
+        region[...] = ((blended >> 8) + blended) >> 8
+
+    return out.transpose(1, 2, 3, 0).reshape(num_rows * char_height, out_width, 3).astype(np.uint8)
+
+
+def _render_ascii_loop(image, num_cols=100, scale=2, bg_code=(0, 0, 0), char_set=DEFAULT_CHAR_SET,
+                       color_mode="original"):
+    """
+    The original per-cell renderer, kept as the reference for benchmark_render.
+    """
+    num_chars = len(char_set)
+    width, height = image.size
+    cell_width = width / num_cols
+    cell_height = scale * cell_width
+    num_rows = int(height / cell_height)
+
+    char_width, char_height = CHAR_SIZE
+    out_image = Image.new("RGB", (char_width * num_cols, char_height * num_rows), bg_code)
+    draw = ImageDraw.Draw(out_image)
+
+    for i in range(num_rows):
+        for j in range(num_cols):
+            crop = image.crop(
+                (j * cell_width, i * cell_height, (j + 1) * cell_width, (i + 1) * cell_height)
+            )
+            avg_color = tuple(np.array(crop).mean(axis=(0, 1)).astype(int))
+            intensity = np.mean(avg_color)
+            char = char_set[min(int((intensity / 255) * num_chars), num_chars - 1)]
+            fill_color = avg_color if color_mode == "original" else (255, 0, 0)
+            draw.text((j * char_width, i * char_height), char, fill=fill_color)
+    return out_image
+
+
+def benchmark_render(size=(1024, 1024), num_cols=100, iterations=5):
+    """
+    Times the per-cell and the vectorized renderer on a random image and checks that
+    their outputs are identical. Returns {name: milliseconds per image}.
+    """
+    rng = np.random.default_rng(0)
+    image = Image.fromarray(rng.integers(0, 256, (size[1], size[0], 3), dtype=np.uint8), "RGB")
+    if not np.array_equal(np.asarray(render_ascii(image, num_cols)), np.asarray(_render_ascii_loop(image, num_cols))):
+        raise AssertionError("Vectorized ASCII output differs from the per-cell renderer")
+
+    results = {}
+    for name, func in (("per-cell loop", _render_ascii_loop), ("vectorized", render_ascii)):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            func(image, num_cols)
+        results[name] = (time.perf_counter() - started) / iterations * 1e3
+    return results
+
+
+if __name__ == "__main__":
+    for name, millis in benchmark_render().items():
+        print(f"{name:>14}: {millis:.1f} ms/image")
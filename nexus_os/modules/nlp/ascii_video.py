@@ -0,0 +1,206 @@
+import math
+import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from nexus_os.modules.nlp.ascii_art import CHAR_SIZE, DEFAULT_CHAR_SET, render_ascii_array
+
+VIDEO_FONT = "DejaVuSansMono-Bold.ttf"
+
+# Shared frame buffers and render options of a worker process, set by attach_slots
+_worker = {}
+
+
+class FrameSlots:
+    """
+    A fixed set of shared-memory buffers, each holding one decoded frame and its rendered
+    output. Frames move between processes by slot number instead of being pickled, and the
+    number of slots bounds the frames in flight.
+    """
+
+    def __init__(self, count, in_shape, out_shape):
+        self.in_shape = in_shape
+        self.out_shape = out_shape
+        self.blocks = []
+        try:
+            for _ in range(count):
+                self.blocks.append((
+                    shared_memory.SharedMemory(create=True, size=math.prod(in_shape)),
+                    shared_memory.SharedMemory(create=True, size=math.prod(out_shape)),
+                ))
+        except Exception:
+            self.close()
+            raise
+
+    def names(self):
+        return [(frame.name, output.name) for frame, output in self.blocks]
+
+    def frame(self, slot):
+        return np.ndarray(self.in_shape, dtype=np.uint8, buffer=self.blocks[slot][0].buf)
+
+    def output(self, slot):
+        return np.ndarray(self.out_shape, dtype=np.uint8, buffer=self.blocks[slot][1].buf)
+
+    def close(self):
+        for block in (block for pair in self.blocks for block in pair):
+            block.close()
+            block.unlink()
+        self.blocks = []
+
+
+def render_frame(frame, options):
+    """
+    Renders a BGR frame as ASCII art, resized to the output size if one is set.
+    """
+    output_size = options.get("output_size")
+    options = {key: value for key, value in options.items() if key != "output_size"}
+    rendered = render_ascii_array(frame[..., ::-1], **options)
+    if output_size and (rendered.shape[1], rendered.shape[0]) != tuple(output_size):
+        rendered = cv2.resize(rendered, tuple(output_size), interpolation=cv2.INTER_AREA)
+    return rendered
+
+
+def attach_slots(names, in_shape, out_shape, options):
+    """
+    Worker initializer: attaches the shared frame buffers by name.
+    """
+    _worker["blocks"] = [
+        (shared_memory.SharedMemory(name=frame), shared_memory.SharedMemory(name=output))
+        for frame, output in names
+    ]
+    _worker["shapes"] = (in_shape, out_shape)
+    _worker["options"] = options
+
+
+def render_slot(slot):
+    frame_block, output_block = _worker["blocks"][slot]
+    in_shape, out_shape = _worker["shapes"]
+    frame = np.ndarray(in_shape, dtype=np.uint8, buffer=frame_block.buf)
+    output = np.ndarray(out_shape, dtype=np.uint8, buffer=output_block.buf)
+    output[...] = render_frame(frame, _worker["options"])
+    return slot
+
+
+def read_frames(capture, frame_skip=1):
+    """
+    Yields every `frame_skip`-th frame; skipped frames are grabbed without being decoded.
+    """
+    index = 0
+    while capture.isOpened():
+        if index % frame_skip:
+            if not capture.grab():
+                break
+        else:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            yield frame
+        index += 1
+
+
+def write_parallel(capture, writer, frame_skip, in_shape, out_shape, options, workers, max_in_flight):
+    """
+    Streams frames through a process pool: this thread decodes into free slots, the workers
+    render, and a writer thread writes the results in frame order and frees their slots.
+    Memory stays at `max_in_flight` frames whatever the length of the video.
+    """
+    slots = FrameSlots(max_in_flight, in_shape, out_shape)
+    free = queue.Queue()
+    for slot in range(max_in_flight):
+        free.put(slot)
+    pending = queue.Queue()
+    errors = []
+
+    def write():
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            future, slot = item
+            try:
+                future.result()
+                if not errors:
+                    writer.write(slots.output(slot))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                free.put(slot)
+
+    writer_thread = threading.Thread(target=write, name="ascii-video-writer", daemon=True)
+    writer_thread.start()
+    try:
+        with ProcessPoolExecutor(
+            workers, initializer=attach_slots, initargs=(slots.names(), in_shape, out_shape, options)
+        ) as pool:
+            try:
+                for frame in read_frames(capture, frame_skip):
+                    slot = free.get()
+                    if errors:
+                        break
+                    if frame.shape != in_shape:
+                        frame = cv2.resize(frame, (in_shape[1], in_shape[0]))
+                    np.copyto(slots.frame(slot), frame)
+                    pending.put((pool.submit(render_slot, slot), slot))
+            finally:
+                pending.put(None)
+                writer_thread.join()
+    finally:
+        slots.close()
+    if errors:
+        raise errors[0]
+
+
+def generate_ascii_video(input_path, output_path, num_cols=100, scale=1, bg_color="black",
+                         char_set=DEFAULT_CHAR_SET, fps=0, workers=None, frame_skip=1, output_size=None,
+                         max_in_flight=None):
+    """
+    Converts a video or GIF to an animated ASCII video.
+    Frames are rendered by `workers` processes (all cores by default; 1 renders inline).
+    `frame_skip` keeps every n-th frame at a proportionally lower frame rate, and
+    `output_size` (width, height) resizes the rendered frames.
+    """
+    bg_code = (255, 255, 255) if bg_color == "white" else (0, 0, 0)
+    frame_skip = max(1, int(frame_skip))
+
+    capture = cv2.VideoCapture(input_path)
+    if not capture.isOpened():
+        raise RuntimeError(f"Cannot open video: {input_path}")
+    if fps == 0:
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25
+
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    char_width, char_height = CHAR_SIZE
+    cell_width = width / num_cols
+    num_rows = int(height / (2 * cell_width))
+    frame_size = tuple(output_size) if output_size else (char_width * num_cols, char_height * num_rows)
+
+    options = {
+        "num_cols": num_cols,
+        "scale": 2,
+        "bg_code": bg_code,
+        "char_set": char_set,
+        "font": (VIDEO_FONT, int(10 * scale)),
+        "rounding": "floor",
+        "output_size": output_size,
+    }
+    fourcc = cv2.VideoWriter_fourcc(*"XVID")
+    writer = cv2.VideoWriter(output_path, fourcc, fps / frame_skip, frame_size)
+    workers = workers or os.cpu_count() or 1
+    try:
+        if workers <= 1:
+            for frame in read_frames(capture, frame_skip):
+                writer.write(render_frame(frame, options))
+        else:
+            write_parallel(
+                capture, writer, frame_skip, (height, width, 3), (frame_size[1], frame_size[0], 3),
+                options, workers, max_in_flight or 2 * workers,
+            )
+    finally:
+        capture.release()
+        writer.release()
@@ -1,24 +1,39 @@
 import asyncio
 import re
 import subprocess
+import threading
 import pyautogui
-import time
-import requests
-import base64
-import sqlite3
-from PIL import ImageGrab
-from langchain_ollama import OllamaLLM
-from nexus_os.modules.nlp.process import parse_command
-from nexus_os.modules.nlp.internal_mind import analyze_conversation
-from nexus_os.modules.nlp.image_generator import generate_image_and_ascii_base64
-import json
+import aiohttp
+from nexus_os.core.clients import get_clients
+from nexus_os.core.tasks import TaskManager
+from nexus_os.modules.automation.planner import PlanExecutor
+from nexus_os.drivers.input_engine import get_input_engine
+from nexus_os.drivers.screen import get_screen_capture
+from nexus_os.drivers.windows import WindowTracker
+from nexus_os.modules.nlp.process import parse_command, registry
+from nexus_os.modules.nlp.internal_mind import analyze_conversation, anticipate_conversation
+from nexus_os.modules.nlp.artifact_store import ARTIFACT_SCHEME, get_artifact_store
+from nexus_os.modules.nlp.image_generator import build_payload, lookup_image, store_image
+from nexus_os.modules.nlp.image_jobs import ImageJobQueue
+from nexus_os.modules.nlp.generation import StopCondition, get_generation_profile
+from nexus_os.modules.nlp.pipeline import StageGraph, SpeculativeThought
+from nexus_os.modules.nlp.response_cache import ResponseCache, context_fingerprint
+from nexus_os.modules.nlp.memory_index import MemoryIndex
+from nexus_os.modules.nlp.context_store import ContextStore
+from nexus_os.modules.nlp.prompt_builder import PromptBuilder, RollingSummary
+from nexus_os.modules.vision.change_detection import VisionCache
+from nexus_os.modules.vision.detector import LABEL_PROMPT, ElementDetector
+from nexus_os.modules.vision.element_memory import ElementMemory
+from nexus_os.modules.vision.encoding import encode_image, get_encoding_options, load_image
+from nexus_os.modules.vision.stream_parser import JSONObjectStream, iter_ndjson_text, parse_button, unwrap_entries
+from nexus_os.modules.vision.tiling import TilePlanner
 import logging
 import sys
 
 class ChatModule:
     def __init__(self, config, logger):
         """
-        Initializes the ChatModule with AI model, configuration, and SQLite database.
+        Initializes the ChatModule with AI model, configuration, and the SQLite context store.
         """
         self.config = config
         self.logger = logger
@@ -26,44 +41,106 @@ class ChatModule:
         self.model_host = config["ai_model"]["host"]
         self.bakllava_model = config["vision_model"]["name"]
         self.bakllava_host = config["vision_model"]["host"]
+        self.vision_encoding = get_encoding_options(config)
+        self.screen = get_screen_capture(config, logger)
+        if config.get("capture", {}).get("continuous", False):
+            # Screenshots are then served from the ring buffer without a grab per request
+            self.screen.start_stream()
+        self.input = get_input_engine(config, logger)
+        self.vision_cache = VisionCache(config, logger)
+        self.detector = ElementDetector(config, logger)
+        self.element_memory = ElementMemory(config, logger)
+        self.tiler = TilePlanner(config, logger)
         self.max_tokens = config["ai_model"]["max_tokens"]
         self.temperature = config["ai_model"]["temperature"]
 
+        # Shared, pooled clients for the model backends
+        self.clients = get_clients(config)
+
         # Initialize the Ollama LLM for natural language processing
-        self.llm = OllamaLLM(
-            model=self.model_name,
-            max_tokens=self.max_tokens,
-            host=self.model_host,
-            temperature=self.temperature,
-        )
+        self.llm = self.get_llm("chat")
+
+        # Optional cache of chat responses for repeated and near-duplicate questions
+        self.response_cache = ResponseCache(config, logger)
+
+        # Initialize the SQLite context store
+        self.store = ContextStore(config, logger)
+        self.db_path = self.store.path
+
+        # Long-term memory: vector index over stored turns, persisted next to the database
+        memory_config = config.get("memory", {})
+        self.memory_enabled = memory_config.get("enabled", True)
+        self.recent_turns = memory_config.get("recent_turns", 2)
+        self.relevant_turns = memory_config.get("relevant_turns", 3)
+        self.min_similarity = memory_config.get("min_similarity", 0.3)
+        self.memory_index = None
+        if self.memory_enabled:
+            self.memory_index = MemoryIndex(
+                self.db_path,
+                logger,
+                embedding_model=memory_config.get("embedding_model", "all-MiniLM-L6-v2"),
+                save_every=memory_config.get("save_every", 20),
+            )
+            # Turns are indexed once written, under the ids they are stored with
+            self.store.flush_hooks.append(self.index_flushed_turns)
+            # Turns pruned from the store are dropped from the index as well
+            self.store.prune_hooks.append(
+                lambda turn_ids: self.clients.executor.submit(self.memory_index.remove_ids, turn_ids)
+            )
+            # A full backfill can take minutes, so it runs on its own thread rather than the shared executor
+            threading.Thread(target=self.index_missing_turns, name="memory-backfill", daemon=True).start()
+
+        # Token-budgeted prompt assembly with a rolling summary of older turns
+        self.prompt_builder = PromptBuilder(config, logger)
+        self.summary = RollingSummary(config, self.store, self.clients, logger, self.recent_turns)
 
-        # Initialize SQLite database
-        self.db_connection = sqlite3.connect('chat_module.db', check_same_thread=False)
-        self.db_cursor = self.db_connection.cursor()
-        self.setup_database()
+        # Internal mind scheduling: "inline", "speculative" or "off"
+        mind_config = config.get("internal_mind", {})
+        self.thought_mode = mind_config.get("mode", "inline")
+        self.thought_timeout = mind_config.get("timeout", 3.0)
+        self.speculative_max_age = mind_config.get("speculative_max_age", 300)
+        self.speculative_thought = None
 
         # Auto-interaction control flag and queue
         self.stop_auto_interact = False
         self.awaiting_user_input = False
         self.interaction_queue = []
 
-    def setup_database(self):
+        # "plan" runs the detected buttons as a checked plan; "confirm" asks the user after each click
+        self.click_mode = config.get("automation", {}).get("mode", "plan")
+        self.planner = PlanExecutor(config, logger, self.screen, self.run_blocking)
+
+        # Long-running direct commands run as cancellable background tasks
+        self.tasks = TaskManager(logger)
+
+        # Stable Diffusion requests are queued, batched and report progress with live previews
+        self.image_jobs = ImageJobQueue(config, logger, self.clients)
+        # Generated images are kept in a content-addressed store; responses refer to them by URI
+        self.artifacts = get_artifact_store(config, logger)
+
+        # Live index of top-level windows, used to wait for and arrange application windows
+        window_config = config.get("windows", {})
+        self.window_timeout = window_config.get("wait_timeout", 15.0)
+        self.windows = WindowTracker(logger)
+        if window_config.get("tracking_enabled", True):
+            self.windows.start()
+
+        # Handlers for the direct commands recognized by parse_command
+        self.register_command_handlers()
+
+    def get_llm(self, response_type):
         """
-        Sets up the SQLite database with necessary tables.
+        Returns the Ollama LLM configured with the token budget and stop sequences
+        of the given response type's generation profile.
         """
-        try:
-            self.db_cursor.execute('''
-                CREATE TABLE IF NOT EXISTS context (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_input TEXT NOT NULL,
-                    ai_response TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-            self.db_connection.commit()
-            self.logger.info("SQLite database initialized and tables are set up.")
-        except sqlite3.Error as e:
-            self.logger.error(f"Error setting up SQLite database: {e}")
+        profile = get_generation_profile(self.config, response_type)
+        return self.clients.get_llm(
+            self.model_name,
+            base_url=self.model_host,
+            num_predict=profile["max_tokens"],
+            stop=profile["stop"] or None,
+            temperature=self.temperature,
+        )
 
     def enqueue_interaction(self, interaction):
         """
@@ -89,282 +166,519 @@ class ChatModule:
 
     def store_context(self, user_input, ai_response):
         """
-        Stores the user input and AI response in the SQLite database.
+        Stores the user input and AI response in the context store.
+        The write is batched in the background; the turn id is returned immediately.
+        """
+        turn_id = self.store.add_turn(user_input, ai_response)
+        self.logger.info("Context queued for the context store.")
+        return turn_id
+
+    def index_flushed_turns(self, batch):
+        """
+        Embeds and indexes turns written by the context store, in the background.
+        """
+        future = self.clients.executor.submit(
+            self.memory_index.add, [(turn_id, user_input, ai_response) for turn_id, user_input, ai_response, _ in batch]
+        )
+        future.add_done_callback(self.log_index_error)
+
+    def log_index_error(self, future):
+        if future.exception():
+            self.logger.error(f"Error indexing context turn: {future.exception()}")
+
+    def index_missing_turns(self, batch_size=256):
+        """
+        Indexes stored turns that are not in the memory index yet (e.g. history from before it existed)
+        and drops indexed turns that are no longer stored.
+        """
+        try:
+            turn_ids = self.store.all_ids_blocking()
+            self.memory_index.retain(turn_ids)
+            missing = self.memory_index.missing(turn_ids)
+            for start in range(0, len(missing), batch_size):
+                turns = self.store.get_turns_blocking(missing[start:start + batch_size])
+                self.memory_index.add([(turn["id"], turn["user_input"], turn["ai_response"]) for turn in turns])
+            if missing:
+                self.memory_index.save()
+                self.logger.info(f"Indexed {len(missing)} past turns into long-term memory.")
+        except Exception as e:
+            self.logger.error(f"Error indexing past turns: {e}")
+
+    async def retrieve_turns(self, turn_ids):
         """
+        Retrieves specific turns from the context store by id.
+        """
+        if not turn_ids:
+            return []
         try:
-            self.db_cursor.execute('''
-                INSERT INTO context (user_input, ai_response)
-                VALUES (?, ?)
-            ''', (user_input, ai_response))
-            self.db_connection.commit()
-            self.logger.info("Context stored in SQLite database.")
-        except sqlite3.Error as e:
-            self.logger.error(f"Error storing context in SQLite database: {e}")
+            return await self.store.get_turns(turn_ids)
+        except Exception as e:
+            self.logger.error(f"Error retrieving turns from the context store: {e}")
+            return []
+
+    async def retrieve_relevant_context(self, prompt):
+        """
+        Retrieves the most recent turns plus the past turns most relevant to the prompt,
+        newest first.
+        """
+        recent = await self.retrieve_context(limit=self.recent_turns)
+        if self.memory_index is None or not len(self.memory_index):
+            return recent
+
+        loop = asyncio.get_running_loop()
+        matches = await loop.run_in_executor(
+            self.clients.executor,
+            lambda: self.memory_index.search(prompt, self.relevant_turns, exclude=[entry["id"] for entry in recent]),
+        )
+        relevant_ids = [turn_id for turn_id, score in matches if score >= self.min_similarity]
+        relevant = await self.retrieve_turns(relevant_ids)
+        self.logger.info(f"Retrieved {len(relevant)} relevant past turns from long-term memory.")
+
+        return sorted(recent + relevant, key=lambda entry: entry["id"], reverse=True)
 
-    def retrieve_context(self, limit=5):
+    async def retrieve_context(self, limit=5):
         """
-        Retrieves the latest context from the SQLite database.
+        Retrieves the latest context from the context store, newest first.
         """
         try:
-            self.db_cursor.execute('''
-                SELECT user_input, ai_response, timestamp
-                FROM context
-                ORDER BY timestamp DESC
-                LIMIT ?
-            ''', (limit,))
-            rows = self.db_cursor.fetchall()
-            context = [{"user_input": row[0], "ai_response": row[1], "timestamp": row[2]} for row in rows]
-            self.logger.info("Context retrieved from SQLite database.")
+            context = await self.store.recent(limit)
+            self.logger.info("Context retrieved from the context store.")
             return context
-        except sqlite3.Error as e:
-            self.logger.error(f"Error retrieving context from SQLite database: {e}")
+        except Exception as e:
+            self.logger.error(f"Error retrieving context from the context store: {e}")
             return []
 
+    def register_command_handlers(self):
+        """
+        Attaches this module's handlers to the direct command registry.
+        """
+        registry.set_handler("open_browser", self.command_open_browser)
+        registry.set_handler("explore_folder", self.command_explore_folder)
+        registry.set_handler("open_program", self.command_open_program)
+        registry.set_handler("list_tasks", self.list_tasks)
+        registry.set_handler("cancel_task", self.cancel_task)
+
     async def execute_direct_command(self, command):
-        action = command["action"]
-        params = command.get("parameters", {})
+        """
+        Dispatches a parsed command to its registered handler.
+        """
+        result = await registry.dispatch(command)
+        if result is None:
+            # Unknown command handling
+            self.logger.warning(f"Unknown direct command: {command['action']}")
+            return "Unknown command."
+        return result
 
-        if action == "generate_image":
-            # Use the prompt to generate the image
-            prompt = params.get("prompt")
-            if not prompt:
-                return "No prompt provided for image generation."
+    async def list_tasks(self, params):
+        return self.tasks.describe()
 
-            try:
-                # Generate the image and ASCII art
-                result = generate_image_and_ascii_base64(prompt)
-
-                # Log the paths of the generated files
-                self.logger.info(f"Generated image and ASCII files: {result}")
-
-                # Return the paths to the user
-                return f"Image and ASCII art generated:\n" \
-                    f"Original Image: {result['original_image']}\n" \
-                    f"Watermarked Image: {result['watermarked_image']}\n" \
-                    f"Twitter Image: {result['twitter_image']}\n" \
-                    f"ASCII Art: {result['ascii_image']}\n" \
-                    f"Watermarked ASCII: {result['watermarked_ascii_image']}"
-            except Exception as e:
-                self.logger.error(f"Error generating image: {e}")
-                return f"Error generating image: {str(e)}"
+    async def cancel_task(self, params):
+        task_id = params.get("task_id")
+        if task_id is None:
+            return "No task id provided."
+        if self.tasks.cancel(task_id):
+            return f"Cancelling task #{task_id}."
+        return f"No running task #{task_id}."
 
-        def manipulate_window(window_title, width, height, x, y):
-            """
-            Resize and reposition a window using wmctrl on Linux.
-            """
-            try:
-                # Wait for the window to appear
-                time.sleep(2)
-
-                # Find the window using wmctrl
-                window_list = subprocess.check_output(["wmctrl", "-l"]).decode()
-                window_line = next((line for line in window_list.splitlines() if window_title in line), None)
+    async def generate_image(self, prompt, progress, on_preview=None, **params):
+        """
+        Returns an artifact:// reference to the watermarked image for a prompt, served from the
+        artifact store when the same request was generated before, or queued to Stable Diffusion.
+        `on_preview(data_uri)` receives the live previews while the image is generated.
+        """
+        def on_progress(fraction, preview):
+            progress(f"generating image ({fraction:.0%})")
+            if preview and on_preview is not None:
+                on_preview(f"data:image/png;base64,{preview}")
+
+        payload = build_payload(prompt, **params)
+        ref = await self.run_blocking(lookup_image, payload)
+        if ref is not None:
+            progress("served from the artifact store")
+            return ref.uri()
+
+        progress("waiting for Stable Diffusion")
+        image_data = await self.image_jobs.generate(prompt, on_progress, **params)
+        # Post-processing runs on the shared executor, without holding a Stable Diffusion slot
+        progress("post-processing the image")
+        ref = await self.run_blocking(store_image, image_data, payload)
+        return ref.uri()
+
+    async def stream_generated_image(self, prompt, **params):
+        """
+        Generates an image as a background task, yielding its live previews and then the final image.
+        """
+        previews = asyncio.Queue()
 
-                if window_line:
-                    # Extract the window ID
-                    window_id = window_line.split()[0]
+        async def action(progress):
+            return await self.generate_image(prompt, progress, previews.put_nowait, **params)
 
-                    # Resize and move the window
-                    subprocess.run(["wmctrl", "-ir", window_id, "-e", f"0,{x},{y},{width},{height}"])
-                    self.logger.info(f"Window '{window_title}' resized and moved to ({x}, {y}) with size ({width}x{height}).")
+        info = self.tasks.start(f"generate image {prompt}", action)
+        try:
+            while not info.task.done():
+                preview = asyncio.ensure_future(previews.get())
+                await asyncio.wait({info.task, preview}, return_when=asyncio.FIRST_COMPLETED)
+                if preview.done():
+                    yield preview.result()
                 else:
-                    self.logger.warning(f"Window with title '{window_title}' not found.")
-            except Exception as e:
-                self.logger.error(f"Error manipulating window: {e}")
+                    preview.cancel()
+            if info.task.cancelled():
+                yield f"Task #{info.id} (generate image {prompt}) was cancelled."
+                return
+            yield info.task.result()
+        except Exception as e:
+            self.logger.error(f"Error generating image: {e}")
+            yield f"Error generating image: {str(e)}"
+        finally:
+            # The consumer went away before the image was ready
+            if not info.task.done():
+                info.task.cancel()
+
+    async def run_blocking(self, func, *args):
+        """
+        Runs a blocking call (screen capture, mouse input) on the shared executor.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.clients.executor, func, *args)
+
+    async def manipulate_window(self, window_title, width, height, x, y, wm_class=None, exclude=()):
+        """
+        Waits for a window to appear, then resizes and repositions it.
+        The window is matched by WM_CLASS when given and by title otherwise; windows
+        in `exclude` are ignored. Returns the tracked window, or None when it was not
+        found or X11 tracking is unavailable (the wmctrl fallback).
+        """
+        try:
+            if not self.windows.available:
+                await self.manipulate_window_wmctrl(window_title, width, height, x, y)
+                return None
+
+            window = await self.windows.wait_for_window(
+                title=None if wm_class else window_title,
+                wm_class=wm_class,
+                exclude=exclude,
+                timeout=self.window_timeout,
+            )
+            if window is None:
+                self.logger.warning(f"Window with title '{window_title}' not found.")
+                return None
 
-        if action == "open_browser":
-            url = params.get("url")
-            if url:
-                if not url.startswith("http"):
-                    url = "http://" + url
+            await self.run_blocking(self.windows.move_resize, window.id, x, y, width, height)
+            self.logger.info(f"Window '{window.title}' resized and moved to ({x}, {y}) with size ({width}x{height}).")
+            return window
+        except Exception as e:
+            self.logger.error(f"Error manipulating window: {e}")
+            return None
 
-                self.logger.info(f"Opening browser with URL: {url}")
+    async def manipulate_window_wmctrl(self, window_title, width, height, x, y):
+        """
+        Resize and reposition a window using wmctrl, polling until the window appears.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.window_timeout
+        while True:
+            # Find the window using wmctrl
+            process = await asyncio.create_subprocess_exec("wmctrl", "-l", stdout=asyncio.subprocess.PIPE)
+            output, _ = await process.communicate()
+            window_line = next((line for line in output.decode().splitlines() if window_title in line), None)
+            if window_line or loop.time() >= deadline:
+                break
+            await asyncio.sleep(0.25)
 
-                # Open the browser with URL
-                try:
-                    browser_process = subprocess.Popen(["firefox", "--new-window", url])
-                except FileNotFoundError:
-                    self.logger.error("Firefox browser not found.")
-                    return "Firefox browser not found."
+        if not window_line:
+            self.logger.warning(f"Window with title '{window_title}' not found.")
+            return False
 
-                # Wait for the browser to open
-                time.sleep(5)
+        # Extract the window ID, then resize and move the window
+        window_id = window_line.split()[0]
+        process = await asyncio.create_subprocess_exec("wmctrl", "-ir", window_id, "-e", f"0,{x},{y},{width},{height}")
+        await process.wait()
+        self.logger.info(f"Window '{window_title}' resized and moved to ({x}, {y}) with size ({width}x{height}).")
+        return True
 
-                # Resize and reposition the browser window
-                manipulate_window("Mozilla Firefox", 1280, 720, 0, 0)
+    async def command_open_browser(self, params):
+        url = params.get("url")
+        if url:
+            if not url.startswith("http"):
+                url = "http://" + url
 
-                # Capture the screen
-                screenshot_path = "screenshot.png"
-                self.capture_screen(screenshot_path)
+            self.logger.info(f"Opening browser with URL: {url}")
 
-                # Analyze the screenshot
-                button_data = self.send_to_bakllava(screenshot_path)
+            # Windows open before the launch are not the new browser window
+            known_windows = self.windows.window_ids()
 
-                # Perform interactions
-                self.perform_clicks(button_data)
+            # Open the browser with URL
+            try:
+                browser_process = subprocess.Popen(["firefox", "--new-window", url])
+            except FileNotFoundError:
+                self.logger.error("Firefox browser not found.")
+                return "Firefox browser not found."
+
+            async def action(progress):
+                # Wait for the browser window to map, then resize and reposition it
+                progress("waiting for the browser window")
+                window = await self.manipulate_window(
+                    "Mozilla Firefox", 1280, 720, 0, 0, wm_class="firefox", exclude=known_windows
+                )
+
+                # Capture the screen
+                progress("capturing the screen")
+                screenshot = await self.run_blocking(self.capture_screen)
+
+                # Analyze the screenshot, interacting with the buttons as they are found
+                progress("analyzing the screenshot and performing interactions")
+                await self.perform_clicks(self.iter_buttons(screenshot, window))
 
                 return f"Browser opened with URL: {url} and interactions completed."
-            else:
-                self.logger.error("No URL provided for the browser.")
-                return "No URL provided for the browser."
-
-        elif action == "explore_folder":
-            # Opens a folder using the system's file explorer
-            path = params.get("path")
-            if path:
-                self.logger.info(f"Opening folder: {path}")
-                try:
-                    subprocess.Popen(["xdg-open", path])
-                except FileNotFoundError:
-                    self.logger.error(f"File explorer not found for path: {path}")
-                    return f"File explorer not found for path: {path}"
-                return f"Opened folder: {path}"
-            self.logger.error("No folder path provided.")
-            return "No folder path provided."
-
-        elif action == "open_program":
-            # Starts a specified program
-            program = params.get("program")
-            if program:
-                try:
-                    self.logger.info(f"Opening program: {program}")
-                    subprocess.Popen([program])
-                    return f"Program {program} started successfully."
-                except FileNotFoundError:
-                    self.logger.error(f"Program {program} not found.")
-                    return f"Program {program} not found."
-                except Exception as e:
-                    self.logger.error(f"Error starting program {program}: {e}")
-                    return f"Error starting program {program}: {e}"
-            self.logger.error("No program specified to open.")
-            return "No program specified to open."
 
+            return await self.tasks.run(f"open browser {url}", action)
         else:
-            # Unknown command handling
-            self.logger.warning(f"Unknown direct command: {action}")
-            return "Unknown command."
+            self.logger.error("No URL provided for the browser.")
+            return "No URL provided for the browser."
+
+    async def command_explore_folder(self, params):
+        # Opens a folder using the system's file explorer
+        path = params.get("path")
+        if path:
+            self.logger.info(f"Opening folder: {path}")
+            try:
+                subprocess.Popen(["xdg-open", path])
+            except FileNotFoundError:
+                self.logger.error(f"File explorer not found for path: {path}")
+                return f"File explorer not found for path: {path}"
+            return f"Opened folder: {path}"
+        self.logger.error("No folder path provided.")
+        return "No folder path provided."
+
+    async def command_open_program(self, params):
+        # Starts a specified program
+        program = params.get("program")
+        if program:
+            try:
+                self.logger.info(f"Opening program: {program}")
+                subprocess.Popen([program])
+                return f"Program {program} started successfully."
+            except FileNotFoundError:
+                self.logger.error(f"Program {program} not found.")
+                return f"Program {program} not found."
+            except Exception as e:
+                self.logger.error(f"Error starting program {program}: {e}")
+                return f"Error starting program {program}: {e}"
+        self.logger.error("No program specified to open.")
+        return "No program specified to open."
 
-    def capture_screen(self, save_path):
+    def capture_screen(self, save_path=None):
         """
-        Captures the current screen and saves it to a file.
+        Captures the current screen and returns it as an in-memory image.
+        The screenshot is only written to disk when a save path is given.
         """
         self.logger.info("Capturing the screen...")
         try:
-            screenshot = ImageGrab.grab()
-            screenshot.save(save_path)
-            self.logger.info(f"Screenshot saved to {save_path}")
+            screenshot = self.screen.grab_image()
+            if save_path:
+                screenshot.save(save_path)
+                self.logger.info(f"Screenshot saved to {save_path}")
+            return screenshot
         except Exception as e:
             self.logger.error(f"Error capturing screen: {e}")
+            return None
+
+    async def send_to_bakllava(self, image, window=None):
+        """
+        Sends the screenshot (an image or a file path) to Bakllava for button detection
+        and returns {"buttons": [...]} once the analysis is complete.
+        """
+        return {"buttons": [button async for button in self.iter_buttons(image, window)]}
 
-    def send_to_bakllava(self, image_path):
+    async def iter_buttons(self, image, window=None):
         """
-        Sends the screenshot to Bakllava for button detection.
-        Processes the response to extract buttons with coordinates.
+        Yields the buttons of a screenshot as soon as each one is known, so callers can act
+        on the first button while the model is still generating the rest.
+        The model is skipped when the screen matches an analyzed one or when the elements
+        remembered for the window's application (the active window by default) are found
+        again, and only the changed regions are re-analyzed when the screen changed in a few places.
+        Results are cached and remembered only when the analysis is consumed to the end.
         """
+        if image is None:
+            return
         try:
-            with open(image_path, "rb") as image_file:
-                # Encode the image in Base64
-                image_base64 = base64.b64encode(image_file.read()).decode("utf-8")
+            image = await self.run_blocking(load_image, image)
+            plan = await self.run_blocking(self.vision_cache.plan, image)
+        except Exception as e:
+            self.logger.error(f"Error preparing the screenshot: {e}")
+            return
 
-            prompt = (
-                "Analyze this screenshot and return a list of buttons with their labels and exact coordinates in JSON format: "
-                "[{\"label\": \"Button Label\", \"x\": X-coordinate, \"y\": Y-coordinate, \"width\": Button Width, \"height\": Button Height}]. "
-            )
-            payload = {
-                "model": self.bakllava_model,
-                "prompt": prompt,
-                "images": [image_base64],
-                "max_tokens": 500,
-                "temperature": 0.7,
-            }
-
-            self.logger.info(f"Sending screenshot to Vision at {self.bakllava_host}...")
-            response = requests.post(f"{self.bakllava_host}/api/generate", json=payload, stream=True)
-            response.raise_for_status()
-
-            # Parse the response
-            full_response = ""
-            for line in response.iter_lines():
-                if line:  # Skip empty lines
-                    try:
-                        json_data = json.loads(line)
-                        self.logger.debug(f"Processed chunk: {json_data}")
-
-                        # Append 'response' part to the full response
-                        if "response" in json_data:
-                            full_response += json_data["response"]
-                    except json.JSONDecodeError as e:
-                        self.logger.warning(f"Error processing JSON chunk: {line}. Error: {e}")
-                    except Exception as e:
-                        self.logger.warning(f"Unexpected error processing chunk: {e}")
-
-            self.logger.info(f"Full response received: {full_response}")
-
-            # Extraer el bloque JSON usando una expresión regular
-            json_pattern = re.compile(r'\[.*?\]', re.DOTALL)
-            json_match = json_pattern.search(full_response)
-
-            if not json_match:
-                self.logger.error("Failed to find JSON in the response.")
-                return {"buttons": []}
-
-            json_content = json_match.group(0)
+        if plan.cached:
+            for button in plan.buttons:
+                yield button
+            return
+
+        # The window's title may have changed since it was looked up
+        window = (self.windows.get(window.id) or window) if window else self.windows.active_window()
+        if window is not None and self.element_memory.enabled:
             try:
-                button_list = json.loads(json_content)  # Parse the JSON content
-                if isinstance(button_list, list):  # Ensure it's a list of button dictionaries
-                    button_data = {"buttons": button_list}
-                    self.logger.info(f"Extracted button data: {button_data}")
-                    return button_data
-                else:
-                    self.logger.warning("Response is not a valid list of buttons.")
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Failed to parse extracted JSON: {e}")
+                recalled = await self.run_blocking(self.element_memory.recall, window, image)
+            except Exception as e:
+                self.logger.error(f"Error matching remembered elements: {e}")
+                recalled = None
+            if recalled is not None:
+                for button in self.vision_cache.complete(plan, recalled):
+                    yield button
+                return
+
+        if plan.regions is None:
+            monitors = await self.run_blocking(self.screen_monitors)
+            tiles = self.tiler.tiles(image.size, monitors)
+            buttons = []
+            try:
+                source = self.stream_buttons(image) if tiles is None else self.analyze_tiles(image, tiles)
+                async for button in source:
+                    buttons.append(button)
+                    yield button
+            except aiohttp.ClientError as e:
+                self.logger.error(f"Error sending image to Bakllava: {e}")
+                return
+            except Exception as e:
+                self.logger.error(f"Unexpected error: {e}")
+                return
+            buttons = self.vision_cache.complete(plan, buttons)
+        else:
+            found = await asyncio.gather(*(self.request_buttons(image, box) for box in plan.regions))
+            if any(buttons is None for buttons in found):
+                return
+            buttons = self.vision_cache.complete(plan, None, found)
+            for button in buttons:
+                yield button
+
+        self.logger.info(f"Extracted button data: {buttons}")
+        if window is not None and self.element_memory.enabled:
+            try:
+                await self.run_blocking(self.element_memory.remember, window, image, buttons)
+            except Exception as e:
+                self.logger.error(f"Error remembering elements: {e}")
+
+    def screen_monitors(self):
+        try:
+            return self.screen.monitors()
+        except Exception as e:
+            self.logger.warning(f"Could not query the monitor layout: {e}")
+            return []
+
+    async def analyze_tiles(self, image, tiles):
+        """
+        Analyzes the tiles concurrently, at most tiling.max_in_flight at a time, and yields
+        each tile's buttons (already in screen coordinates) as the tile completes,
+        skipping elements already found in an overlapping tile.
+        """
+        semaphore = asyncio.Semaphore(self.tiler.max_in_flight)
 
-            return {"buttons": []}
+        async def analyze(box):
+            async with semaphore:
+                return await self.request_buttons(image, box)
 
-        except requests.RequestException as e:
+        pending = [asyncio.ensure_future(analyze(box)) for box in tiles]
+        kept = []
+        try:
+            for next_tile in asyncio.as_completed(pending):
+                found = await next_tile
+                if found is None:
+                    raise RuntimeError("A tile could not be analyzed.")
+                for button in self.tiler.merge(kept, found):
+                    yield button
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def encode_screenshot(self, image, box=None):
+        options = self.vision_encoding
+        if box is not None:
+            return encode_image(image.crop(box), options["max_size"], options["format"], options["quality"], box[:2])
+        return encode_image(image, options["max_size"], options["format"], options["quality"])
+
+    async def request_buttons(self, image, box=None):
+        """
+        Returns all the buttons in the image, or in the `box` region of it, or None on failure.
+        """
+        buttons = []
+        try:
+            async for button in self.stream_buttons(image, box):
+                buttons.append(button)
+        except aiohttp.ClientError as e:
             self.logger.error(f"Error sending image to Bakllava: {e}")
-            return {"buttons": []}
+            return None
         except Exception as e:
             self.logger.error(f"Unexpected error: {e}")
-            return {"buttons": []}
+            return None
+        return buttons
 
-    def extract_buttons_from_response(self, full_response):
+    async def stream_buttons(self, image, box=None):
         """
-        Extracts button labels and their positions (x, y) from the model's JSON response.
+        Yields the buttons in the image, or in the `box` region of it, in screen coordinates.
+        The OpenCV detector proposes candidates first and the vision model labels them from
+        one sheet of crops; candidates it does not label are dropped, since callers match
+        buttons by label. The model locates the buttons itself only when the detector finds nothing.
         """
-        button_data = {"buttons": []}
-        try:
-            # Parse the JSON response directly
-            buttons = json.loads(full_response)
-            
-            if isinstance(buttons, list):  # Ensure it's a list of button dictionaries
-                for button in buttons:
-                    label = button.get("label", "").strip()
-                    x = button.get("x")
-                    y = button.get("y")
-                    width = button.get("width")
-                    height = button.get("height")
-
-                    # Ensure all required fields are present
-                    if label and x is not None and y is not None:
-                        button_data["buttons"].append({
-                            "label": label,
-                            "x": int(x),
-                            "y": int(y),
-                            "width": int(width) if width is not None else 0,
-                            "height": int(height) if height is not None else 0,
-                        })
-
-            if not button_data["buttons"]:
-                self.logger.warning("No buttons found in response.")
-
-            self.logger.info(f"Extracted button data: {button_data}")
-        except json.JSONDecodeError as e:
-            self.logger.error(f"Failed to parse JSON response: {e}")
-        except Exception as e:
-            self.logger.error(f"Error extracting button data: {e}")
-        return button_data
+        if self.detector.enabled:
+            try:
+                candidates = await self.run_blocking(self.detector.detect, image, box)
+                if candidates:
+                    sheet = await self.run_blocking(self.detector.label_sheet, image, candidates)
+                    encoded = await self.run_blocking(self.encode_screenshot, sheet)
+            except Exception as e:
+                self.logger.error(f"Error detecting UI elements: {e}")
+                candidates = []
+
+            if candidates:
+                answered = False
+                async for entry in self.stream_vision(LABEL_PROMPT, encoded):
+                    answered = True
+                    button = self.detector.label_candidate(candidates, entry)
+                    if button is not None:
+                        yield button
+                if answered:
+                    return
+                self.logger.warning("Could not parse the candidate labels, locating buttons with the model.")
+
+        # Downscale and encode the image to the model's input resolution
+        encoded = await self.run_blocking(self.encode_screenshot, image, box)
+        width, height = encoded.size
+        prompt = (
+            f"This screenshot is {width}x{height} pixels. "
+            "Analyze this screenshot and return a list of buttons with their labels and exact coordinates in JSON format: "
+            "[{\"label\": \"Button Label\", \"x\": X-coordinate, \"y\": Y-coordinate, \"width\": Button Width, \"height\": Button Height}]. "
+        )
+        async for entry in self.stream_vision(prompt, encoded):
+            button = parse_button(entry)
+            if button is None:
+                self.logger.warning(f"Skipping malformed button entry: {entry}")
+                continue
+            yield encoded.map_button(button)
+
+    async def stream_vision(self, prompt, encoded):
+        """
+        Streams a vision model generation for an encoded image and yields each JSON object
+        of the answer as soon as it is complete. Closing the generator early stops the generation.
+        """
+        profile = get_generation_profile(self.config, "vision")
+        payload = {
+            "model": self.bakllava_model,
+            "prompt": prompt,
+            "images": [encoded.data],
+            "options": {"num_predict": profile["max_tokens"], "temperature": 0.7},
+        }
+        if profile["stop"]:
+            payload["options"]["stop"] = profile["stop"]
+
+        self.logger.info(f"Sending screenshot to Vision at {self.bakllava_host}...")
+        parser = JSONObjectStream()
+        full_response = ""
+        async with self.clients.astream("vision", "/api/generate", payload) as response:
+            async for text in iter_ndjson_text(response.content, self.logger):
+                full_response += text
+                for entry in parser.feed(text):
+                    if isinstance(entry, dict):
+                        for item in unwrap_entries(entry):
+                            yield item
+        self.logger.debug(f"Full response received: {full_response}")
 
     def extract_coordinates(self, text):
         """
@@ -383,11 +697,71 @@ class ChatModule:
             self.logger.error(f"Error extracting coordinates: {e}")
             return None
 
-    def perform_clicks(self, button_data):
+    def click_at(self, x, y):
+        """
+        Moves the mouse to (x, y) and clicks; blocking, so it runs on the executor.
+        """
+        pyautogui.click(x, y, _pause=False)
+
+    @staticmethod
+    async def iterate_buttons(button_data):
+        """
+        Iterates a {"buttons": [...]} dict or an async stream of buttons from iter_buttons.
+        """
+        if isinstance(button_data, dict):
+            for button in button_data.get("buttons", []):
+                yield button
+        else:
+            async for button in button_data:
+                yield button
+
+    async def perform_clicks(self, button_data):
         """
         Uses PyAutoGUI to perform clicks on detected buttons intelligently.
+        `button_data` may be a stream of buttons, in which case clicking starts with the
+        first button while the rest are still being generated.
         Waits for user input if awaiting_user_input is True.
         """
+        try:
+            if self.click_mode == "plan":
+                await self.run_plan(button_data)
+            else:
+                await self.click_buttons(button_data)
+        finally:
+            # Stop a streamed analysis that is no longer needed
+            if hasattr(button_data, "aclose"):
+                await button_data.aclose()
+
+    async def locate_buttons(self):
+        """
+        Captures the screen and returns the buttons the vision pipeline finds on it.
+        """
+        screenshot = await self.run_blocking(self.capture_screen)
+        return (await self.send_to_bakllava(screenshot))["buttons"]
+
+    async def run_plan(self, button_data):
+        """
+        Clicks the buttons in order as one plan, checking each click by its effect on the
+        screen. The user is only asked to confirm when a check fails.
+        """
+        if self.awaiting_user_input:
+            self.logger.info("Waiting for user input before continuing.")
+            return
+
+        self.logger.info("Executing the detected buttons as a plan...")
+        result = await self.planner.run(
+            self.iterate_buttons(button_data), self.locate_buttons, lambda: self.stop_auto_interact
+        )
+        self.logger.info(result.describe())
+        if result.ok or result.reason == "fail-safe triggered":
+            return
+
+        new_button_data = {"buttons": result.buttons or []}
+        self.awaiting_user_input = True
+        self.enqueue_interaction(new_button_data)
+        print(f"{result.describe()} Detected buttons: {new_button_data}. Please confirm to continue.")
+
+    async def click_buttons(self, button_data):
         if self.awaiting_user_input:
             self.logger.info("Waiting for user input before continuing.")
             return
@@ -395,20 +769,20 @@ class ChatModule:
         self.logger.info("Performing clicks on detected buttons...")
         clicked_positions = set()  # Track clicked positions to avoid repeats
 
-        for button in button_data.get("buttons", []):
+        async for button in self.iterate_buttons(button_data):
             if self.stop_auto_interact:
                 self.logger.info("Auto-interaction mode stopped. Exiting clicks.")
                 break
 
             x, y = button.get("x"), button.get("y")
-            label = button.get("label", "").lower()
+            label = str(button.get("label") or "").lower()
 
             if x is None or y is None:
                 self.logger.warning(f"Skipping button '{label}' due to missing coordinates.")
                 continue
 
             # Ensure coordinates are within bounds
-            screen_width, screen_height = pyautogui.size()
+            screen_width, screen_height = await self.run_blocking(pyautogui.size)
             if 0 <= x < screen_width and 0 <= y < screen_height and (x, y) not in clicked_positions:
                 self.logger.info(f"Clicking on: {label} at ({x}, {y})")
 
@@ -417,16 +791,14 @@ class ChatModule:
                     pyautogui.FAILSAFE = False
 
                     # Perform the click
-                    pyautogui.moveTo(x, y, duration=0.5)
-                    pyautogui.click()
+                    await self.run_blocking(self.click_at, x, y)
                     clicked_positions.add((x, y))  # Mark as clicked
 
                     # Capture a new screenshot after each click to analyze changes
-                    screenshot_path = "screenshot_after_click.png"
-                    self.capture_screen(screenshot_path)
+                    screenshot = await self.run_blocking(self.capture_screen)
 
                     # Re-analyze the new screenshot to decide the next action
-                    new_button_data = self.send_to_bakllava(screenshot_path)
+                    new_button_data = await self.send_to_bakllava(screenshot)
 
                     # Inform the user of the next interaction
                     self.logger.info(f"Detected next button to click: {new_button_data}")
@@ -444,50 +816,172 @@ class ChatModule:
             else:
                 self.logger.warning(f"Button '{label}' at ({x}, {y}) is out of bounds or already clicked.")
 
-    async def call_ai_model(self, prompt):
+    @staticmethod
+    def context_fingerprint(context):
         """
-        Calls the AI model using LangChain's OllamaLLM to generate a response.
-        Incorporates context from the SQLite database and internal mind analysis.
+        Identifies a context snapshot by its newest turn, so speculative results can be
+        checked for staleness.
         """
-        try:
-            # Retrieve context from the database
-            context = self.retrieve_context()
+        return max((entry.get("id") or 0 for entry in context), default=None)
+
+    async def generate_thought(self, prompt, context):
+        """
+        Generates the internal thought for a prompt, reusing the speculative thought when it
+        was computed from the same context.
+        """
+        if self.thought_mode == "off":
+            return ""
+
+        memory = [entry['user_input'] for entry in context]
+        speculative = self.speculative_thought
+        if (self.thought_mode == "speculative" and speculative
+                and speculative.is_valid(self.context_fingerprint(context), self.speculative_max_age)):
+            self.logger.info("Reusing speculative internal thought.")
+            return await speculative.result()
+
+        self.logger.info("Generating internal thought...")
+        return await analyze_conversation(prompt, memory)
+
+    def schedule_speculative_thought(self, turn_id):
+        """
+        Starts computing the internal thought for the next turn in the background,
+        from the context as it stands after the current turn.
+        """
+        if self.speculative_thought:
+            self.speculative_thought.task.cancel()
+            self.speculative_thought = None
+
+        async def speculate():
+            context = await self.retrieve_context()
+            if not context:
+                return ""
+            # The next prompt is unknown, so the thought is about the conversation as a whole
             memory = [entry['user_input'] for entry in context]
+            return await anticipate_conversation(memory)
+
+        def done(task):
+            # Retrieve the exception so failed speculation is logged rather than reported as unhandled
+            if not task.cancelled() and task.exception() is not None:
+                self.logger.warning(f"Speculative internal thought failed: {task.exception()}")
+
+        task = asyncio.ensure_future(speculate())
+        task.add_done_callback(done)
+        self.speculative_thought = SpeculativeThought(turn_id, task)
+        self.logger.debug("Speculative internal thought scheduled for the next turn.")
+
+    async def build_prompt(self, prompt):
+        """
+        Builds the full prompt for the AI model.
+        Context retrieval, the rolling summary and internal mind analysis run as a stage graph; a slow
+        internal thought is dropped after its timeout instead of delaying the answer.
+        """
+        async def context_stage():
+            return await self.retrieve_relevant_context(prompt)
+
+        async def thought_stage(context):
+            return await self.generate_thought(prompt, context)
+
+        graph = StageGraph(self.logger)
+        graph.add("context", context_stage, default=[])
+        graph.add("summary", self.summary.get, default="")
+        graph.add("thought", thought_stage, depends=("context",), timeout=self.thought_timeout, default="")
+        results = await graph.run()
 
-            # Generate internal thought
-            self.logger.info("Generating internal thought...")
-            internal_thought = await analyze_conversation(prompt, memory)
-            self.logger.info(f"Internal thought generated: {internal_thought}")
+        internal_thought = (results["thought"] or "").strip()
+        self.logger.info(f"Internal thought generated: {internal_thought}")
 
-            # Format context for the AI model
-            context_text = "\n".join([f"User: {entry['user_input']}\nAI: {entry['ai_response']}" for entry in context])
+        # Combine summary, context and internal thought with the new prompt within the token budget
+        return self.prompt_builder.build(prompt, results["context"], internal_thought, results["summary"])
+
+    def finish_turn(self, prompt, response):
+        """
+        Stores the interaction in the database and prepares the next turn.
+        """
+        turn_id = self.store_context(user_input=prompt, ai_response=response)
 
-            # Combine internal thought and context with the new prompt
-            full_prompt = f"{context_text}\nInternal Thought: {internal_thought}\nUser: {prompt}\nAI:"
+        # Prepare the next turn's internal thought off the critical path
+        if self.thought_mode == "speculative":
+            self.schedule_speculative_thought(turn_id)
 
-            self.logger.info("Calling AI model with context and internal thought...")
-            loop = asyncio.get_event_loop()
-            ai_response = await loop.run_in_executor(None, self.llm.invoke, [{"role": "user", "content": full_prompt}])
+        # Fold turns that left the recent window into the rolling summary
+        self.summary.maybe_refresh()
 
-            if not ai_response:
+    async def stream_ai_model(self, prompt, response_type="chat"):
+        """
+        Streams the AI model's response using LangChain's OllamaLLM.
+        Yields text chunks of the kept response as soon as they arrive and cancels the
+        generation once the response type's stop conditions are met, then stores the
+        interaction in the database.
+        """
+        stop_condition = StopCondition.from_profile(get_generation_profile(self.config, response_type))
+        stream = None
+        try:
+            # Serve repeated questions from the response cache
+            fingerprint = None
+            if self.response_cache.enabled:
+                cache_turns = self.response_cache.context_turns
+                fingerprint = context_fingerprint(await self.retrieve_context(limit=cache_turns) if cache_turns else [])
+                cached_response = await self.response_cache.lookup(prompt, fingerprint, self.clients.executor)
+                if cached_response:
+                    self.logger.info(f"Serving cached AI response: {cached_response}")
+                    self.finish_turn(prompt, cached_response)
+                    yield cached_response
+                    return
+
+            full_prompt = await self.build_prompt(prompt)
+
+            self.logger.info("Streaming AI model response with context and internal thought...")
+            async with self.clients.slot("ollama"):
+                stream = self.get_llm(response_type).astream([{"role": "user", "content": full_prompt}])
+                async for chunk in stream:
+                    kept = stop_condition.feed(chunk)
+                    if kept:
+                        yield kept
+                    if stop_condition.done:
+                        self.logger.debug("Stop condition reached, cancelling generation.")
+                        break
+                else:
+                    kept = stop_condition.finish()
+                    if kept:
+                        yield kept
+
+            concise_response = stop_condition.text.strip()
+            if not concise_response:
                 self.logger.warning("AI model returned an empty response.")
-                return "No response generated. Try again."
+                yield "No response generated. Try again."
+                return
 
-            # Produce a concise output by trimming the AI response
-            concise_response = ai_response.strip().split('\n')[0]
             self.logger.info(f"Concise AI response: {concise_response}")
 
-            # Store the interaction in the database
-            self.store_context(user_input=prompt, ai_response=concise_response)
+            if fingerprint is not None:
+                self.response_cache.put(prompt, fingerprint, concise_response)
+                self.logger.debug(f"Response cache stats: {self.response_cache.stats()}")
 
-            return concise_response
+            self.finish_turn(prompt, concise_response)
         except Exception as e:
             self.logger.error(f"Error while calling AI model: {e}")
-            return "An error occurred while processing your request."
+            if not stop_condition.text:
+                yield "An error occurred while processing your request."
+        finally:
+            # Closing the stream drops the connection, which stops the generation server-side
+            if stream is not None:
+                await stream.aclose()
 
-    async def process_input(self, user_input):
+    async def call_ai_model(self, prompt):
+        """
+        Calls the AI model using LangChain's OllamaLLM to generate a response.
+        Collects the streamed response into a single string.
         """
-        Processes the user input. Resumes interaction if awaiting_user_input is True.
+        chunks = []
+        async for chunk in self.stream_ai_model(prompt):
+            chunks.append(chunk)
+        return "".join(chunks).strip()
+
+    async def stream_input(self, user_input):
+        """
+        Processes the user input and yields the response as it is produced.
+        AI model responses are streamed token by token; command results are yielded whole.
+        Resumes interaction if awaiting_user_input is True.
         """
         self.logger.info(f"Processing user input: {user_input}")
 
@@ -498,44 +992,69 @@ class ChatModule:
 
             if self.interaction_queue:
                 next_interaction = self.interaction_queue.pop(0)
-                self.perform_clicks(next_interaction)
-                return f"Resuming interaction with detected buttons: {next_interaction}"
+                await self.perform_clicks(next_interaction)
+                yield f"Resuming interaction with detected buttons: {next_interaction}"
+                return
 
-            return "No pending interactions in the queue."
+            yield "No pending interactions in the queue."
+            return
 
         # Detect specific commands, e.g., "generate image"
         if user_input.startswith("generate image"):
             prompt = user_input[len("generate image"):].strip()
+            # A trailing "--seed N" fixes the seed, so the same request is served from the artifact store
+            image_params = {}
+            seed_match = re.search(r"\s*--seed\s+(\d+)$", prompt)
+            if seed_match:
+                image_params["seed"] = int(seed_match.group(1))
+                prompt = prompt[:seed_match.start()].strip()
             if not prompt:
-                return "Please provide a prompt for image generation."
-            
-            try:
-                # Generate Base64-encoded image
-                base64_image = generate_image_and_ascii_base64(prompt)
-                return base64_image  # Send the Base64 string directly to the GUI
-            except Exception as e:
-                self.logger.error(f"Error generating image: {e}")
-                return f"Error generating image: {str(e)}"
-            
+                yield "Please provide a prompt for image generation."
+                return
+
+            # Live previews as Base64 strings, then a reference to the final image, go directly to the GUI
+            async for chunk in self.stream_generated_image(prompt, **image_params):
+                yield chunk
+            return
+
         # Parse input for other commands
         command = await parse_command(user_input)
 
         if command and command.get("action") and command["action"] != "unknown":
             # Execute recognized direct commands
-            return await self.execute_direct_command(command)
+            yield await self.execute_direct_command(command)
         else:
-            # No direct command found, use the AI model for response
+            # No direct command found, stream the AI model response
             self.logger.info("No direct command found, using AI model to generate response.")
-            ai_response = await self.call_ai_model(user_input)
-            print(f"AI Response: {ai_response}")  # Explicitly communicate response to the user
-            return ai_response
+            async for chunk in self.stream_ai_model(user_input):
+                yield chunk
+
+    async def process_input(self, user_input):
+        """
+        Processes the user input and returns the complete response.
+        """
+        chunks = []
+        async for chunk in self.stream_input(user_input):
+            if chunk.startswith(("data:image/", ARTIFACT_SCHEME)):
+                # An image replaces its earlier previews
+                chunks = [chunk]
+            else:
+                chunks.append(chunk)
+        return "".join(chunks)
 
     def close(self):
         """
-        Closes the SQLite database connection.
+        Flushes pending turns and closes the context store.
         """
         try:
-            self.db_connection.close()
-            self.logger.info("SQLite database connection closed.")
-        except sqlite3.Error as e:
-            self.logger.error(f"Error closing SQLite database connection: {e}")
\ No newline at end of file
+            if self.memory_index is not None:
+                self.memory_index.save()
+            self.windows.close()
+            self.screen.close()
+            self.input.close()
+            self.element_memory.close()
+            self.artifacts.close()
+            self.store.close()
+            self.logger.info("Context store closed.")
+        except Exception as e:
+            self.logger.error(f"Error closing the context store: {e}")
\ No newline at end of file
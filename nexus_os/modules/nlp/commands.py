@@ -0,0 +1,168 @@
+import inspect
+import logging
+import re
+import time
+
+logger = logging.getLogger("CommandParser")
+
+
+def trie_pattern(phrases):
+    """
+    Compiles phrases into one regex shaped like a trie, e.g. "open (?:browser|folder)",
+    so matching cost depends on the input length rather than on the number of phrases.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        optional = "" in node
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        pattern = "(?:" + "|".join(branches) + ")"
+        return pattern + "?" if optional else pattern
+
+    return build(trie)
+
+
+class Command:
+    """
+    A registered command: its trigger phrases, parameter extractor and handler.
+    `extractor(text)` returns the parameters dict; `handler(params)` may be sync or async.
+    """
+
+    def __init__(self, action, triggers, extractor=None, handler=None, priority=0):
+        self.action = action
+        self.triggers = [trigger.lower() for trigger in triggers]
+        self.extractor = extractor
+        self.handler = handler
+        self.priority = priority
+
+
+class CommandRegistry:
+    """
+    Declarative registry of direct commands.
+    All trigger phrases are compiled into a single trie-shaped regex that finds every trigger
+    in one pass over the input; actions are dispatched to handlers through a dict.
+    When several commands match, even with overlapping triggers, the one registered first wins.
+    """
+
+    def __init__(self):
+        self.commands = {}
+        self.triggers = {}
+        self.best = {}
+        self.matcher = None
+
+    def register(self, action, triggers, extractor=None, handler=None):
+        if action in self.commands:
+            command = self.commands[action]
+            command.triggers += [t.lower() for t in triggers if t.lower() not in command.triggers]
+            command.extractor = extractor or command.extractor
+            command.handler = handler or command.handler
+        else:
+            self.commands[action] = Command(action, triggers, extractor, handler, priority=len(self.commands))
+        self.matcher = None
+        return self.commands[action]
+
+    def set_handler(self, action, handler):
+        self.commands[action].handler = handler
+
+    def get_handler(self, action):
+        command = self.commands.get(action)
+        return command.handler if command else None
+
+    def compile(self):
+        self.triggers = {}
+        for command in self.commands.values():
+            for trigger in command.triggers:
+                # A trigger shared by two commands belongs to the one registered first
+                self.triggers.setdefault(trigger, command)
+        # The regex finds the longest trigger at each position; the triggers that are its
+        # prefixes start there too, so each trigger maps to the first registered among them
+        self.best = {}
+        for trigger, command in self.triggers.items():
+            for end in range(1, len(trigger)):
+                prefix = self.triggers.get(trigger[:end])
+                if prefix is not None and prefix.priority < command.priority:
+                    command = prefix
+            self.best[trigger] = command
+        # A lookahead matches at every position, so overlapping triggers are all found
+        self.matcher = re.compile(f"(?=({trie_pattern(self.triggers)}))") if self.triggers else None
+
+    def match(self, text):
+        """
+        Returns the command triggered by the (lowercased) text, or None.
+        """
+        if self.matcher is None:
+            self.compile()
+            if self.matcher is None:
+                return None
+        best = None
+        for found in self.matcher.finditer(text):
+            command = self.best[found.group(1)]
+            if best is None or command.priority < best.priority:
+                best = command
+        return best
+
+    def parse(self, command_text):
+        """
+        Parses text into {"action": ..., "parameters": ...} or {"action": "unknown"}.
+        """
+        command_text = command_text.lower().strip()
+        try:
+            command = self.match(command_text)
+            if command is None:
+                logger.warning("Unknown command detected.")
+                return {"action": "unknown"}
+            parameters = command.extractor(command_text) if command.extractor else {}
+            logger.info(f"{command.action} command detected with parameters: {parameters}")
+            return {"action": command.action, "parameters": parameters}
+        except Exception as e:
+            logger.error(f"Error parsing command: {e}")
+            return {"action": "unknown", "error": "Parsing error occurred."}
+
+    async def dispatch(self, command):
+        """
+        Runs the handler registered for the parsed command's action.
+        Returns None when no handler is registered.
+        """
+        handler = self.get_handler(command["action"])
+        if handler is None:
+            return None
+        result = handler(command.get("parameters", {}))
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+
+def benchmark_parse(command_counts=(10, 100, 500), iterations=2000):
+    """
+    Measures parse time with a growing number of registered commands.
+    Returns {count: microseconds per parse}.
+    """
+    sample = "please open item 7 and then tell me what you see on the screen"
+    results = {}
+    for count in command_counts:
+        registry = CommandRegistry()
+        for index in range(count):
+            registry.register(f"task_{index}", [f"run task {index}", f"start job {index}"])
+        registry.register("open_item", ["open item"], extractor=lambda text: {"item": text.split("open item")[-1].strip()})
+        registry.compile()
+
+        started = time.perf_counter()
+        for _ in range(iterations):
+            registry.parse(sample)
+        results[count] = (time.perf_counter() - started) / iterations * 1e6
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    for count, micros in benchmark_parse().items():
+        print(f"{count:>5} commands: {micros:.1f} us/parse")
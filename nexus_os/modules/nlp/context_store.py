@@ -0,0 +1,461 @@
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import weakref
+from datetime import datetime, timedelta
+
+import aiosqlite
+
+logger = logging.getLogger("nexus_os")
+
+SCHEMA = [
+    '''
+    CREATE TABLE IF NOT EXISTS context (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_input TEXT NOT NULL,
+        ai_response TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_context_timestamp ON context (timestamp)',
+    '''
+    CREATE TABLE IF NOT EXISTS context_summary (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        summary TEXT NOT NULL,
+        upto_id INTEGER NOT NULL,
+        updated DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+]
+
+PRAGMAS = [
+    # Must come before journal_mode: a file in WAL mode can no longer change its auto-vacuum mode,
+    # so this only takes effect on a new database (existing ones are converted by compact())
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+]
+
+# The highest id ever used: AUTOINCREMENT's sequence remembers it even after pruning
+MAX_ID_QUERY = """
+SELECT MAX(COALESCE((SELECT MAX(id) FROM context), 0),
+           COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'context'), 0))
+"""
+
+INSERT_TURNS = "INSERT INTO context (id, user_input, ai_response, timestamp) VALUES (?, ?, ?, ?)"
+
+
+def row_to_turn(row):
+    return {"user_input": row[0], "ai_response": row[1], "timestamp": row[2], "id": row[3]}
+
+
+def unique_turns(turns):
+    """
+    Drops repeated turns (a batch can be flushed between reading the buffer and the table).
+    """
+    seen = set()
+    return [turn for turn in turns if not (turn["id"] in seen or seen.add(turn["id"]))]
+
+
+class ContextStore:
+    """
+    SQLite store for conversation turns (the `context` table) in WAL mode.
+    Writes are assigned an id immediately, buffered, and flushed in batches by a background
+    task so they never block the event loop; reads see buffered turns as well. If another
+    process took those ids in the meantime, the buffered turns are renumbered before the
+    write, so flush hooks always see the ids the turns are stored under.
+    Each event loop gets its own aiosqlite connection and each thread its own sqlite3 connection.
+    Old turns are pruned by count and age, and freed pages are reclaimed incrementally.
+    """
+
+    def __init__(self, config, logger=logger):
+        self.logger = logger
+        store_config = config.get("context_store", {})
+        self.path = config.get("data", {}).get("memory_db", "nexus_os/data/memory.db")
+        self.batch_size = store_config.get("batch_size", 32)
+        self.flush_interval = store_config.get("flush_interval", 0.5)
+        self.max_retry_delay = store_config.get("max_retry_delay", 30)
+        self.retry_delay = self.flush_interval
+        self.max_rows = store_config.get("max_rows", 1000000)
+        self.max_age_days = store_config.get("max_age_days", 0)
+        self.prune_interval = store_config.get("prune_interval", 1000)
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        self.flush_handle = None
+        self.writes_since_prune = 0
+        self.flush_hooks = []
+        # Called with the ids of pruned turns, e.g. to drop them from the memory index
+        self.prune_hooks = []
+
+        self._local = threading.local()
+        self._async_connections = weakref.WeakKeyDictionary()
+
+        self.setup()
+        self.next_id = self._max_id() + 1
+        legacy_path = store_config.get("legacy_db", "chat_module.db")
+        if self.next_id == 1 and legacy_path and os.path.exists(legacy_path):
+            self.import_legacy(legacy_path)
+
+    # Connections
+
+    def connect(self):
+        """
+        Returns this thread's sqlite3 connection.
+        """
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path)
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            self._local.connection = connection
+        return connection
+
+    async def aconnect(self):
+        """
+        Returns the running event loop's aiosqlite connection.
+        """
+        loop = asyncio.get_running_loop()
+        connection = self._async_connections.get(loop)
+        if connection is None:
+            connection = aiosqlite.connect(self.path)
+            # The connection's worker thread must not keep the process alive on exit
+            connection.daemon = True
+            connection = await connection
+            for pragma in PRAGMAS:
+                await connection.execute(pragma)
+            self._async_connections[loop] = connection
+        return connection
+
+    def setup(self):
+        """
+        Creates the schema. New databases use incremental auto-vacuum so pruning can
+        give pages back without a full VACUUM.
+        """
+        try:
+            connection = self.connect()
+            for statement in SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self.logger.info(f"Context store ready at {self.path}")
+        except sqlite3.Error as e:
+            self.logger.error(f"Error setting up context store: {e}")
+
+    def _max_id(self):
+        """
+        Returns the highest id ever used, so ids are never reused after pruning.
+        """
+        return self.connect().execute(MAX_ID_QUERY).fetchone()[0]
+
+    def import_legacy(self, legacy_path):
+        """
+        Copies the turns of the old per-directory chat database into the store.
+        """
+        try:
+            legacy = sqlite3.connect(legacy_path)
+            rows = legacy.execute("SELECT id, user_input, ai_response, timestamp FROM context ORDER BY id").fetchall()
+            legacy.close()
+            connection = self.connect()
+            connection.executemany(INSERT_TURNS, rows)
+            connection.commit()
+            self.next_id = self._max_id() + 1
+            self.logger.info(f"Imported {len(rows)} turns from {legacy_path}")
+        except sqlite3.Error as e:
+            self.logger.error(f"Error importing legacy chat database: {e}")
+
+    # Writes
+
+    def add_turn(self, user_input, ai_response):
+        """
+        Buffers a turn for the next batched write and returns its id.
+        """
+        timestamp = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        with self.pending_lock:
+            turn_id = self.next_id
+            self.next_id += 1
+            self.pending.append((turn_id, user_input, ai_response, timestamp))
+            pending_count = len(self.pending)
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No event loop: write through synchronously
+            self.flush_blocking()
+            return turn_id
+
+        if pending_count >= self.batch_size:
+            asyncio.ensure_future(self.flush())
+        elif self.flush_handle is None:
+            self.flush_handle = loop.call_later(self.flush_interval, lambda: asyncio.ensure_future(self.flush()))
+        return turn_id
+
+    def _take_pending(self):
+        with self.pending_lock:
+            batch, self.pending = self.pending, []
+        if self.flush_handle is not None:
+            self.flush_handle.cancel()
+            self.flush_handle = None
+        return batch
+
+    def _restore_pending(self, batch):
+        with self.pending_lock:
+            self.pending = batch + self.pending
+
+    def _renumber(self, batch, max_id):
+        """
+        Gives a batch, and the turns buffered after it, fresh ids above max_id.
+        Used when another process wrote to the store since the ids were assigned.
+        """
+        with self.pending_lock:
+            next_id = max_id + 1
+            renumbered = []
+            for _, user_input, ai_response, timestamp in batch:
+                renumbered.append((next_id, user_input, ai_response, timestamp))
+                next_id += 1
+            pending = []
+            for _, user_input, ai_response, timestamp in self.pending:
+                pending.append((next_id, user_input, ai_response, timestamp))
+                next_id += 1
+            self.pending = pending
+            self.next_id = next_id
+        self.logger.warning(f"Context store ids taken by another writer; renumbered {len(batch)} turns.")
+        return renumbered
+
+    def _schedule_retry(self):
+        """
+        Re-arms the flush timer after a failed write, backing off up to `max_retry_delay`.
+        """
+        self.retry_delay = min(self.retry_delay * 2, self.max_retry_delay)
+        if self.flush_handle is None:
+            self.flush_handle = asyncio.get_running_loop().call_later(
+                self.retry_delay, lambda: asyncio.ensure_future(self.flush())
+            )
+
+    async def flush(self):
+        """
+        Writes all buffered turns in a single transaction.
+        """
+        batch = self._take_pending()
+        if not batch:
+            return
+        try:
+            connection = await self.aconnect()
+            try:
+                await connection.executemany(INSERT_TURNS, batch)
+            except sqlite3.IntegrityError:
+                await connection.rollback()
+                async with connection.execute(MAX_ID_QUERY) as cursor:
+                    max_id = (await cursor.fetchone())[0]
+                batch = self._renumber(batch, max_id)
+                await connection.executemany(INSERT_TURNS, batch)
+            await connection.commit()
+            self.logger.debug(f"Flushed {len(batch)} turns to the context store.")
+        except Exception as e:
+            self.logger.error(f"Error flushing context store, retrying in {self.retry_delay * 2:.1f}s: {e}")
+            self._restore_pending(batch)
+            self._schedule_retry()
+            return
+        self.retry_delay = self.flush_interval
+        self._after_flush(batch)
+
+        if self.writes_since_prune >= self.prune_interval:
+            await self.prune()
+
+    def flush_blocking(self):
+        """
+        Writes all buffered turns from the calling thread.
+        """
+        batch = self._take_pending()
+        if not batch:
+            return
+        try:
+            connection = self.connect()
+            try:
+                connection.executemany(INSERT_TURNS, batch)
+            except sqlite3.IntegrityError:
+                connection.rollback()
+                batch = self._renumber(batch, connection.execute(MAX_ID_QUERY).fetchone()[0])
+                connection.executemany(INSERT_TURNS, batch)
+            connection.commit()
+        except sqlite3.Error as e:
+            self.logger.error(f"Error flushing context store, will retry: {e}")
+            self._restore_pending(batch)
+            return
+        self._after_flush(batch)
+
+    def _after_flush(self, batch):
+        self.writes_since_prune += len(batch)
+        for hook in self.flush_hooks:
+            try:
+                hook(batch)
+            except Exception as e:
+                self.logger.error(f"Context store flush hook failed: {e}")
+
+    # Reads
+
+    def _pending_turns(self):
+        with self.pending_lock:
+            return [
+                {"user_input": user_input, "ai_response": ai_response, "timestamp": timestamp, "id": turn_id}
+                for turn_id, user_input, ai_response, timestamp in reversed(self.pending)
+            ]
+
+    async def recent(self, limit=5):
+        """
+        Returns the latest turns, newest first, including turns not flushed yet.
+        """
+        turns = self._pending_turns()[:limit]
+        if len(turns) < limit:
+            connection = await self.aconnect()
+            async with connection.execute(
+                "SELECT user_input, ai_response, timestamp, id FROM context ORDER BY id DESC LIMIT ?",
+                (limit - len(turns),),
+            ) as cursor:
+                turns += [row_to_turn(row) for row in await cursor.fetchall()]
+        return unique_turns(turns)[:limit]
+
+    async def get_turns(self, turn_ids):
+        """
+        Returns the turns with the given ids, including turns not flushed yet.
+        """
+        wanted = set(turn_ids)
+        turns = [turn for turn in self._pending_turns() if turn["id"] in wanted]
+        remaining = list(wanted - {turn["id"] for turn in turns})
+        if remaining:
+            connection = await self.aconnect()
+            async with connection.execute(
+                f"SELECT user_input, ai_response, timestamp, id FROM context WHERE id IN ({','.join('?' * len(remaining))})",
+                remaining,
+            ) as cursor:
+                turns += [row_to_turn(row) for row in await cursor.fetchall()]
+        return unique_turns(turns)
+
+    def get_turns_blocking(self, turn_ids):
+        """
+        Returns the flushed turns with the given ids, from the calling thread.
+        """
+        turn_ids = list(turn_ids)
+        if not turn_ids:
+            return []
+        rows = self.connect().execute(
+            f"SELECT user_input, ai_response, timestamp, id FROM context WHERE id IN ({','.join('?' * len(turn_ids))})",
+            turn_ids,
+        ).fetchall()
+        return [row_to_turn(row) for row in rows]
+
+    async def turns_between(self, after_id, upto_id):
+        """
+        Returns the turns with after_id < id <= upto_id, oldest first.
+        """
+        turns = [turn for turn in self._pending_turns() if after_id < turn["id"] <= upto_id]
+        connection = await self.aconnect()
+        async with connection.execute(
+            "SELECT user_input, ai_response, timestamp, id FROM context WHERE id > ? AND id <= ? ORDER BY id",
+            (after_id, upto_id),
+        ) as cursor:
+            turns = [row_to_turn(row) for row in await cursor.fetchall()] + turns
+        return sorted(unique_turns(turns), key=lambda turn: turn["id"])
+
+    def latest_id(self):
+        with self.pending_lock:
+            return self.next_id - 1
+
+    # Rolling summary
+
+    async def get_summary(self):
+        """
+        Returns (summary, upto_id) of the rolling conversation summary, or ("", 0).
+        """
+        connection = await self.aconnect()
+        async with connection.execute("SELECT summary, upto_id FROM context_summary WHERE id = 1") as cursor:
+            row = await cursor.fetchone()
+        return (row[0], row[1]) if row else ("", 0)
+
+    async def set_summary(self, summary, upto_id):
+        connection = await self.aconnect()
+        await connection.execute(
+            "INSERT OR REPLACE INTO context_summary (id, summary, upto_id, updated) VALUES (1, ?, ?, CURRENT_TIMESTAMP)",
+            (summary, upto_id),
+        )
+        await connection.commit()
+
+    def all_ids_blocking(self):
+        return [row[0] for row in self.connect().execute("SELECT id FROM context ORDER BY id")]
+
+    # Retention
+
+    async def prune(self):
+        """
+        Deletes turns beyond `max_rows` or older than `max_age_days`, then compacts the file.
+        """
+        self.writes_since_prune = 0
+        try:
+            connection = await self.aconnect()
+            deleted = []
+            if self.max_age_days:
+                cutoff = (datetime.utcnow() - timedelta(days=self.max_age_days)).strftime("%Y-%m-%d %H:%M:%S")
+                deleted += await self._delete(connection, "timestamp < ?", (cutoff,))
+            if self.max_rows:
+                deleted += await self._delete(
+                    connection, "id <= (SELECT id FROM context ORDER BY id DESC LIMIT 1 OFFSET ?)", (self.max_rows,)
+                )
+            await connection.commit()
+            if not deleted:
+                return
+            self.logger.info(f"Pruned {len(deleted)} old turns from the context store.")
+            for hook in self.prune_hooks:
+                try:
+                    hook(deleted)
+                except Exception as e:
+                    self.logger.error(f"Context store prune hook failed: {e}")
+            await self.compact()
+        except Exception as e:
+            self.logger.error(f"Error pruning context store: {e}")
+
+    async def _delete(self, connection, condition, params):
+        """
+        Deletes the turns matching a condition and returns their ids.
+        """
+        async with connection.execute(f"SELECT id FROM context WHERE {condition}", params) as cursor:
+            ids = [row[0] for row in await cursor.fetchall()]
+        if ids:
+            await connection.execute(f"DELETE FROM context WHERE {condition}", params)
+        return ids
+
+    async def compact(self):
+        """
+        Returns free pages to the filesystem. Databases created before incremental
+        auto-vacuum was enabled are converted with a one-time full VACUUM.
+        """
+        connection = await self.aconnect()
+        async with connection.execute("PRAGMA auto_vacuum") as cursor:
+            mode = (await cursor.fetchone())[0]
+        if mode != 2:
+            await connection.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await connection.execute("VACUUM")
+        else:
+            await connection.execute("PRAGMA incremental_vacuum")
+        await connection.commit()
+
+    # Shutdown
+
+    async def aclose(self):
+        await self.flush()
+        connection = self._async_connections.pop(asyncio.get_running_loop(), None)
+        if connection is not None:
+            await connection.close()
+
+    def close(self):
+        self.flush_blocking()
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
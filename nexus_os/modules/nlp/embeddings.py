@@ -0,0 +1,28 @@
+import threading
+import numpy as np
+
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+_models = {}
+_models_lock = threading.Lock()
+
+
+def get_embedding_model(model_name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Loads a sentence-transformers model once per process, on first use.
+    """
+    with _models_lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+            _models[model_name] = SentenceTransformer(model_name)
+        return _models[model_name]
+
+
+def embed_texts(texts, model_name=DEFAULT_EMBEDDING_MODEL):
+    """
+    Embeds a list of texts into L2-normalized float32 vectors (one row per text),
+    so cosine similarity is a plain dot product.
+    """
+    model = get_embedding_model(model_name)
+    vectors = model.encode(list(texts), convert_to_numpy=True, normalize_embeddings=True)
+    return np.asarray(vectors, dtype=np.float32)
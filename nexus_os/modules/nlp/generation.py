@@ -0,0 +1,132 @@
+import re
+
+# Sentence end: terminal punctuation followed by whitespace
+SENTENCE_END = re.compile(r'[.!?]+(?=\s)')
+
+DEFAULT_PROFILES = {
+    "chat": {"max_tokens": 150, "stop": ["\nUser:", "\nInternal Thought:"], "max_lines": 1, "max_sentences": 0},
+    "thought": {"max_tokens": 15, "stop": [], "max_lines": 1, "max_sentences": 1},
+    "vision": {"max_tokens": 500, "stop": [], "max_lines": 0, "max_sentences": 0},
+    "summary": {"max_tokens": 200, "stop": [], "max_lines": 0, "max_sentences": 0},
+}
+
+
+def get_generation_profile(config, response_type):
+    """
+    Returns the generation profile (token budget, stop sequences, line and sentence limits)
+    for a response type, merging config.yaml's `generation` section over the defaults.
+    """
+    profile = dict(DEFAULT_PROFILES.get(response_type, DEFAULT_PROFILES["chat"]))
+    if response_type == "chat":
+        profile["max_tokens"] = config.get("ai_model", {}).get("max_tokens", profile["max_tokens"])
+    profile.update(config.get("generation", {}).get(response_type) or {})
+    profile["stop"] = list(profile.get("stop") or [])
+    return profile
+
+
+class StopCondition:
+    """
+    Tracks a streamed generation and decides when the kept portion is complete.
+    The generation is complete at the first stop sequence, or once `max_lines` lines
+    or `max_sentences` sentences have been produced (0 disables a limit).
+    """
+
+    def __init__(self, stop=None, max_lines=0, max_sentences=0):
+        self.stop = [s for s in (stop or []) if s]
+        self.max_lines = max_lines or 0
+        self.max_sentences = max_sentences or 0
+        self.raw = ""
+        self.emitted = 0
+        self.done = False
+
+    @classmethod
+    def from_profile(cls, profile):
+        return cls(
+            stop=profile.get("stop"),
+            max_lines=profile.get("max_lines", 0),
+            max_sentences=profile.get("max_sentences", 0),
+        )
+
+    @property
+    def text(self):
+        """
+        The kept text so far.
+        """
+        return self.raw[:self.emitted]
+
+    def _cut_position(self):
+        """
+        Returns the index where the kept text ends, or None if it is not complete yet.
+        """
+        cuts = []
+        for sequence in self.stop:
+            index = self.raw.find(sequence)
+            if index != -1:
+                cuts.append(index)
+
+        if self.max_lines:
+            index = -1
+            for _ in range(self.max_lines):
+                index = self.raw.find("\n", index + 1)
+                if index == -1:
+                    break
+            if index != -1:
+                cuts.append(index)
+
+        if self.max_sentences:
+            ends = [match.end() for match in SENTENCE_END.finditer(self.raw)]
+            if len(ends) >= self.max_sentences:
+                cuts.append(ends[self.max_sentences - 1])
+
+        return min(cuts) if cuts else None
+
+    def _holdback(self):
+        """
+        Length of the tail that could still turn into a stop sequence.
+        """
+        longest = 0
+        for sequence in self.stop:
+            for length in range(min(len(sequence) - 1, len(self.raw)), longest, -1):
+                if self.raw.endswith(sequence[:length]):
+                    longest = length
+                    break
+        return longest
+
+    def feed(self, chunk):
+        """
+        Consumes a streamed chunk and returns the newly kept text that is safe to emit.
+        """
+        if self.done or not chunk:
+            return ""
+
+        # Leading whitespace never counts towards the kept text
+        if not self.raw:
+            chunk = chunk.lstrip()
+            if not chunk:
+                return ""
+        self.raw += chunk
+
+        cut = self._cut_position()
+        if cut is not None:
+            self.done = True
+            self.raw = self.raw[:cut].rstrip()
+            # Whitespace emitted before the cut is stripped: the kept text is exactly the truncated raw
+            delta = self.raw[self.emitted:]
+            self.emitted = len(self.raw)
+            return delta
+
+        end = len(self.raw) - self._holdback()
+        delta = self.raw[self.emitted:end]
+        self.emitted = max(end, self.emitted)
+        return delta
+
+    def finish(self):
+        """
+        Marks the stream as ended and returns any held-back text.
+        """
+        if self.done:
+            return ""
+        self.done = True
+        delta = self.raw[self.emitted:]
+        self.emitted = len(self.raw)
+        return delta
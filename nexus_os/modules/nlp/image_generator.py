@@ -1,30 +1,79 @@
+import io
 import os
-import uuid
 import base64
-import requests
+import hashlib
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from PIL import Image, ImageDraw, ImageFont
-import numpy as np
-import cv2
-import base64
-
-# Configuration
-UPLOAD_FOLDER = './uploads'
-ASCII_FOLDER = './ascii_output'
-PUBLISHED_FOLDER = './ascii_published'
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs(ASCII_FOLDER, exist_ok=True)
-os.makedirs(PUBLISHED_FOLDER, exist_ok=True)
+from nexus_os.core.clients import get_clients
+from nexus_os.modules.nlp.artifact_store import artifact_key, get_artifact_store
+from nexus_os.modules.nlp.ascii_art import render_ascii
+from nexus_os.modules.nlp.ascii_video import generate_ascii_video
 
 WATERMARK_TEXT = "Nexus-Ereb.us"
-URL_STABLE_DIFFUSION = "http://127.0.0.1:7860"  # Change if necessary
 #MODEL_NAME = "pepe_frog SDXL.safetensors"  # Nombre de tu modelo personalizado
-FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf" 
-
-def generate_image_from_text(prompt: str, output_path: str):
+FONT_PATH = "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf"
+WATERMARK_FONT = "DejaVuSans.ttf"
+TWITTER_SIZE = (1200, 675)  # Tamaño recomendado para Twitter
+# zlib level of the original variant, written before the response points to it: fast to encode.
+# The other variants are written in the background at the default level.
+RESPONSE_COMPRESS_LEVEL = 1
+# Post-processing settings; they are part of every artifact key, so changing them regenerates the variants
+POSTPROCESS_PARAMS = {
+    "version": 1,
+    "watermark": [WATERMARK_TEXT, WATERMARK_FONT, FONT_PATH],
+    "twitter_size": list(TWITTER_SIZE),
+    "ascii": {"num_cols": 100, "scale": 2, "bg_color": "black", "char_set": "@%#*+=-:. ", "color_mode": "original"},
+}
+
+# Encodes the image variants in parallel and writes them to disk in the background
+_postprocess_executor = None
+_postprocess_lock = threading.Lock()
+
+
+def get_postprocess_executor():
+    global _postprocess_executor
+    with _postprocess_lock:
+        if _postprocess_executor is None:
+            _postprocess_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="image-postprocess")
+        return _postprocess_executor
+
+
+@functools.lru_cache(maxsize=None)
+def get_font(path, size):
+    """Loads a font once per path and size."""
+    return ImageFont.truetype(path, size)
+
+
+@functools.lru_cache(maxsize=None)
+def get_watermark_sprite(text=WATERMARK_TEXT, font_path=WATERMARK_FONT, size=20, fill=(255, 255, 255, 128)):
     """
-    Genera una imagen de alta calidad a partir de un prompt de texto usando un modelo Stable Diffusion 
-    con parámetros avanzados y añade una marca de agua automáticamente.
+    Renders the watermark text once as a transparent RGBA sprite.
+    Returns the sprite and the text's (width, height), used to place it.
     """
+    try:
+        font = get_font(font_path, size)
+    except OSError:
+        raise RuntimeError(f"Font not found. Ensure '{font_path}' is available or specify another font.")
+    bbox = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox((0, 0), text, font=font)
+    sprite = Image.new("RGBA", (max(bbox[2], 1), max(bbox[3], 1)), (0, 0, 0, 0))
+    ImageDraw.Draw(sprite).text((0, 0), text, fill=fill, font=font)
+    return sprite, (bbox[2] - bbox[0], bbox[3] - bbox[1])
+
+
+def watermark_image(image):
+    """Returns an RGB copy of the image with the watermark at the bottom-right corner."""
+    sprite, (text_width, text_height) = get_watermark_sprite()
+    x, y = image.size[0] - text_width - 10, image.size[1] - text_height - 10
+    combined = image.convert("RGBA")
+    # Only the sprite's area is composited, instead of a full-frame overlay
+    combined.alpha_composite(sprite, dest=(max(x, 0), max(y, 0)), source=(max(-x, 0), max(-y, 0)))
+    return combined.convert("RGB")
+
+
+def build_payload(prompt: str, **params):
+    """Returns the txt2img payload for a prompt; `params` override the defaults."""
     payload = {
         "prompt": prompt,
         "steps": 50,  # Número de pasos de generación
@@ -34,88 +83,49 @@ def generate_image_from_text(prompt: str, output_path: str):
         "scheduler": "Karras",  # Tipo de programación para el sampler
         "cfg_scale": 7  # Control de escala CFG para ajuste de precisión
     }
-    
+    payload.update(params)
+    return payload
+
+
+def request_image(prompt: str, **params):
+    """Requests an image from Stable Diffusion and returns the encoded image bytes."""
+    # Pooled session with the Stable Diffusion timeout and concurrency limit from config.yaml
+    response = get_clients().post("stable_diffusion", "/sdapi/v1/txt2img", json=build_payload(prompt, **params))
+    response.raise_for_status()
+    r = response.json()
+    return base64.b64decode(r["images"][0])
+
+
+def generate_image_from_text(prompt: str, output_path: str):
+    """
+    Genera una imagen de alta calidad a partir de un prompt de texto usando un modelo Stable Diffusion
+    con parámetros avanzados y añade una marca de agua automáticamente.
+    """
     try:
-        response = requests.post(
-            url=f"{URL_STABLE_DIFFUSION}/sdapi/v1/txt2img",
-            json=payload
-        )
-        response.raise_for_status()
-        r = response.json()
-        image_base64 = r["images"][0]
-        image_data = base64.b64decode(image_base64)
-        
-        # Guardar la imagen generada
-        temp_path = f"{output_path}.tmp"  # Archivo temporal
-        with open(temp_path, "wb") as f:
-            f.write(image_data)
-        print(f"Imagen generada y guardada temporalmente en {temp_path}")
-        
-        # Añadir marca de agua
-        add_watermark(temp_path, output_path)
+        image = Image.open(io.BytesIO(request_image(prompt)))
+        watermark_image(image).save(output_path)
         print(f"Imagen con marca de agua guardada en {output_path}")
-        
-        # Eliminar el archivo temporal
-        os.remove(temp_path)
     except Exception as e:
         raise RuntimeError(f"Error al generar la imagen desde el texto: {e}")
 
 
-
 def add_watermark(image_path, output_path):
     """Adds a watermark to an image."""
-    image = Image.open(image_path).convert("RGBA")
-    watermark = Image.new("RGBA", image.size, (0, 0, 0, 0))
-    draw = ImageDraw.Draw(watermark)
+    with Image.open(image_path) as image:
+        watermark_image(image).save(output_path)
 
-    try:
-        font = ImageFont.truetype("DejaVuSans.ttf", 20)  # Ensure this font is installed
-    except OSError:
-        raise RuntimeError("Font not found. Ensure 'DejaVuSans.ttf' is available or specify another font.")
 
-    # Use `textbbox` to calculate text dimensions
-    bbox = draw.textbbox((0, 0), WATERMARK_TEXT, font=font)
-    text_width, text_height = bbox[2] - bbox[0], bbox[3] - bbox[1]
-
-    # Calculate the watermark position at the bottom-right corner with padding
-    position = (image.size[0] - text_width - 10, image.size[1] - text_height - 10)
-    draw.text(position, WATERMARK_TEXT, fill=(255, 255, 255, 128), font=font)
-
-    # Merge the watermark with the original image
-    combined = Image.alpha_composite(image, watermark)
-    combined.convert("RGB").save(output_path)
-
-def generate_ascii_image(input_path, output_path, num_cols=100, scale=2, bg_color="black", char_set="@%#*+=-:. ", color_mode="original"):
-    num_chars = len(char_set)
+def render_ascii_image(image, num_cols=100, scale=2, bg_color="black", char_set="@%#*+=-:. ", color_mode="original"):
+    """Renders an image as ASCII art with the bold watermark drawn on it."""
     bg_code = (255, 255, 255) if bg_color == "white" else (0, 0, 0)
 
-    image = Image.open(input_path).convert('RGB')
-    width, height = image.size
-    cell_width = width / num_cols
-    cell_height = scale * cell_width
-    num_rows = int(height / cell_height)
-
-    char_width, char_height = 6, 12
-    out_width = char_width * num_cols
-    out_height = char_height * num_rows
-    out_image = Image.new("RGB", (out_width, out_height), bg_code)
-    draw = ImageDraw.Draw(out_image)
-
-    for i in range(num_rows):
-        for j in range(num_cols):
-            crop = image.crop(
-                (j * cell_width, i * cell_height, (j + 1) * cell_width, (i + 1) * cell_height)
-            )
-            avg_color = tuple(np.array(crop).mean(axis=(0, 1)).astype(int))
-            intensity = np.mean(avg_color)
-            char = char_set[min(int((intensity / 255) * num_chars), num_chars - 1)]
-            fill_color = avg_color if color_mode == "original" else (255, 0, 0)
-            draw.text((j * char_width, i * char_height), char, fill=fill_color)
+    # Vectorized renderer: block-averaged cells blitted from a cached glyph atlas
+    out_image = render_ascii(image.convert('RGB'), num_cols, scale, bg_code, char_set, color_mode)
 
     # Añadir marca de agua
     watermark = ImageDraw.Draw(out_image)
     try:
-        font = ImageFont.truetype(FONT_PATH, 20)  # Ruta de la fuente
+        font = get_font(FONT_PATH, 20)  # Ruta de la fuente
     except OSError:
         raise RuntimeError("Font not found. Please ensure the font path is correct.")
 
@@ -126,173 +136,200 @@ def generate_ascii_image(input_path, output_path, num_cols=100, scale=2, bg_colo
     # Posición para la marca de agua
     position = (out_image.size[0] - text_width - 10, out_image.size[1] - text_height - 10)
     watermark.text(position, WATERMARK_TEXT, fill=(255, 255, 255, 128), font=font)
+    return out_image
+
+
+def generate_ascii_image(input_path, output_path, num_cols=100, scale=2, bg_color="black", char_set="@%#*+=-:. ", color_mode="original"):
+    with Image.open(input_path) as image:
+        out_image = render_ascii_image(image, num_cols, scale, bg_color, char_set, color_mode)
 
     # Guardar la imagen final con ASCII y watermark
     out_image.save(output_path)
 
 
+def resize_for_twitter(image):
+    # Cambia ANTIALIAS a Resampling.LANCZOS
+    return image.resize(TWITTER_SIZE, Image.Resampling.LANCZOS)
+
+
 def optimize_for_twitter(input_path, output_path):
     try:
         with Image.open(input_path) as img:
-            # Cambia ANTIALIAS a Resampling.LANCZOS
-            img = img.resize((1200, 675), Image.Resampling.LANCZOS)  # Tamaño recomendado para Twitter
-            img.save(output_path, format="PNG", optimize=True)
+            resize_for_twitter(img).save(output_path, format="PNG", optimize=True)
             print(f"[LOG] Image optimized and saved at {output_path}")
     except Exception as e:
         print(f"[ERROR] Error al optimizar la imagen para Twitter: {e}")
         raise
 
-def generate_image_and_ascii_base64(prompt: str):
-    """Generates an image from text, adds watermark, converts to ASCII art, and returns Base64-encoded images."""
-    # Ruta y nombres de archivo
-    image_filename = f"{uuid.uuid4()}.png"
-    image_path = os.path.join(UPLOAD_FOLDER, image_filename)
-
-    # Generar imagen desde texto
-    generate_image_from_text(prompt, image_path)
-
-    # Agregar marca de agua a la imagen generada
-    watermarked_image_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_{image_filename}")
-    add_watermark(image_path, watermarked_image_path)
-
-    # Optimizar para Twitter
-    twitter_image_path = os.path.join(PUBLISHED_FOLDER, f"twitter_{image_filename}")
-    optimize_for_twitter(watermarked_image_path, twitter_image_path)
-
-    # Agregar marca de agua a la imagen optimizada para Twitter
-    twitter_watermarked_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_twitter_{image_filename}")
-    add_watermark(twitter_image_path, twitter_watermarked_path)
-
-    # Generar arte ASCII desde la imagen con marca de agua
-    ascii_image_filename = f"ascii_{image_filename}"
-    ascii_image_path = os.path.join(ASCII_FOLDER, ascii_image_filename)
-    generate_ascii_image(
-        input_path=watermarked_image_path,  # Usar la imagen con marca de agua
-        output_path=ascii_image_path,
-        num_cols=100,
-        scale=2,
-        bg_color="black",
-        char_set="@%#*+=-:. ",
-        color_mode="original"
-    )
-
-    # Agregar marca de agua al arte ASCII
-    watermarked_ascii_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_{ascii_image_filename}")
-    add_watermark(ascii_image_path, watermarked_ascii_path)
-
-    # Convertir las imágenes generadas a Base64
-    def encode_image_to_base64(image_path):
-        with open(image_path, "rb") as img_file:
-            return base64.b64encode(img_file.read()).decode('utf-8')
-
-    # Retornar imágenes en Base64
-    return f"data:image/png;base64,{encode_image_to_base64(image_path)}"
-
-def generate_image_and_ascii(prompt: str):
-    """Generates an image from text, adds watermark, converts to ASCII art, and prepares for Twitter."""
-    # Ruta y nombres de archivo
-    image_filename = f"{uuid.uuid4()}.png"
-    image_path = os.path.join(UPLOAD_FOLDER, image_filename)
-
-    # Generar imagen desde texto
-    generate_image_from_text(prompt, image_path)
-
-    # Agregar marca de agua a la imagen generada
-    watermarked_image_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_{image_filename}")
-    add_watermark(image_path, watermarked_image_path)
-
-    # Optimizar para Twitter
-    twitter_image_path = os.path.join(PUBLISHED_FOLDER, f"twitter_{image_filename}")
-    optimize_for_twitter(watermarked_image_path, twitter_image_path)
-
-    # Agregar marca de agua a la imagen optimizada para Twitter
-    twitter_watermarked_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_twitter_{image_filename}")
-    add_watermark(twitter_image_path, twitter_watermarked_path)
-
-    # Generar arte ASCII desde la imagen con marca de agua
-    ascii_image_filename = f"ascii_{image_filename}"
-    ascii_image_path = os.path.join(ASCII_FOLDER, ascii_image_filename)
-    generate_ascii_image(
-        input_path=watermarked_image_path,  # Usar la imagen con marca de agua
-        output_path=ascii_image_path,
-        num_cols=100,
-        scale=2,
-        bg_color="black",
-        char_set="@%#*+=-:. ",
-        color_mode="original"
-    )
-
-    # Agregar marca de agua al arte ASCII
-    watermarked_ascii_path = os.path.join(PUBLISHED_FOLDER, f"watermarked_{ascii_image_filename}")
-    add_watermark(ascii_image_path, watermarked_ascii_path)
 
-    # Retornar rutas de los archivos generados
-    return {
-        "original_image": image_path,
-        "watermarked_image": watermarked_image_path,
-        "twitter_image": twitter_watermarked_path,  # Cambiado a la imagen con watermark
-        "ascii_image": ascii_image_path,
-        "watermarked_ascii_image": watermarked_ascii_path
-    }
+# Variants derived from the original, written in the background
+DERIVED_VARIANTS = ("watermarked", "twitter", "watermarked_twitter", "ascii", "watermarked_ascii")
+
+
+def build_variants(image, original=None):
+    """
+    Derives every published variant from the decoded Stable Diffusion image, in memory.
+    Each variant is built from the previous ones, as the file-based steps did.
+    """
+    variants = {"original": original if original is not None else watermark_image(image)}
+    variants["watermarked"] = watermark_image(variants["original"])
+    variants["twitter"] = resize_for_twitter(variants["watermarked"])
+    variants["watermarked_twitter"] = watermark_image(variants["twitter"])
+    variants["ascii"] = render_ascii_image(variants["watermarked"])
+    variants["watermarked_ascii"] = watermark_image(variants["ascii"])
+    return variants
+
+
+def encode_png(image, optimize=False, compress_level=6):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=optimize, compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def save_variant(ref, name, image, optimize=False):
+    return get_artifact_store().write(ref, name, encode_png(image, optimize=optimize))
 
 
-def generate_ascii_video(input_path, output_path, num_cols=100, scale=1, bg_color="black",
-                         char_set="@%#*+=-:. ", fps=0, overlay_ratio=0.2):
+def persist_variants(variants, ref):
     """
-    Convierte un video o GIF a un video ASCII animado.
+    Encodes the variants in parallel and writes them to the artifact.
+    Returns the futures of the written paths.
     """
-    if bg_color == "white":
-        bg_code = (255, 255, 255)
-    else:
-        bg_code = (0, 0, 0)
-
-    cap = cv2.VideoCapture(input_path)
-    if fps == 0:
-        fps = int(cap.get(cv2.CAP_PROP_FPS))
-
-    CHAR_LIST = char_set
-    num_chars = len(CHAR_LIST)
-
-    # Configurar el escritor de video
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    cell_width = width / num_cols
-    cell_height = 2 * cell_width
-    num_rows = int(height / cell_height)
-    char_width, char_height = 6, 12
-    out_width = char_width * num_cols
-    out_height = char_height * num_rows
-
-    fourcc = cv2.VideoWriter_fourcc(*"XVID")
-    out = cv2.VideoWriter(output_path, fourcc, fps, (out_width, out_height))
-
-    font = ImageFont.truetype("DejaVuSansMono-Bold.ttf", size=int(10 * scale))
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        out_image = Image.new("RGB", (out_width, out_height), bg_code)
-        draw = ImageDraw.Draw(out_image)
-
-        for i in range(num_rows):
-            for j in range(num_cols):
-                crop = image.crop((
-                    int(j * cell_width),
-                    int(i * cell_height),
-                    int(min((j + 1) * cell_width, width)),
-                    int(min((i + 1) * cell_height, height)),
-                ))
-                avg_color = tuple(np.array(crop).mean(axis=(0, 1)).astype(int))
-                intensity = np.mean(avg_color)
-                char_index = max(0, min(int((intensity / 255) * num_chars), num_chars - 1))
-                char = CHAR_LIST[char_index]
-                fill_color = avg_color
-                draw.text((j * char_width, i * char_height), char, fill=fill_color, font=font)
-
-        out.write(np.array(out_image))
-
-    cap.release()
-    out.release()
\ No newline at end of file
+    executor = get_postprocess_executor()
+    return [
+        executor.submit(save_variant, ref, name, image, name == "twitter")
+        for name, image in variants.items()
+    ]
+
+
+def request_key(payload):
+    """
+    Returns the artifact key of a txt2img request, or None when its seed is random.
+    """
+    if int(payload.get("seed", -1)) < 0:
+        return None
+    return artifact_key({"request": payload, "postprocess": POSTPROCESS_PARAMS})
+
+
+def image_key(image_data):
+    """Returns the artifact key of a generated image, for requests with a random seed."""
+    return artifact_key({"image": hashlib.sha256(image_data).hexdigest(), "postprocess": POSTPROCESS_PARAMS})
+
+
+def lookup_image(payload):
+    """Returns the stored artifact of a request, or None if it has to be generated."""
+    key = request_key(payload)
+    return None if key is None else get_artifact_store().lookup(key)
+
+
+def persist_in_background(image, original, ref, payload):
+    """
+    Builds the derived variants of a committed artifact and stores them without blocking the caller.
+    Returns a future that completes once they are written and the artifact's size is updated.
+    """
+    committed = Future()
+
+    def commit(futures):
+        try:
+            for future in futures:
+                future.result()
+            params = {"request": payload, "postprocess": POSTPROCESS_PARAMS}
+            get_artifact_store().commit(ref, payload.get("prompt", ""), params)
+            committed.set_result(ref)
+        except Exception as e:
+            print(f"[ERROR] Error al guardar las variantes de la imagen: {e}")
+            committed.set_exception(e)
+
+    def run():
+        try:
+            variants = build_variants(image, original)
+            del variants["original"]
+            futures = persist_variants(variants, ref)
+        except Exception as e:
+            print(f"[ERROR] Error al generar las variantes de la imagen: {e}")
+            committed.set_exception(e)
+            return
+        # Commit when the last variant is written, without blocking a worker on the others
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                commit(futures)
+
+        for future in futures:
+            future.add_done_callback(done)
+
+    get_postprocess_executor().submit(run)
+    return committed
+
+
+def store_image(image_data, payload, wait=False):
+    """
+    Stores a generated image under the key of its request (of the image itself when the seed is
+    random) and returns the artifact. The watermarked original is written and committed before
+    returning, so its reference stays valid even if the other variants fail; those are written in
+    the background, unless `wait` is set.
+    """
+    store = get_artifact_store()
+    key = request_key(payload) or image_key(image_data)
+    ref = store.lookup(key)
+    if ref is not None:
+        return ref
+    ref = store.ref(key)
+
+    # Decodificar la imagen una sola vez
+    image = Image.open(io.BytesIO(image_data))
+    image.load()
+    original = watermark_image(image)
+    store.write(ref, "original", encode_png(original, compress_level=RESPONSE_COMPRESS_LEVEL))
+    store.commit(ref, payload.get("prompt", ""), {"request": payload, "postprocess": POSTPROCESS_PARAMS})
+    committed = persist_in_background(image, original, ref, payload)
+    if wait:
+        committed.result()
+    return ref
+
+
+def complete_variants(ref, payload):
+    """
+    Rebuilds the derived variants of a stored artifact from its original if any is missing
+    (they were still being written, or writing them failed).
+    """
+    if all(os.path.exists(ref.path(name)) for name in DERIVED_VARIANTS):
+        return ref
+    with Image.open(ref.path("original")) as original:
+        original.load()
+    persist_in_background(original, original, ref, payload).result()
+    return ref
+
+
+def generate_image_artifact(prompt: str, wait=False, **params):
+    """Returns the stored artifact of a prompt, generating the image on a miss."""
+    payload = build_payload(prompt, **params)
+    ref = lookup_image(payload)
+    if ref is not None:
+        return complete_variants(ref, payload) if wait else ref
+    try:
+        image_data = request_image(prompt, **params)
+    except Exception as e:
+        raise RuntimeError(f"Error al generar la imagen desde el texto: {e}")
+    return store_image(image_data, payload, wait)
+
+
+def generate_image_and_ascii(prompt: str, **params):
+    """Generates an image from text, adds watermark, converts to ASCII art, and prepares for Twitter."""
+    ref = generate_image_artifact(prompt, wait=True, **params)
+
+    # Retornar rutas de los archivos generados
+    return {
+        "key": ref.key,
+        "cached": ref.cached,
+        "original_image": ref.path("original"),
+        "watermarked_image": ref.path("watermarked"),
+        "twitter_image": ref.path("watermarked_twitter"),  # Cambiado a la imagen con watermark
+        "ascii_image": ref.path("ascii"),
+        "watermarked_ascii_image": ref.path("watermarked_ascii")
+    }
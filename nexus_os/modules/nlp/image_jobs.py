@@ -0,0 +1,229 @@
+import asyncio
+import base64
+import collections
+import itertools
+import json
+
+from nexus_os.core.clients import get_clients
+from nexus_os.modules.nlp.image_generator import build_payload
+
+
+class ImageJob:
+    """
+    One requested image: its txt2img payload, progress callbacks and result future.
+    A request with a fixed seed always yields the same image, so identical ones share a job;
+    jobs with a random seed and otherwise equal payloads can share one batched request.
+    """
+
+    def __init__(self, job_id, payload):
+        self.id = job_id
+        self.payload = payload
+        self.key = json.dumps(payload, sort_keys=True)
+        self.callbacks = []
+        self.waiters = 0
+        self.future = asyncio.get_running_loop().create_future()
+        self.state = "queued"
+        self.progress = 0.0
+        self.batch = None
+
+    @property
+    def random_seed(self):
+        return int(self.payload.get("seed", -1)) < 0
+
+    def describe(self):
+        return f"#{self.id} {self.payload.get('prompt', '')!r}: {self.state} ({self.progress:.0%})"
+
+
+class ImageJobQueue:
+    """
+    Queues Stable Diffusion txt2img jobs and runs at most `max_running` requests at a time.
+    Jobs with a random seed and equal parameters waiting together are merged into one request of
+    up to `max_batch_size` images; Stable Diffusion gives batch images consecutive seeds, so
+    identical fixed-seed requests share one job instead. While a request runs, /sdapi/v1/progress is polled and its progress and live
+    preview are passed to the jobs' callbacks; cancelling every job of a running request
+    stops it with /sdapi/v1/interrupt.
+    """
+
+    def __init__(self, config, logger, clients=None):
+        self.logger = logger
+        self.clients = clients or get_clients(config)
+        jobs_config = config.get("image_jobs", {})
+        self.max_batch_size = jobs_config.get("max_batch_size", 4)
+        self.batch_window = jobs_config.get("batch_window", 0.05)
+        self.max_running = jobs_config.get("max_running", self.clients.backends["stable_diffusion"]["max_concurrency"])
+        self.progress_interval = jobs_config.get("progress_interval", 1.0)
+        self.ids = itertools.count(1)
+        self.jobs = {}
+        # Unfinished fixed-seed jobs by payload key
+        self.fixed = {}
+        self.pending = collections.deque()
+        # Bound to the event loop of the first submitted job
+        self.wakeup = None
+        self.running = None
+        self.dispatcher = None
+
+    def submit(self, prompt, on_progress=None, **params):
+        """
+        Queues a job; `on_progress(fraction, preview)` receives the progress and, when the
+        server has a new one, a Base64 PNG preview (None otherwise).
+        """
+        if self.dispatcher is None or self.dispatcher.done():
+            self.wakeup = asyncio.Event()
+            self.running = asyncio.Semaphore(self.max_running)
+            self.dispatcher = asyncio.ensure_future(self.dispatch())
+
+        payload = build_payload(prompt, **params)
+        job = self.fixed.get(json.dumps(payload, sort_keys=True))
+        if job is not None and not job.future.done():
+            self.logger.info(f"Image job #{job.id} already generates this image, sharing it.")
+        else:
+            job = ImageJob(next(self.ids), payload)
+            self.jobs[job.id] = job
+            if not job.random_seed:
+                self.fixed[job.key] = job
+            job.future.add_done_callback(lambda _: self.forget(job))
+            self.pending.append(job)
+            self.wakeup.set()
+            self.logger.info(f"Image job #{job.id} queued ({len(self.pending)} waiting).")
+        job.waiters += 1
+        if on_progress is not None:
+            job.callbacks.append(on_progress)
+        return job
+
+    def forget(self, job):
+        self.jobs.pop(job.id, None)
+        if self.fixed.get(job.key) is job:
+            del self.fixed[job.key]
+
+    async def generate(self, prompt, on_progress=None, **params):
+        """
+        Queues a job and returns the generated image bytes.
+        Cancelling the caller cancels the job once no other caller waits for it.
+        """
+        job = self.submit(prompt, on_progress, **params)
+        try:
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.waiters -= 1
+            if on_progress in job.callbacks:
+                job.callbacks.remove(on_progress)
+            if job.waiters <= 0:
+                await self.cancel(job.id)
+            raise
+
+    async def cancel(self, job_id):
+        """
+        Cancels a queued or running job. Returns False if there is no such job.
+        """
+        job = self.jobs.get(job_id)
+        if job is None:
+            return False
+        if job in self.pending:
+            self.pending.remove(job)
+        job.state = "cancelled"
+        job.future.cancel()
+        self.logger.info(f"Image job #{job.id} cancelled.")
+
+        if job.batch is not None and all(other.future.done() for other in job.batch):
+            # Nobody waits for the running request any more
+            try:
+                await self.clients.apost_json("stable_diffusion", "/sdapi/v1/interrupt", {}, limited=False)
+                self.logger.info(f"Interrupted the Stable Diffusion request of job #{job.id}.")
+            except Exception as e:
+                self.logger.error(f"Error interrupting Stable Diffusion: {e}")
+        return True
+
+    def describe(self):
+        if not self.jobs:
+            return "No image jobs."
+        return "\n".join(job.describe() for job in self.jobs.values())
+
+    def take_batch(self):
+        """
+        Takes the oldest job and, for a random seed, the compatible jobs queued after it.
+        """
+        first = self.pending.popleft()
+        batch = [first]
+        if not first.random_seed:
+            return batch
+        for job in list(self.pending):
+            if len(batch) >= self.max_batch_size:
+                break
+            if job.key == first.key:
+                self.pending.remove(job)
+                batch.append(job)
+        return batch
+
+    async def dispatch(self):
+        while True:
+            # Jobs keep queuing, and merging, while every request slot is busy
+            await self.running.acquire()
+            while not self.pending:
+                self.wakeup.clear()
+                await self.wakeup.wait()
+            # Let jobs submitted at the same moment join the batch
+            await asyncio.sleep(self.batch_window)
+            if not self.pending:
+                self.running.release()
+                continue
+            task = asyncio.ensure_future(self.run_batch(self.take_batch()))
+            task.add_done_callback(lambda _: self.running.release())
+
+    async def run_batch(self, batch):
+        payload = dict(batch[0].payload, batch_size=len(batch))
+        for job in batch:
+            job.state = "running"
+            job.batch = batch
+        self.logger.info(f"Running image jobs {', '.join(f'#{job.id}' for job in batch)} as one request.")
+
+        poller = asyncio.ensure_future(self.poll_progress(batch))
+        try:
+            response = await self.clients.apost_json("stable_diffusion", "/sdapi/v1/txt2img", payload)
+            # A grid image, when the server adds one, comes first
+            images = response.get("images", [])[-len(batch):]
+            for index, job in enumerate(batch):
+                if job.future.done():
+                    continue
+                if index < len(images):
+                    job.state = "done"
+                    job.future.set_result(base64.b64decode(images[index]))
+                else:
+                    job.future.set_exception(RuntimeError("Stable Diffusion returned too few images"))
+        except Exception as e:
+            self.logger.error(f"Error running image jobs: {e}")
+            for job in batch:
+                if not job.future.done():
+                    job.state = "failed"
+                    job.future.set_exception(e)
+        finally:
+            poller.cancel()
+
+    async def poll_progress(self, batch):
+        """
+        Reports the server's progress and new live previews to the batch's jobs.
+        """
+        last_preview = None
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            try:
+                data = await self.clients.aget_json(
+                    "stable_diffusion", "/sdapi/v1/progress", params={"skip_current_image": "false"}
+                )
+            except Exception as e:
+                self.logger.warning(f"Error reading Stable Diffusion progress: {e}")
+                continue
+
+            preview = data.get("current_image")
+            if preview == last_preview:
+                preview = None
+            else:
+                last_preview = preview
+            for job in batch:
+                job.progress = data.get("progress") or 0.0
+                if job.future.done():
+                    continue
+                for on_progress in list(job.callbacks):
+                    try:
+                        on_progress(job.progress, preview)
+                    except Exception as e:
+                        self.logger.error(f"Error in the progress callback of image job #{job.id}: {e}")
@@ -1,6 +1,5 @@
-import asyncio
-from concurrent.futures import ThreadPoolExecutor
-from langchain_ollama import OllamaLLM
+from nexus_os.core.clients import get_clients
+from nexus_os.modules.nlp.generation import StopCondition, get_generation_profile
 
 async def analyze_conversation(user_message, memory):
     """
@@ -12,13 +11,41 @@ async def analyze_conversation(user_message, memory):
     context = [{"role": "system", "content": system_prompt}]
     context += [{"role": "user", "content": m} for m in memory]
     context.append({"role": "user", "content": user_message})
+    return await generate_thought(context)
 
-    # Configure the Ollama LLM
-    llm = OllamaLLM(model="llama3.2:latest", max_tokens=15, host="http://localhost:11434", temperature=0.5)
 
-    # Use ThreadPoolExecutor for blocking call in async function
-    loop = asyncio.get_event_loop()
-    with ThreadPoolExecutor() as executor:
-        thought = await loop.run_in_executor(executor, llm.invoke, context)
+async def anticipate_conversation(memory):
+    """
+    Generate a concise thought about the conversation so far, before the next message is known:
+    what the user is likely to ask next and what to keep in mind when answering.
+    """
+    system_prompt = """
+    You are an AI with an internal mind capable of reflecting deeply. The user has not sent their next message yet. Generate a concise internal thought about the conversation so far: what the user is likely to ask next and what to keep in mind when answering.
+    """
+    context = [{"role": "system", "content": system_prompt}]
+    context += [{"role": "user", "content": m} for m in memory]
+    return await generate_thought(context)
+
+
+async def generate_thought(context):
+    """
+    Runs the thought request and trims it to the thought profile's limits.
+    """
+    # Use the shared Ollama LLM configured with the thought budget
+    clients = get_clients()
+    profile = get_generation_profile(clients.config, "thought")
+    llm = clients.get_llm(
+        clients.config["ai_model"]["name"],
+        num_predict=profile["max_tokens"],
+        stop=profile["stop"] or None,
+        temperature=0.5,
+    )
+
+    # Async request: a timed-out thought closes its connection and frees its slot
+    thought = await clients.ainvoke("ollama", llm, context)
 
-    return thought.strip()
+    # Keep only the part of the thought allowed by the profile's limits
+    stop_condition = StopCondition.from_profile(profile)
+    stop_condition.feed(thought)
+    stop_condition.finish()
+    return stop_condition.text.strip()
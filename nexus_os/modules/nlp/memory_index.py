@@ -0,0 +1,172 @@
+import os
+import threading
+
+import numpy as np
+
+from nexus_os.modules.nlp.embeddings import DEFAULT_EMBEDDING_MODEL, embed_texts
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+
+def turn_text(user_input, ai_response):
+    return f"User: {user_input}\nAI: {ai_response}"
+
+
+class MemoryIndex:
+    """
+    Vector index over stored conversation turns, keyed by their `context` row id.
+    Uses a faiss HNSW index when faiss is installed and a NumPy matrix otherwise.
+    The index is updated incrementally and persisted next to the SQLite database.
+    """
+
+    def __init__(self, db_path, logger, embedding_model=DEFAULT_EMBEDDING_MODEL, save_every=20):
+        self.logger = logger
+        self.embedding_model = embedding_model
+        self.save_every = save_every
+        self.path = f"{db_path}.faiss" if faiss is not None else f"{db_path}.vectors.npz"
+        self.lock = threading.Lock()
+        self.unsaved = 0
+
+        self.index = None
+        self.ids = np.empty(0, dtype=np.int64)
+        self.vectors = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            if faiss is not None:
+                self.index = faiss.read_index(self.path)
+                self.ids = faiss.vector_to_array(self.index.id_map).astype(np.int64)
+            else:
+                data = np.load(self.path)
+                self.ids = data["ids"].astype(np.int64)
+                self.vectors = data["vectors"].astype(np.float32)
+            self.logger.info(f"Loaded memory index with {len(self.ids)} turns from {self.path}")
+        except Exception as e:
+            self.logger.error(f"Error loading memory index, starting empty: {e}")
+            self.index, self.vectors = None, None
+            self.ids = np.empty(0, dtype=np.int64)
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def _save(self):
+        try:
+            if faiss is not None and self.index is not None:
+                faiss.write_index(self.index, self.path)
+            elif self.vectors is not None:
+                # Write through a temporary file so a crash never leaves a truncated index
+                temp_path = f"{self.path}.tmp.npz"
+                np.savez(temp_path, ids=self.ids, vectors=self.vectors)
+                os.replace(temp_path, self.path)
+            self.unsaved = 0
+        except Exception as e:
+            self.logger.error(f"Error saving memory index: {e}")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def missing(self, turn_ids):
+        """
+        Returns the ids that are not in the index yet.
+        """
+        with self.lock:
+            known = set(self.ids.tolist())
+        return [turn_id for turn_id in turn_ids if turn_id not in known]
+
+    def add(self, turns):
+        """
+        Embeds and indexes a list of (turn_id, user_input, ai_response) tuples.
+        """
+        turns = list(turns)
+        if not turns:
+            return
+        vectors = embed_texts([turn_text(user_input, ai_response) for _, user_input, ai_response in turns],
+                              self.embedding_model)
+        ids = np.array([turn_id for turn_id, _, _ in turns], dtype=np.int64)
+
+        with self.lock:
+            # Skip turns indexed concurrently (e.g. by a backfill) while these were being embedded
+            fresh = ~np.isin(ids, self.ids)
+            ids, vectors = ids[fresh], vectors[fresh]
+            if not len(ids):
+                return
+
+            if faiss is not None:
+                if self.index is None:
+                    self.index = self._new_index(vectors.shape[1])
+                self.index.add_with_ids(vectors, ids)
+            elif self.vectors is None:
+                self.vectors = vectors
+            else:
+                self.vectors = np.vstack([self.vectors, vectors])
+            self.ids = np.concatenate([self.ids, ids])
+
+            self.unsaved += len(ids)
+            if self.unsaved >= self.save_every:
+                self._save()
+
+    @staticmethod
+    def _new_index(dimension):
+        hnsw = faiss.IndexHNSWFlat(dimension, 32, faiss.METRIC_INNER_PRODUCT)
+        hnsw.hnsw.efSearch = 64
+        return faiss.IndexIDMap2(hnsw)
+
+    def remove_ids(self, turn_ids):
+        """
+        Drops the vectors of deleted turns. Returns the number removed.
+        """
+        return self._filter(lambda ids: ~np.isin(ids, np.array(list(turn_ids), dtype=np.int64)))
+
+    def retain(self, turn_ids):
+        """
+        Drops the vectors of every turn not in `turn_ids`, e.g. turns pruned before a restart.
+        """
+        return self._filter(lambda ids: np.isin(ids, np.array(list(turn_ids), dtype=np.int64)))
+
+    def _filter(self, select):
+        with self.lock:
+            keep = select(self.ids)
+            removed = int((~keep).sum())
+            if not removed:
+                return 0
+            if faiss is not None:
+                # HNSW cannot delete entries, so the index is rebuilt from the kept vectors
+                vectors = self.index.index.reconstruct_n(0, self.index.ntotal)[keep]
+                self.index = self._new_index(vectors.shape[1])
+                if len(vectors):
+                    self.index.add_with_ids(vectors, self.ids[keep])
+            else:
+                self.vectors = self.vectors[keep]
+            self.ids = self.ids[keep]
+            self._save()
+        self.logger.info(f"Removed {removed} deleted turns from the memory index.")
+        return removed
+
+    def search(self, text, k=5, exclude=()):
+        """
+        Returns up to k (turn_id, score) pairs most similar to the text, best first.
+        """
+        if not len(self.ids) or k <= 0:
+            return []
+        query = embed_texts([text], self.embedding_model)
+        exclude = set(exclude)
+        fetch = min(k + len(exclude), len(self.ids))
+
+        with self.lock:
+            if faiss is not None:
+                scores, ids = self.index.search(query, fetch)
+                results = [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i != -1]
+            else:
+                scores = self.vectors @ query[0]
+                top = np.argpartition(-scores, fetch - 1)[:fetch]
+                top = top[np.argsort(-scores[top])]
+                results = [(int(self.ids[i]), float(scores[i])) for i in top]
+
+        return [(turn_id, score) for turn_id, score in results if turn_id not in exclude][:k]
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("nexus_os")
+
+
+class Stage:
+    """
+    A named step of a StageGraph.
+    `func` is a coroutine function receiving the results of its dependencies as keyword arguments.
+    When `timeout` (seconds) expires or the stage fails, `default` is used as its result.
+    """
+
+    def __init__(self, name, func, depends=(), timeout=None, default=None):
+        self.name = name
+        self.func = func
+        self.depends = tuple(depends)
+        self.timeout = timeout
+        self.default = default
+
+
+class StageGraph:
+    """
+    Runs a small dependency graph of async stages.
+    Every stage starts as soon as its own dependencies are done, so independent stages overlap.
+    """
+
+    def __init__(self, logger=logger):
+        self.logger = logger
+        self.stages = {}
+
+    def add(self, name, func, depends=(), timeout=None, default=None):
+        """
+        Registers a stage. Dependencies must be registered before the stages that use them.
+        """
+        missing = [dep for dep in depends if dep not in self.stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+        self.stages[name] = Stage(name, func, depends, timeout, default)
+        return self
+
+    async def _run_stage(self, stage, tasks):
+        inputs = {}
+        for dep in stage.depends:
+            inputs[dep] = await tasks[dep]
+
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(stage.func(**inputs), timeout=stage.timeout)
+        except asyncio.TimeoutError:
+            self.logger.warning(f"Stage '{stage.name}' timed out after {stage.timeout}s, using default.")
+            return stage.default
+        except Exception as e:
+            self.logger.error(f"Stage '{stage.name}' failed: {e}")
+            return stage.default
+
+        self.logger.debug(f"Stage '{stage.name}' finished in {time.perf_counter() - started:.3f}s")
+        return result
+
+    async def run(self):
+        """
+        Runs every stage and returns a dict of results keyed by stage name.
+        """
+        tasks = {}
+        for name, stage in self.stages.items():
+            tasks[name] = asyncio.ensure_future(self._run_stage(stage, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        return {name: task.result() for name, task in tasks.items()}
+
+
+class SpeculativeThought:
+    """
+    Holds an internal thought computed in the background after a turn, ready for the next one.
+    The thought is only reused while the conversation context it was computed from is unchanged.
+    """
+
+    def __init__(self, fingerprint, task):
+        self.fingerprint = fingerprint
+        self.task = task
+        self.created = time.monotonic()
+
+    def is_valid(self, fingerprint, max_age):
+        if fingerprint != self.fingerprint:
+            return False
+        if self.task.cancelled():
+            return False
+        return max_age is None or time.monotonic() - self.created <= max_age
+
+    async def result(self, timeout=None):
+        """
+        Waits for the thought up to `timeout` seconds without cancelling it on timeout.
+        """
+        return await asyncio.wait_for(asyncio.shield(self.task), timeout=timeout)
@@ -1,29 +1,37 @@
 import logging
+import re
+from nexus_os.modules.nlp.commands import CommandRegistry
 
 logger = logging.getLogger("CommandParser")
 
+# Default registry of direct commands; modules attach handlers with registry.set_handler()
+registry = CommandRegistry()
+
+
+def extract_url(command_text):
+    return {"url": command_text.split("and go to")[-1].strip() if "and go to" in command_text else "https://aswss.com"}
+
+
+def extract_path(command_text):
+    path = command_text.split("folder")[-1].strip() if "folder" in command_text else command_text.split("directory")[-1].strip()
+    return {"path": path}
+
+
+def extract_program(command_text):
+    return {"program": command_text.split("open program")[-1].strip()}
+
+
+def extract_task_id(command_text):
+    match = re.search(r"\d+", command_text.split("cancel task")[-1])
+    return {"task_id": int(match.group(0)) if match else None}
+
+
+registry.register("open_browser", ["open browser"], extract_url)
+registry.register("explore_folder", ["explore folder", "open directory", "open folder"], extract_path)
+registry.register("open_program", ["open program"], extract_program)
+registry.register("list_tasks", ["list tasks", "show tasks"])
+registry.register("cancel_task", ["cancel task"], extract_task_id)
+
+
 async def parse_command(command_text):
-    command_text = command_text.lower().strip()
-
-    try:
-        if "open browser" in command_text:
-            url = command_text.split("and go to")[-1].strip() if "and go to" in command_text else "https://aswss.com"
-            logger.info(f"Browser command detected with URL: {url}")
-            return {"action": "open_browser", "parameters": {"url": url}}
-
-        if any(cmd in command_text for cmd in ["explore folder", "open directory", "open folder"]):
-            path = command_text.split("folder")[-1].strip() if "folder" in command_text else command_text.split("directory")[-1].strip()
-            logger.info(f"Folder command detected with path: {path}")
-            return {"action": "explore_folder", "parameters": {"path": path}}
-
-        if "open program" in command_text:
-            program = command_text.split("open program")[-1].strip()
-            logger.info(f"Program command detected with program: {program}")
-            return {"action": "open_program", "parameters": {"program": program}}
-
-        logger.warning("Unknown command detected.")
-        return {"action": "unknown"}
-
-    except Exception as e:
-        logger.error(f"Error parsing command: {e}")
-        return {"action": "unknown", "error": "Parsing error occurred."}
+    return registry.parse(command_text)
@@ -0,0 +1,150 @@
+import asyncio
+import re
+
+from nexus_os.modules.nlp.generation import get_generation_profile
+
+# Words, numbers and single punctuation marks, roughly one token each
+TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """
+    Fast token count estimate: the larger of the word/punctuation count and chars / 4,
+    which errs on the high side for both prose and code-like text.
+    """
+    if not text:
+        return 0
+    return max(len(TOKEN_PATTERN.findall(text)), (len(text) + 3) // 4)
+
+
+def format_turn(entry):
+    return f"User: {entry['user_input']}\nAI: {entry['ai_response']}"
+
+
+class PromptBuilder:
+    """
+    Assembles the chat prompt under a hard token budget per model.
+    The new message, internal thought and rolling summary always fit first;
+    context turns are then added in order until the budget is used up.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        prompt_config = config.get("prompt", {})
+        budgets = prompt_config.get("budgets") or {}
+        model_name = config["ai_model"]["name"]
+        self.budget = budgets.get(model_name, prompt_config.get("default_budget", 2048))
+        # The response is generated inside the same context window
+        self.budget -= get_generation_profile(config, "chat")["max_tokens"]
+
+    def build(self, prompt, context, internal_thought="", summary=""):
+        head = f"Summary of earlier conversation: {summary}\n" if summary else ""
+        tail = f"Internal Thought: {internal_thought}\nUser: {prompt}\nAI:"
+        remaining = self.budget - estimate_tokens(head) - estimate_tokens(tail)
+
+        turns = []
+        for entry in context:
+            text = format_turn(entry)
+            cost = estimate_tokens(text) + 1
+            if cost > remaining:
+                break
+            turns.append(text)
+            remaining -= cost
+
+        if len(turns) < len(context):
+            self.logger.info(f"Prompt budget reached, kept {len(turns)} of {len(context)} context turns.")
+        return head + "\n".join(turns) + "\n" + tail
+
+
+class RollingSummary:
+    """
+    Maintains a summary of the turns older than the recent window, stored alongside the
+    context table. It is only regenerated, incrementally from the previous summary, once
+    `refresh_after` turns have fallen out of the window since the last update. New turns are
+    folded in chunks of at most `input_budget` tokens, and at most `max_chunks` chunks per
+    refresh, so a long backlog (e.g. imported history) is caught up over several refreshes.
+    """
+
+    def __init__(self, config, store, clients, logger, recent_turns):
+        summary_config = config.get("prompt", {})
+        self.enabled = summary_config.get("summary_enabled", True)
+        self.refresh_after = summary_config.get("summary_refresh_after", 8)
+        self.input_budget = summary_config.get("summary_input_budget", 1024)
+        self.max_chunks = summary_config.get("summary_max_chunks", 4)
+        self.config = config
+        self.store = store
+        self.clients = clients
+        self.logger = logger
+        self.recent_turns = recent_turns
+        self.refresh_task = None
+
+    async def get(self):
+        if not self.enabled:
+            return ""
+        summary, _ = await self.store.get_summary()
+        return summary
+
+    def maybe_refresh(self):
+        """
+        Starts a background refresh if the summary is out of date and none is running.
+        """
+        if not self.enabled or (self.refresh_task and not self.refresh_task.done()):
+            return
+        self.refresh_task = asyncio.ensure_future(self.refresh())
+
+    async def refresh(self):
+        try:
+            summary, upto_id = await self.store.get_summary()
+            window_start = self.store.latest_id() - self.recent_turns
+            if window_start - upto_id < self.refresh_after:
+                return
+
+            turns = await self.store.turns_between(upto_id, window_start)
+            if not turns:
+                return
+
+            profile = get_generation_profile(self.config, "summary")
+            llm = self.clients.get_llm(
+                self.config["ai_model"]["name"],
+                num_predict=profile["max_tokens"],
+                stop=profile["stop"] or None,
+                temperature=0.3,
+            )
+            chunks = self.chunk_turns(turns)[:self.max_chunks]
+            self.logger.info(
+                f"Updating rolling summary with {sum(len(chunk) for chunk in chunks)} of {len(turns)} older turns..."
+            )
+            for chunk in chunks:
+                request = (
+                    "Update the summary of a conversation between a user and an AI with the new turns. "
+                    "Keep names, facts, preferences and open tasks. Reply with the summary only.\n"
+                    f"Current summary: {summary or '(none)'}\n"
+                    "New turns:\n" + "\n".join(text for _, text in chunk) + "\nUpdated summary:"
+                )
+                summary = (await self.clients.ainvoke("ollama", llm, request)).strip()
+                # Saved per chunk, so an interrupted catch-up resumes where it stopped
+                await self.store.set_summary(summary, chunk[-1][0])
+            self.logger.info("Rolling summary updated.")
+        except Exception as e:
+            self.logger.error(f"Error updating rolling summary: {e}")
+
+    def chunk_turns(self, turns):
+        """
+        Splits turns into chunks of (id, text) within the input budget; a turn larger than the
+        budget is truncated to it.
+        """
+        chunks, chunk, used = [], [], 0
+        for turn in turns:
+            text = format_turn(turn)
+            cost = estimate_tokens(text) + 1
+            while cost > self.input_budget:
+                text = text[:len(text) * self.input_budget // cost]
+                cost = estimate_tokens(text) + 1
+            if chunk and used + cost > self.input_budget:
+                chunks.append(chunk)
+                chunk, used = [], 0
+            chunk.append((turn["id"], text))
+            used += cost
+        if chunk:
+            chunks.append(chunk)
+        return chunks
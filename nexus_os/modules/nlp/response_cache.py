@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from nexus_os.modules.nlp.embeddings import DEFAULT_EMBEDDING_MODEL, embed_texts
+
+
+def normalize_prompt(prompt):
+    return re.sub(r"\s+", " ", prompt.strip().lower())
+
+
+def context_fingerprint(context):
+    """
+    Hashes the conversation turns a cached answer depends on.
+    """
+    digest = hashlib.sha1()
+    for entry in context:
+        digest.update(normalize_prompt(entry["user_input"]).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(entry["ai_response"].strip().encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Caches chat responses by prompt and context fingerprint.
+    Exact (normalized) prompt matches are served from a dict without touching the embedding
+    model; otherwise the prompt is embedded and compared against cached prompts with the same
+    context fingerprint. Entries expire after `ttl` seconds (never if it is 0) and the least
+    recently used entry is evicted once `max_entries` is reached.
+    """
+
+    def __init__(self, config, logger):
+        cache_config = config.get("response_cache", {})
+        self.logger = logger
+        self.enabled = cache_config.get("enabled", False)
+        self.max_entries = cache_config.get("max_entries", 1000)
+        ttl = cache_config.get("ttl", 3600)
+        # 0, a negative value or null disables expiry
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.similarity_threshold = cache_config.get("similarity_threshold", 0.92)
+        self.context_turns = cache_config.get("context_turns", 0)
+        self.embedding_model = cache_config.get("embedding_model", DEFAULT_EMBEDDING_MODEL)
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _key(self, prompt, fingerprint):
+        return f"{fingerprint}:{normalize_prompt(prompt)}"
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry["created"] > self.ttl
+
+    def _purge_expired(self, now):
+        for key in [key for key, entry in self.entries.items() if self._expired(entry, now)]:
+            del self.entries[key]
+
+    def get_exact(self, prompt, fingerprint):
+        """
+        Returns the cached response for the exact (normalized) prompt, or None.
+        """
+        key = self._key(prompt, fingerprint)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.monotonic()):
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["response"]
+
+    def has_candidates(self, fingerprint):
+        with self.lock:
+            return any(entry["fingerprint"] == fingerprint for entry in self.entries.values())
+
+    def get_similar(self, prompt, fingerprint):
+        """
+        Returns the response of the most similar cached prompt above the threshold, or None.
+        Loads the embedding model and embeds any candidates that have not been embedded yet.
+        """
+        with self.lock:
+            self._purge_expired(time.monotonic())
+            candidates = [(key, entry) for key, entry in self.entries.items() if entry["fingerprint"] == fingerprint]
+        if not candidates:
+            return None
+
+        pending = [entry for _, entry in candidates if entry["embedding"] is None]
+        texts = [normalize_prompt(prompt)] + [normalize_prompt(entry["prompt"]) for entry in pending]
+        vectors = embed_texts(texts, self.embedding_model)
+        for entry, vector in zip(pending, vectors[1:]):
+            entry["embedding"] = vector
+
+        matrix = np.stack([entry["embedding"] for _, entry in candidates])
+        scores = matrix @ vectors[0]
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+
+        key, entry = candidates[best]
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.semantic_hits += 1
+        self.logger.debug(f"Semantic cache hit ({scores[best]:.3f}) for prompt: {prompt}")
+        return entry["response"]
+
+    async def lookup(self, prompt, fingerprint, executor=None):
+        """
+        Looks up a cached response; the embedding search runs on `executor`.
+        """
+        if not self.enabled:
+            return None
+
+        response = self.get_exact(prompt, fingerprint)
+        if response is None and self.has_candidates(fingerprint):
+            try:
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(executor, self.get_similar, prompt, fingerprint)
+            except Exception as e:
+                self.logger.error(f"Semantic cache lookup failed: {e}")
+
+        if response is None:
+            with self.lock:
+                self.misses += 1
+        return response
+
+    def put(self, prompt, fingerprint, response):
+        """
+        Stores a response. Its embedding is computed lazily by the first semantic lookup.
+        """
+        if not self.enabled:
+            return
+        key = self._key(prompt, fingerprint)
+        with self.lock:
+            self.entries[key] = {
+                "prompt": prompt,
+                "fingerprint": fingerprint,
+                "response": response,
+                "created": time.monotonic(),
+                "embedding": None,
+            }
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import io
+import logging
+import socket
+
+from aiohttp import web
+from PIL import Image
+
+from nexus_os.core.clients import ModelClients
+from nexus_os.modules.nlp.image_jobs import ImageJobQueue
+
+
+def solid_png(color, size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("utf-8")
+
+
+class StandInServer:
+    """
+    A local stand-in for the Stable Diffusion web UI API: txt2img (with batch_size), progress
+    with a live preview, and interrupt. Each image of a request is a solid colour derived from
+    its seed, and every txt2img payload received is recorded in `requests`.
+    """
+
+    def __init__(self, steps=10, step_time=0.03):
+        self.steps = steps
+        self.step_time = step_time
+        self.requests = []
+        self.interrupts = 0
+        self.progress = 0.0
+        self.interrupted = None
+        self.runner = None
+        self.url = None
+
+    async def txt2img(self, request):
+        payload = await request.json()
+        self.requests.append(payload)
+        self.interrupted = asyncio.Event()
+        for step in range(self.steps):
+            self.progress = step / self.steps
+            if self.interrupted.is_set():
+                break
+            await asyncio.sleep(self.step_time)
+        self.progress = 0.0
+        seed = payload.get("seed", -1)
+        seed = len(self.requests) * 1000 if seed < 0 else seed
+        # Batch images get consecutive seeds, as with the real server
+        images = [solid_png(((seed + index) % 256, 0, 0)) for index in range(payload.get("batch_size", 1))]
+        return web.json_response({"images": images})
+
+    async def get_progress(self, request):
+        preview = solid_png((0, int(self.progress * 255), 0)) if self.progress else None
+        return web.json_response({"progress": self.progress, "current_image": preview})
+
+    async def interrupt(self, request):
+        self.interrupts += 1
+        if self.interrupted is not None:
+            self.interrupted.set()
+        return web.json_response({})
+
+    async def start(self, host="127.0.0.1"):
+        app = web.Application()
+        app.router.add_post("/sdapi/v1/txt2img", self.txt2img)
+        app.router.add_get("/sdapi/v1/progress", self.get_progress)
+        app.router.add_post("/sdapi/v1/interrupt", self.interrupt)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        # A free port picked by the OS
+        sock = socket.socket()
+        sock.bind((host, 0))
+        await web.SockSite(self.runner, sock).start()
+        self.url = f"http://{host}:{sock.getsockname()[1]}"
+        return self.url
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
+
+
+async def check_image_jobs():
+    """
+    Runs an ImageJobQueue against the stand-in server and checks batching, shared fixed-seed
+    jobs, preview polling and interrupts. Raises AssertionError on a failed check and returns
+    {check: details} otherwise.
+    """
+    server = StandInServer()
+    url = await server.start()
+    config = {
+        "ai_model": {"host": url},
+        "vision_model": {"host": url},
+        "stable_diffusion": {"host": url},
+        "image_jobs": {"progress_interval": 0.05},
+    }
+    clients = ModelClients(config)
+    queue = ImageJobQueue(config, logging.getLogger("ImageJobQueue"), clients)
+    results = {}
+    try:
+        # Random-seed jobs with equal parameters share one request; other prompts get their own
+        previews = []
+        images = await asyncio.gather(
+            *[queue.generate("cat", lambda fraction, preview: previews.append(preview)) for _ in range(3)],
+            queue.generate("dog"),
+        )
+        batches = [(payload["prompt"], payload.get("batch_size")) for payload in server.requests]
+        if batches != [("cat", 3), ("dog", 1)]:
+            raise AssertionError(f"Unexpected batching: {batches}")
+        if len(set(images[:3])) != 3:
+            raise AssertionError("Batched jobs did not get distinct images")
+        results["batching"] = batches
+
+        if not any(preview is not None for preview in previews):
+            raise AssertionError("No live preview was reported")
+        results["previews"] = sum(preview is not None for preview in previews)
+
+        # Identical fixed-seed jobs share one job and its image
+        server.requests.clear()
+        fixed = await asyncio.gather(*[queue.generate("cat", seed=7) for _ in range(2)])
+        seeds = [(payload["seed"], payload.get("batch_size")) for payload in server.requests]
+        if seeds != [(7, 1)] or fixed[0] != fixed[1]:
+            raise AssertionError(f"Fixed-seed jobs were not shared: {seeds}")
+        results["fixed seed"] = seeds
+
+        # Cancelling the only job of a running request interrupts it
+        task = asyncio.ensure_future(queue.generate("bird"))
+        await asyncio.sleep(server.steps * server.step_time / 2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        if server.interrupts != 1:
+            raise AssertionError(f"Expected one interrupt, got {server.interrupts}")
+        results["interrupts"] = server.interrupts
+    finally:
+        await clients.aclose()
+        await server.stop()
+    return results
+
+
+if __name__ == "__main__":
+    logging.disable(logging.CRITICAL)
+    for check, details in asyncio.run(check_image_jobs()).items():
+        print(f"{check:>12}: ok ({details})")
@@ -1,6 +1,9 @@
-import base64
 import requests
 import json
+from nexus_os.core.clients import get_clients
+from nexus_os.modules.nlp.generation import get_generation_profile
+from nexus_os.modules.vision.change_detection import VisionCache
+from nexus_os.modules.vision.encoding import encode_image, get_encoding_options, load_image
 
 class VisionModule:
     def __init__(self, config, logger):
@@ -10,31 +13,62 @@ class VisionModule:
         self.config = config
         self.logger = logger
         self.model_name = config["vision_model"]["name"]
-        self.model_host = config["vision_model"]["host"]
+        self.encoding = get_encoding_options(config)
+        self.cache = VisionCache(config, logger)
 
-    def analyze_image(self, image_path):
+    def analyze_image(self, image):
         """
-        Sends the image to the local Ollama API for analysis using the Bakllava model.
+        Sends the image (a PIL image, path or bytes) to the local Ollama API for analysis
+        using the Bakllava model. Button coordinates are returned in the original image's space.
+        Unchanged screens reuse the cached analysis; partly changed ones are re-analyzed per region.
         """
         try:
-            # Read and encode the image in Base64 format
-            with open(image_path, "rb") as image_file:
-                image_base64 = base64.b64encode(image_file.read()).decode("utf-8")
+            image = load_image(image)
+            plan = self.cache.plan(image)
+        except Exception as e:
+            self.logger.error(f"Exception preparing image for vision analysis: {e}")
+            return []
+
+        if plan.cached:
+            return plan.buttons
+        if plan.regions is None:
+            buttons = self.request_buttons(image)
+            return [] if buttons is None else self.cache.complete(plan, buttons)
+
+        found = [self.request_buttons(image, box) for box in plan.regions]
+        if any(buttons is None for buttons in found):
+            return []
+        return self.cache.complete(plan, None, found)
+
+    def request_buttons(self, image, box=None):
+        """
+        Analyzes the image, or its `box` region; returns None if the request fails or the
+        response cannot be parsed, so that only successful analyses are cached.
+        """
+        try:
+            # Downscale and encode the image in memory
+            options = self.encoding
+            if box is not None:
+                encoded = encode_image(image.crop(box), options["max_size"], options["format"], options["quality"], box[:2])
+            else:
+                encoded = encode_image(image, options["max_size"], options["format"], options["quality"])
 
             # Formulate the payload
             prompt = "Analyze this image and provide button locations for interaction."
+            profile = get_generation_profile(self.config, "vision")
             payload = {
                 "model": self.model_name,
                 "prompt": prompt,
-                "images": [image_base64],
-                "max_tokens": 500,
-                "temperature": 0.7,
+                "images": [encoded.data],
+                "stream": False,
+                "options": {"num_predict": profile["max_tokens"], "temperature": 0.7},
             }
+            if profile["stop"]:
+                payload["options"]["stop"] = profile["stop"]
 
             # Send the request to the Ollama API
-            api_url = f"{self.model_host}/api/generate"
-            self.logger.info(f"Sending image analysis request to {api_url}...")
-            response = requests.post(api_url, json=payload)
+            self.logger.info("Sending image analysis request to the vision model...")
+            response = get_clients(self.config).post("vision", "/api/generate", json=payload)
 
             # Check if the response is successful
             response.raise_for_status()
@@ -46,18 +80,18 @@ class VisionModule:
 
                 # Validate response format
                 if isinstance(response_data, dict) and "buttons" in response_data:
-                    return response_data["buttons"]
+                    return encoded.map_buttons(response_data["buttons"])
                 else:
                     self.logger.error("Response does not contain 'buttons' field or is not in the expected format.")
-                    return []
+                    return None
 
             except json.JSONDecodeError as e:
                 self.logger.error(f"JSONDecodeError during vision analysis: {e}")
                 self.logger.error(f"Raw response: {response.text}")
-                return []
+                return None
 
         except requests.RequestException as e:
             self.logger.error(f"RequestException during vision analysis: {e}")
         except Exception as e:
             self.logger.error(f"Exception during vision analysis: {e}")
-        return []
+        return None
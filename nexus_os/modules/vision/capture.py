@@ -1,6 +1,6 @@
-import pyautogui
+from nexus_os.drivers.screen import get_screen_capture
 
-def capture_screen(filename="screenshot.png"):
-    screenshot = pyautogui.screenshot()
+def capture_screen(filename="screenshot.png", region=None):
+    screenshot = get_screen_capture().grab_image(region)
     screenshot.save(filename)
     print(f"Screenshot saved as {filename}")
@@ -0,0 +1,220 @@
+import threading
+from collections import deque
+
+import numpy as np
+from PIL import Image
+
+from nexus_os.modules.vision.encoding import load_image
+
+
+def thumbnail(image, width):
+    """
+    Returns a small grayscale copy of the image as an int16 array, used for hashing and diffing.
+    """
+    image = load_image(image)
+    height = max(1, round(image.height * width / image.width))
+    small = image.resize((width, height), Image.BILINEAR, reducing_gap=2.0).convert("L")
+    return np.asarray(small, dtype=np.int16)
+
+
+def difference_hash(gray, hash_size=16):
+    """
+    Perceptual difference hash (dHash) of a grayscale array, as an int of hash_size**2 bits.
+    """
+    small = np.asarray(Image.fromarray(gray.astype(np.uint8)).resize((hash_size + 1, hash_size), Image.BILINEAR))
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+def changed_cells(previous, current, cell_size=8, pixel_threshold=16):
+    """
+    Returns a boolean grid marking the cells (cell_size thumbnail pixels square)
+    that contain at least one pixel changed by more than pixel_threshold.
+    """
+    changed = np.abs(current - previous) > pixel_threshold
+    rows = -(-changed.shape[0] // cell_size)
+    cols = -(-changed.shape[1] // cell_size)
+    padded = np.zeros((rows * cell_size, cols * cell_size), dtype=bool)
+    padded[:changed.shape[0], :changed.shape[1]] = changed
+    return padded.reshape(rows, cell_size, cols, cell_size).any(axis=(1, 3))
+
+
+def cell_regions(cells):
+    """
+    Groups adjacent changed cells and returns their bounding boxes as
+    (first_row, first_col, last_row, last_col), inclusive.
+    """
+    seen = np.zeros_like(cells)
+    regions = []
+    for row, col in zip(*np.nonzero(cells)):
+        if seen[row, col]:
+            continue
+        seen[row, col] = True
+        queue = deque([(row, col)])
+        top, left, bottom, right = row, col, row, col
+        while queue:
+            r, c = queue.popleft()
+            top, left, bottom, right = min(top, r), min(left, c), max(bottom, r), max(right, c)
+            for nr in range(r - 1, r + 2):
+                for nc in range(c - 1, c + 2):
+                    if 0 <= nr < cells.shape[0] and 0 <= nc < cells.shape[1] and cells[nr, nc] and not seen[nr, nc]:
+                        seen[nr, nc] = True
+                        queue.append((nr, nc))
+        regions.append((top, left, bottom, right))
+    return regions
+
+
+class ScreenPlan:
+    """
+    What to do with a screenshot: reuse `buttons`, analyze only `regions`
+    (boxes in image coordinates) and merge, or analyze the whole image.
+    """
+
+    def __init__(self, gray, key, size, buttons=None, regions=None):
+        self.gray = gray
+        self.key = key
+        self.size = size
+        self.buttons = buttons
+        self.regions = regions
+
+    @property
+    def cached(self):
+        return self.buttons is not None
+
+
+class VisionCache:
+    """
+    Caches vision analyses per screen. Each screenshot is reduced to a grayscale thumbnail
+    and a perceptual hash: a screen matching a cached one (close hash and no changed cells)
+    reuses its result, a screen that changed only in a few places is re-analyzed in those
+    regions and merged with the previous result, and anything else is analyzed in full.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        cache_config = config.get("vision_cache", {})
+        self.enabled = cache_config.get("enabled", True)
+        self.max_entries = cache_config.get("max_entries", 32)
+        self.hash_size = cache_config.get("hash_size", 16)
+        self.max_distance = cache_config.get("max_distance", 10)
+        self.diff_width = cache_config.get("diff_width", 320)
+        self.cell_size = cache_config.get("cell_size", 8)
+        self.pixel_threshold = cache_config.get("pixel_threshold", 16)
+        self.max_changed_fraction = cache_config.get("max_changed_fraction", 0.4)
+        self.max_regions = cache_config.get("max_regions", 4)
+        self.region_padding = cache_config.get("region_padding", 32)
+        self.min_region_size = cache_config.get("min_region_size", 256)
+        # Analyzed screens, least recently used first; different screens can share a hash
+        self.entries = []
+        self.previous = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.partial = 0
+        self.misses = 0
+
+    def is_unchanged(self, entry, gray):
+        if entry["gray"].shape != gray.shape:
+            return False
+        return not changed_cells(entry["gray"], gray, self.cell_size, self.pixel_threshold).any()
+
+    def plan(self, image):
+        """
+        Decides how to analyze a screenshot.
+        """
+        image = load_image(image)
+        gray = thumbnail(image, self.diff_width)
+        key = difference_hash(gray, self.hash_size)
+        plan = ScreenPlan(gray, key, image.size)
+        if not self.enabled:
+            return plan
+
+        with self.lock:
+            for entry in reversed(self.entries):
+                if hamming(entry["key"], key) <= self.max_distance and self.is_unchanged(entry, gray):
+                    self.entries.remove(entry)
+                    self.entries.append(entry)
+                    self.hits += 1
+                    self.logger.info("Screen unchanged, reusing the cached vision analysis.")
+                    plan.buttons = [dict(button) for button in entry["buttons"]]
+                    return plan
+            previous = self.previous
+
+        if previous is not None and previous["gray"].shape == gray.shape and previous["size"] == image.size:
+            plan.regions = self.changed_regions(previous["gray"], gray, image.size)
+            if plan.regions is not None:
+                self.partial += 1
+                self.logger.info(f"Screen changed in {len(plan.regions)} regions, re-analyzing only those.")
+                return plan
+        self.misses += 1
+        return plan
+
+    def changed_regions(self, previous, current, size):
+        """
+        Returns the changed regions in image coordinates, or None when the change
+        is too large or scattered to be worth a partial analysis.
+        """
+        cells = changed_cells(previous, current, self.cell_size, self.pixel_threshold)
+        if cells.mean() > self.max_changed_fraction:
+            return None
+        regions = cell_regions(cells)
+        if not regions or len(regions) > self.max_regions:
+            return None
+
+        scale = size[0] / current.shape[1]
+        boxes = []
+        for top, left, bottom, right in regions:
+            box = [
+                left * self.cell_size * scale - self.region_padding,
+                top * self.cell_size * scale - self.region_padding,
+                (right + 1) * self.cell_size * scale + self.region_padding,
+                (bottom + 1) * self.cell_size * scale + self.region_padding,
+            ]
+            # Vision models do poorly on tiny crops, so grow small regions around their center
+            for start, end, limit in ((0, 2, size[0]), (1, 3, size[1])):
+                length = min(max(box[end] - box[start], self.min_region_size), limit)
+                center = (box[start] + box[end]) / 2
+                box[start] = min(max(0, center - length / 2), limit - length)
+                box[end] = box[start] + length
+            boxes.append(tuple(int(round(value)) for value in box))
+        return boxes
+
+    @staticmethod
+    def inside(button, box):
+        try:
+            x, y = float(button["x"]), float(button["y"])
+        except (KeyError, TypeError, ValueError):
+            return False
+        return box[0] <= x < box[2] and box[1] <= y < box[3]
+
+    def complete(self, plan, buttons, region_buttons=None):
+        """
+        Records the analysis of a planned screenshot and returns its buttons.
+        For a partial plan, `region_buttons` holds the buttons found in each region; they
+        replace the previous buttons that lie inside the changed regions.
+        """
+        if plan.cached:
+            return plan.buttons
+        if plan.regions is not None:
+            with self.lock:
+                previous = self.previous["buttons"] if self.previous else []
+            kept = [button for button in previous if not any(self.inside(button, box) for box in plan.regions)]
+            buttons = kept + [button for found in region_buttons or [] for button in found]
+        self.store(plan, buttons)
+        return buttons
+
+    def store(self, plan, buttons):
+        if not self.enabled:
+            return
+        entry = {"key": plan.key, "gray": plan.gray, "size": plan.size, "buttons": [dict(button) for button in buttons]}
+        with self.lock:
+            self.entries.append(entry)
+            if len(self.entries) > self.max_entries:
+                del self.entries[0]
+            self.previous = entry
+
+    def stats(self):
+        return {"hits": self.hits, "partial": self.partial, "misses": self.misses, "entries": len(self.entries)}
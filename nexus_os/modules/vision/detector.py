@@ -0,0 +1,186 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw
+
+from nexus_os.modules.vision.encoding import load_image
+
+LABEL_PROMPT = (
+    "Each numbered tile in this image is a cropped candidate UI element from a screenshot. "
+    "For every tile, say whether it is a clickable control (button, link, tab, field, icon) and read its label. "
+    "Reply only with JSON: [{\"id\": 1, \"label\": \"Label text or icon name\", \"button\": true}]."
+)
+
+TILE_WIDTH = 240
+TILE_HEIGHT = 64
+TILE_COLUMNS = 3
+TILE_PADDING = 20
+
+
+def box_iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[0] + a[2], b[0] + b[2]), min(a[1] + a[3], b[1] + b[3])
+    overlap = max(0, x2 - x1) * max(0, y2 - y1)
+    union = a[2] * a[3] + b[2] * b[3] - overlap
+    return overlap / union if union else 0.0
+
+
+def box_contains(outer, inner, margin=2):
+    return (
+        outer[0] - margin <= inner[0] and outer[1] - margin <= inner[1]
+        and inner[0] + inner[2] <= outer[0] + outer[2] + margin
+        and inner[1] + inner[3] <= outer[1] + outer[3] + margin
+    )
+
+
+class ElementDetector:
+    """
+    Classical UI-element detector run before the vision model.
+    Rectangular controls are found from edge contours, text is clustered into label
+    boxes with a horizontal dilation, and both are merged into scored candidate boxes
+    in the same {"label", "x", "y", "width", "height"} format as the model's buttons,
+    where (x, y) is the element's center.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        detector_config = config.get("detector", {})
+        self.enabled = detector_config.get("enabled", True)
+        self.max_width = detector_config.get("max_width", 1600)
+        self.min_width = detector_config.get("min_width", 16)
+        self.min_height = detector_config.get("min_height", 10)
+        self.max_element_width = detector_config.get("max_element_width", 600)
+        self.max_height = detector_config.get("max_height", 120)
+        self.max_candidates = detector_config.get("max_candidates", 24)
+
+    def detect(self, image, box=None):
+        """
+        Returns candidate elements in the image, or in its `box` region, sorted by confidence.
+        """
+        image = load_image(image)
+        offset = (0, 0)
+        if box is not None:
+            image = image.crop(box)
+            offset = box[:2]
+        gray = np.asarray(image.convert("L"))
+        scale = min(1.0, self.max_width / gray.shape[1])
+        if scale < 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        edges = cv2.Canny(gray, 50, 150)
+        height, width = edges.shape
+        controls = self.find_controls(edges, scale)
+        # Text clusters that are just a control's own border are not labels
+        labels = [
+            label for label in self.find_text(edges, scale)
+            if all(box_iou(label, rect) < 0.5 for rect, _ in controls)
+        ]
+
+        candidates = []
+        for rect, rectangularity in controls:
+            # Panels and toolbars contain several controls; they are not controls themselves
+            if sum(box_contains(rect, other) for other, _ in controls if other is not rect) >= 3:
+                continue
+            has_text = any(box_contains(rect, label) for label in labels)
+            aspect = rect[2] / rect[3]
+            confidence = 0.6 * rectangularity + (0.3 if has_text else 0.0) + (0.1 if 1.5 <= aspect <= 8 else 0.0)
+            candidates.append((rect, confidence))
+        for label in labels:
+            if not any(box_contains(rect, label) for rect, _ in controls):
+                candidates.append((label, 0.35))
+
+        # Outer borders and focus rings of one control overlap: keep the best box of each cluster
+        kept = []
+        for rect, confidence in sorted(candidates, key=lambda item: -item[1]):
+            if all(box_iou(rect, other) < 0.5 for other, _ in kept):
+                kept.append((rect, confidence))
+
+        elements = []
+        for (x, y, w, h), confidence in kept[:self.max_candidates]:
+            x, y, w, h = (value / scale for value in (x, y, w, h))
+            elements.append({
+                "label": "",
+                "x": round(x + w / 2) + offset[0],
+                "y": round(y + h / 2) + offset[1],
+                "width": round(w),
+                "height": round(h),
+                "confidence": round(min(confidence, 1.0), 2),
+            })
+        self.logger.info(f"Detector found {len(elements)} candidate elements ({width}x{height} edge map).")
+        return elements
+
+    def size_ok(self, w, h, scale):
+        return (
+            self.min_width * scale <= w <= self.max_element_width * scale
+            and self.min_height * scale <= h <= self.max_height * scale
+        )
+
+    def find_controls(self, edges, scale):
+        """
+        Returns (rect, rectangularity) for contours that look like rectangular controls.
+        """
+        closed = cv2.morphologyEx(edges, cv2.MORPH_CLOSE, np.ones((3, 3), np.uint8))
+        contours, _ = cv2.findContours(closed, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        controls = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if not self.size_ok(w, h, scale):
+                continue
+            approx = cv2.approxPolyDP(contour, 0.02 * cv2.arcLength(contour, True), True)
+            rectangularity = cv2.contourArea(contour) / float(w * h)
+            if 4 <= len(approx) <= 8 and rectangularity > 0.75:
+                controls.append(((x, y, w, h), min(rectangularity, 1.0)))
+        return controls
+
+    def find_text(self, edges, scale):
+        """
+        Returns boxes of text-like clusters: glyph edges merged by a horizontal dilation.
+        """
+        kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(9, edges.shape[1] // 150), 3))
+        merged = cv2.dilate(edges, kernel)
+        contours, _ = cv2.findContours(merged, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+        labels = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if self.size_ok(w, h, scale) and w >= 1.2 * h and h <= 60 * scale:
+                labels.append((x, y, w, h))
+        return labels
+
+    def label_sheet(self, image, candidates):
+        """
+        Tiles the candidate crops into one numbered sheet for the vision model to label.
+        """
+        image = load_image(image)
+        rows = -(-len(candidates) // TILE_COLUMNS)
+        cell_width, cell_height = TILE_WIDTH + 16, TILE_HEIGHT + TILE_PADDING + 8
+        sheet = Image.new("RGB", (cell_width * TILE_COLUMNS, cell_height * rows), "white")
+        draw = ImageDraw.Draw(sheet)
+        for index, candidate in enumerate(candidates):
+            left = candidate["x"] - candidate["width"] / 2
+            top = candidate["y"] - candidate["height"] / 2
+            crop = image.crop((round(left), round(top), round(left + candidate["width"]), round(top + candidate["height"])))
+            crop.thumbnail((TILE_WIDTH, TILE_HEIGHT))
+            column, row = index % TILE_COLUMNS, index // TILE_COLUMNS
+            x, y = column * cell_width + 8, row * cell_height + 4
+            draw.text((x, y), f"#{index + 1}", fill="red")
+            sheet.paste(crop, (x, y + TILE_PADDING - 4))
+        return sheet
+
+    def label_candidate(self, candidates, entry):
+        """
+        Applies one label entry from the model to its candidate.
+        Returns the labeled button, or None if the entry is invalid, unlabeled or not a control.
+        """
+        if not isinstance(entry, dict):
+            return None
+        try:
+            index = int(entry.get("id")) - 1
+        except (TypeError, ValueError):
+            return None
+        if not 0 <= index < len(candidates) or not entry.get("button", True):
+            return None
+        label = str(entry.get("label") or "").strip()
+        if not label:
+            return None
+        element = dict(candidates[index])
+        element["label"] = label
+        return element
@@ -0,0 +1,218 @@
+import io
+import math
+import sqlite3
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from nexus_os.modules.vision.encoding import load_image
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS elements (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    app TEXT NOT NULL,
+    title TEXT NOT NULL,
+    name TEXT NOT NULL,
+    label TEXT NOT NULL,
+    template BLOB NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    width INTEGER NOT NULL,
+    height INTEGER NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL,
+    UNIQUE (app, title, name)
+);
+CREATE INDEX IF NOT EXISTS elements_app ON elements (app, last_seen);
+"""
+
+# Templates of buttons the model returned without a size
+DEFAULT_SIZE = (96, 32)
+
+
+def app_key(window):
+    """
+    Identifies an application by its window class, e.g. "firefox".
+    """
+    if window is None or not window.wm_class:
+        return None
+    return window.wm_class[-1].lower()
+
+
+def encode_template(gray):
+    buffer = io.BytesIO()
+    Image.fromarray(gray).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def decode_template(data):
+    return np.asarray(Image.open(io.BytesIO(data)).convert("L"))
+
+
+class ElementMemory:
+    """
+    Persistent per-application memory of UI elements found by the vision pipeline.
+    Each element keeps a grayscale crop, its label and last-known position, keyed by the
+    window class and title. Lookups find the elements again in the current frame with
+    cv2.matchTemplate, first around the last-known position and then over the whole frame.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        memory_config = config.get("element_memory", {})
+        self.enabled = memory_config.get("enabled", True)
+        self.path = memory_config.get("db", "nexus_os/data/elements.db")
+        self.match_threshold = memory_config.get("match_threshold", 0.85)
+        self.search_margin = memory_config.get("search_margin", 150)
+        self.min_found_fraction = memory_config.get("min_found_fraction", 0.5)
+        self.max_elements = memory_config.get("max_elements_per_app", 200)
+        self.lock = threading.Lock()
+        self.connection = None
+        # Decoded templates per app, loaded on first lookup
+        self.templates = {}
+
+    def connect(self):
+        if self.connection is None:
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.row_factory = sqlite3.Row
+            self.connection.executescript(SCHEMA)
+        return self.connection
+
+    def elements(self, app):
+        if app not in self.templates:
+            rows = self.connect().execute(
+                "SELECT id, title, name, label, template, x, y, width, height FROM elements WHERE app = ?", (app,)
+            ).fetchall()
+            self.templates[app] = [dict(row, template=decode_template(row["template"])) for row in rows]
+        return self.templates[app]
+
+    def match(self, frame, template, x, y):
+        """
+        Returns the center and score of the best match of a template, searching a
+        window around the last-known center (x, y) before the whole frame.
+        """
+        height, width = template.shape
+        if height > frame.shape[0] or width > frame.shape[1]:
+            return None, 0.0
+        left = max(0, x - width // 2 - self.search_margin)
+        top = max(0, y - height // 2 - self.search_margin)
+        right = min(frame.shape[1], x + width // 2 + self.search_margin)
+        bottom = min(frame.shape[0], y + height // 2 + self.search_margin)
+        score = 0.0
+        for region_left, region_top, region in (
+            (left, top, frame[top:bottom, left:right]),
+            (0, 0, frame),
+        ):
+            if region.shape[0] < height or region.shape[1] < width:
+                continue
+            scores = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+            _, score, _, (found_x, found_y) = cv2.minMaxLoc(scores)
+            if score >= self.match_threshold:
+                return (region_left + found_x + width // 2, region_top + found_y + height // 2), score
+        return None, score
+
+    def recall(self, window, image):
+        """
+        Finds the remembered elements of the window's application in the image.
+        Returns the buttons found, or None on a miss: nothing remembered, or too few
+        of the elements remembered for this window title still visible.
+        """
+        app = app_key(window)
+        if not self.enabled or app is None:
+            return None
+        with self.lock:
+            elements = self.elements(app)
+            same_title = [element for element in elements if element["title"] == window.title]
+            candidates = same_title or elements
+            if not candidates:
+                return None
+
+            frame = np.asarray(load_image(image).convert("L"))
+            found = []
+            for element in candidates:
+                center, score = self.match(frame, element["template"], element["x"], element["y"])
+                if center is not None:
+                    element["x"], element["y"] = center
+                    found.append({
+                        "id": element["id"],
+                        "label": element["label"],
+                        "x": center[0],
+                        "y": center[1],
+                        "width": element["width"],
+                        "height": element["height"],
+                    })
+
+            if len(found) < max(1, math.ceil(self.min_found_fraction * len(candidates))):
+                self.logger.info(f"Element memory miss for {app}: {len(found)} of {len(candidates)} elements found.")
+                return None
+
+            connection = self.connect()
+            connection.executemany(
+                "UPDATE elements SET x = ?, y = ?, hits = hits + 1, last_seen = ? WHERE id = ?",
+                [(button["x"], button["y"], time.time(), button.pop("id")) for button in found],
+            )
+            connection.commit()
+        self.logger.info(f"Element memory hit for {app}: {len(found)} elements found without the vision model.")
+        return found
+
+    def remember(self, window, image, buttons):
+        """
+        Stores crops of the buttons found in the image for the window's application.
+        """
+        app = app_key(window)
+        if not self.enabled or app is None or not buttons:
+            return
+        frame = np.asarray(load_image(image).convert("L"))
+        rows = []
+        for button in buttons:
+            try:
+                x, y = int(button["x"]), int(button["y"])
+                width = int(button.get("width") or DEFAULT_SIZE[0])
+                height = int(button.get("height") or DEFAULT_SIZE[1])
+            except (KeyError, TypeError, ValueError):
+                continue
+            left, top = max(0, x - width // 2), max(0, y - height // 2)
+            template = frame[top:top + height, left:left + width]
+            if template.shape[0] < 8 or template.shape[1] < 8 or template.std() < 1:
+                # Flat crops match anywhere
+                continue
+            label = str(button.get("label") or "").strip()
+            name = label.lower() or f"@{x},{y}"
+            rows.append((app, window.title, name, label, encode_template(np.ascontiguousarray(template)),
+                         x, y, template.shape[1], template.shape[0], time.time()))
+        if not rows:
+            return
+
+        with self.lock:
+            connection = self.connect()
+            connection.executemany(
+                """
+                INSERT INTO elements (app, title, name, label, template, x, y, width, height, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (app, title, name) DO UPDATE SET
+                    label = excluded.label, template = excluded.template, x = excluded.x, y = excluded.y,
+                    width = excluded.width, height = excluded.height, last_seen = excluded.last_seen
+                """,
+                rows,
+            )
+            # Keep the most recently seen elements of each application
+            connection.execute(
+                """
+                DELETE FROM elements WHERE app = ? AND id NOT IN (
+                    SELECT id FROM elements WHERE app = ? ORDER BY last_seen DESC LIMIT ?
+                )
+                """,
+                (app, app, self.max_elements),
+            )
+            connection.commit()
+            self.templates.pop(app, None)
+        self.logger.info(f"Remembered {len(rows)} elements for {app}.")
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
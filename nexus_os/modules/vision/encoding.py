@@ -0,0 +1,92 @@
+import base64
+import io
+
+from PIL import Image
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_FORMAT = "jpeg"
+DEFAULT_QUALITY = 85
+
+
+def get_encoding_options(config):
+    """
+    Returns the image encoding options from config.yaml's `vision_model.input` section.
+    """
+    options = config.get("vision_model", {}).get("input") or {}
+    return {
+        "max_size": options.get("max_size", DEFAULT_MAX_SIZE),
+        "format": options.get("format", DEFAULT_FORMAT).lower(),
+        "quality": options.get("quality", DEFAULT_QUALITY),
+    }
+
+
+class EncodedImage:
+    """
+    A base64-encoded image sent to the vision model, with the scale that maps
+    coordinates in the encoded image back to the original (screen) image.
+    """
+
+    def __init__(self, data, size, original_size, offset=(0, 0)):
+        self.data = data
+        self.size = size
+        self.original_size = original_size
+        self.offset = offset
+        self.scale_x = original_size[0] / size[0]
+        self.scale_y = original_size[1] / size[1]
+
+    def to_screen(self, x, y):
+        return round(x * self.scale_x) + self.offset[0], round(y * self.scale_y) + self.offset[1]
+
+    def map_button(self, button):
+        """
+        Returns a copy of a detected button with its position and size in screen space.
+        """
+        mapped = dict(button)
+        try:
+            if button.get("x") is not None and button.get("y") is not None:
+                mapped["x"], mapped["y"] = self.to_screen(float(button["x"]), float(button["y"]))
+            if button.get("width") is not None:
+                mapped["width"] = round(float(button["width"]) * self.scale_x)
+            if button.get("height") is not None:
+                mapped["height"] = round(float(button["height"]) * self.scale_y)
+        except (TypeError, ValueError):
+            return dict(button)
+        return mapped
+
+    def map_buttons(self, buttons):
+        return [self.map_button(button) if isinstance(button, dict) else button for button in buttons]
+
+
+def load_image(image):
+    """
+    Accepts a PIL image, a file path or encoded bytes.
+    """
+    if isinstance(image, Image.Image):
+        return image
+    if isinstance(image, (bytes, bytearray)):
+        return Image.open(io.BytesIO(image))
+    return Image.open(image)
+
+
+def encode_image(image, max_size=DEFAULT_MAX_SIZE, image_format=DEFAULT_FORMAT, quality=DEFAULT_QUALITY, offset=(0, 0)):
+    """
+    Downscales an image to fit `max_size` on its longest side (0 keeps it as is) and
+    encodes it in memory as JPEG or PNG, returning an EncodedImage.
+    """
+    image = load_image(image)
+    original_size = image.size
+    if max_size and max(original_size) > max_size:
+        ratio = max_size / max(original_size)
+        size = (max(1, round(original_size[0] * ratio)), max(1, round(original_size[1] * ratio)))
+        image = image.resize(size, Image.BILINEAR, reducing_gap=2.0)
+
+    buffer = io.BytesIO()
+    if image_format in ("jpeg", "jpg"):
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(buffer, format="JPEG", quality=quality)
+    else:
+        image.save(buffer, format="PNG", compress_level=1)
+
+    data = base64.b64encode(buffer.getvalue()).decode("ascii")
+    return EncodedImage(data, image.size, original_size, offset)
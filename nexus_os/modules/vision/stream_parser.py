@@ -0,0 +1,102 @@
+import json
+
+
+class JSONObjectStream:
+    """
+    Incremental parser that extracts JSON objects from streamed text.
+    Text is fed chunk by chunk and each outermost object is returned as soon as its
+    closing brace arrives, whatever surrounds it (a list, prose, code fences).
+    Strings and escapes are tracked, so brackets inside labels and nested
+    objects or arrays do not confuse it.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, chunk):
+        """
+        Consumes a chunk and returns the objects completed by it.
+        """
+        objects = []
+        for char in chunk:
+            if self.depth == 0:
+                # Outside an object only an opening brace matters
+                if char == "{":
+                    self.depth = 1
+                    self.buffer = [char]
+                continue
+
+            self.buffer.append(char)
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+            elif char in "}]":
+                self.depth -= 1
+                if self.depth == 0:
+                    text = "".join(self.buffer)
+                    self.buffer = []
+                    try:
+                        objects.append(json.loads(text))
+                    except json.JSONDecodeError:
+                        # Malformed object: skip it and keep scanning
+                        pass
+        return objects
+
+
+def unwrap_entries(entry):
+    """
+    Returns the entries of a parsed object: the objects listed in a wrapper such as
+    {"buttons": [...]}, or the object itself.
+    """
+    if "x" in entry or "id" in entry:
+        return [entry]
+    listed = [
+        item for value in entry.values() if isinstance(value, list)
+        for item in value if isinstance(item, dict)
+    ]
+    return listed or [entry]
+
+
+def parse_button(entry):
+    """
+    Returns a button entry with a label and numeric coordinates, or None if it lacks them.
+    """
+    label = entry.get("label")
+    if not isinstance(label, str) or not label.strip():
+        return None
+    try:
+        button = {"label": label.strip(), "x": float(entry["x"]), "y": float(entry["y"])}
+        button["width"] = float(entry.get("width") or 0)
+        button["height"] = float(entry.get("height") or 0)
+    except (KeyError, TypeError, ValueError):
+        return None
+    return button
+
+
+async def iter_ndjson_text(lines, logger=None):
+    """
+    Yields the "response" text of each line of an Ollama NDJSON stream.
+    """
+    async for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError as e:
+            if logger:
+                logger.warning(f"Error processing JSON chunk: {line}. Error: {e}")
+            continue
+        if "response" in data:
+            yield data["response"]
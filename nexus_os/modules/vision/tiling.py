@@ -0,0 +1,83 @@
+import math
+
+
+def split_axis(start, length, tile, overlap):
+    """
+    Returns evenly spaced tile starts covering [start, start + length) with at least `overlap` pixels shared.
+    """
+    if length <= tile:
+        return [start], length
+    count = math.ceil((length - overlap) / (tile - overlap))
+    step = (length - tile) / (count - 1)
+    return [start + round(index * step) for index in range(count)], tile
+
+
+def split_tiles(box, tile_size, overlap):
+    """
+    Splits an (x, y, width, height) box into overlapping tiles as (left, top, right, bottom) boxes.
+    """
+    x, y, width, height = box
+    columns, tile_width = split_axis(x, width, tile_size, overlap)
+    rows, tile_height = split_axis(y, height, tile_size, overlap)
+    return [(left, top, left + tile_width, top + tile_height) for top in rows for left in columns]
+
+
+def is_duplicate(a, b, distance):
+    """
+    Two buttons are the same element if their centers are close and their labels agree.
+    """
+    try:
+        close = abs(float(a["x"]) - float(b["x"])) <= distance and abs(float(a["y"]) - float(b["y"])) <= distance
+    except (KeyError, TypeError, ValueError):
+        return False
+    label_a = str(a.get("label") or "").strip().lower()
+    label_b = str(b.get("label") or "").strip().lower()
+    return close and (label_a == label_b or not label_a or not label_b)
+
+
+class TilePlanner:
+    """
+    Decides how a large or multi-monitor frame is split for the vision model:
+    per monitor first, then into overlapping tiles of about the model's input size.
+    Tiles are analyzed concurrently and the elements found twice in overlaps are merged.
+    """
+
+    def __init__(self, config, logger):
+        self.logger = logger
+        tiling_config = config.get("tiling", {})
+        self.enabled = tiling_config.get("enabled", True)
+        self.tile_size = tiling_config.get("tile_size", 1280)
+        self.overlap = tiling_config.get("overlap", 128)
+        self.min_size = tiling_config.get("min_size", 2560)
+        self.max_in_flight = tiling_config.get("max_in_flight", 2)
+        self.dedupe_distance = tiling_config.get("dedupe_distance", 24)
+
+    def tiles(self, size, monitors=()):
+        """
+        Returns the tiles of a frame of the given size, or None when it is analyzed whole.
+        `monitors` are (x, y, width, height) boxes, used only if they lie inside the frame.
+        """
+        width, height = size
+        monitors = [
+            box for box in monitors
+            if box[0] >= 0 and box[1] >= 0 and box[0] + box[2] <= width and box[1] + box[3] <= height
+        ]
+        if not self.enabled or (max(size) <= self.min_size and len(monitors) <= 1):
+            return None
+
+        tiles = []
+        for monitor in monitors or [(0, 0, width, height)]:
+            tiles.extend(split_tiles(monitor, self.tile_size, self.overlap))
+        self.logger.info(f"Splitting the {width}x{height} frame into {len(tiles)} tiles over {max(1, len(monitors))} monitors.")
+        return tiles
+
+    def merge(self, kept, buttons):
+        """
+        Adds the buttons that are not duplicates of kept ones to `kept` and returns them.
+        """
+        added = []
+        for button in buttons:
+            if not any(is_duplicate(button, other, self.dedupe_distance) for other in kept):
+                kept.append(button)
+                added.append(button)
+        return added